@@ -38,6 +38,87 @@ CREATE TABLE FootballMatches (
     [AvgC_Over_2_5] FLOAT NULL, -- Average closing odds for Over 2.5 Goals.
     [AvgC_Under_2_5] FLOAT NULL, -- Average closing odds for Under 2.5 Goals.
     [AvgCAHH] FLOAT NULL, -- Average closing Asian Handicap Home Odds.
-    [AvgCAHA] FLOAT NULL -- Average closing Asian Handicap Away Odds.
+    [AvgCAHA] FLOAT NULL, -- Average closing Asian Handicap Away Odds.
+    [RowVersion] ROWVERSION NOT NULL, -- Bumped on every insert/update, cursor of the change feed (/api/changes).
+    [RowHash] BINARY(32) NULL -- SHA-256 of the match content, set by dbo.UpsertFootballMatches to skip unchanged rows.
 );
+END;
+GO
+
+-- Tables created before the change feed
+IF COL_LENGTH('dbo.FootballMatches', 'RowVersion') IS NULL
+BEGIN
+ALTER TABLE dbo.FootballMatches ADD [RowVersion] ROWVERSION NOT NULL;
+END;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_FootballMatches_RowVersion' AND object_id = OBJECT_ID('dbo.FootballMatches'))
+BEGIN
+CREATE NONCLUSTERED INDEX IX_FootballMatches_RowVersion ON dbo.FootballMatches ([RowVersion]);
+END;
+GO
+
+IF COL_LENGTH('dbo.FootballMatches', 'RowHash') IS NULL
+BEGIN
+ALTER TABLE dbo.FootballMatches ADD [RowHash] BINARY(32) NULL;
+END;
+GO
+
+-- Natural key of a match, used by dbo.UpsertFootballMatches.
+-- The previous upsert (which also matched on MatchTime) could insert the same match twice. Those
+-- duplicates are never deleted by this script: they are copied to dbo.FootballMatchesDuplicates and
+-- reported, and the unique index is only created once none is left. Removing them is an explicit
+-- step, run after reviewing the archive (keeps the first inserted row of every match, then creates
+-- the index):
+--     EXEC dbo.RemoveDuplicateMatches;
+IF OBJECT_ID('dbo.FootballMatchesDuplicates', 'U') IS NULL
+BEGIN
+CREATE TABLE dbo.FootballMatchesDuplicates (
+    [MatchID] BIGINT NOT NULL PRIMARY KEY, -- MatchID of the duplicated row in dbo.FootballMatches.
+    [KeptMatchID] BIGINT NOT NULL, -- First inserted row of the same match, kept by dbo.RemoveDuplicateMatches.
+    [Division] VARCHAR(2) NULL, [MatchDate] DATE NULL, [MatchTime] TIME(0) NULL, [HomeTeam] VARCHAR(100) NULL, [AwayTeam] VARCHAR(100) NULL,
+    [FTHG] INT NULL, [FTAG] INT NULL, [FTR] CHAR(1) NULL, [HTHG] INT NULL, [HTAG] INT NULL, [HTR] CHAR(1) NULL,
+    [HS] INT NULL, [AS] INT NULL, [HST] INT NULL, [AST] INT NULL, [HF] INT NULL, [AF] INT NULL,
+    [HC] INT NULL, [AC] INT NULL, [HY] INT NULL, [AY] INT NULL, [HR] INT NULL, [AR] INT NULL,
+    [AvgH] FLOAT NULL, [AvgD] FLOAT NULL, [AvgA] FLOAT NULL, [Avg_Over_2_5] FLOAT NULL, [Avg_Under_2_5] FLOAT NULL,
+    [AvgAHH] FLOAT NULL, [AvgAHA] FLOAT NULL, [AvgCH] FLOAT NULL, [AvgCD] FLOAT NULL, [AvgCA] FLOAT NULL,
+    [AvgC_Over_2_5] FLOAT NULL, [AvgC_Under_2_5] FLOAT NULL, [AvgCAHH] FLOAT NULL, [AvgCAHA] FLOAT NULL,
+    [ArchivedAt] DATETIME2(0) NOT NULL DEFAULT SYSUTCDATETIME() -- When the duplicate was found.
+);
+END;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'UX_FootballMatches_NaturalKey' AND object_id = OBJECT_ID('dbo.FootballMatches'))
+BEGIN
+;WITH Occurrences AS (
+    SELECT m.*,
+           ROW_NUMBER() OVER (PARTITION BY [MatchDate], [HomeTeam], [AwayTeam] ORDER BY [MatchID]) AS [Occurrence],
+           MIN([MatchID]) OVER (PARTITION BY [MatchDate], [HomeTeam], [AwayTeam]) AS [KeptMatchID]
+    FROM dbo.FootballMatches m
+)
+INSERT INTO dbo.FootballMatchesDuplicates ([MatchID], [KeptMatchID], [Division], [MatchDate], [MatchTime], [HomeTeam], [AwayTeam], [FTHG], [FTAG], [FTR], [HTHG], [HTAG], [HTR], [HS], [AS], [HST], [AST], [HF], [AF], [HC], [AC], [HY], [AY], [HR], [AR], [AvgH], [AvgD], [AvgA], [Avg_Over_2_5], [Avg_Under_2_5], [AvgAHH], [AvgAHA], [AvgCH], [AvgCD], [AvgCA], [AvgC_Over_2_5], [AvgC_Under_2_5], [AvgCAHH], [AvgCAHA])
+SELECT o.[MatchID], o.[KeptMatchID], o.[Division], o.[MatchDate], o.[MatchTime], o.[HomeTeam], o.[AwayTeam], o.[FTHG], o.[FTAG], o.[FTR], o.[HTHG], o.[HTAG], o.[HTR], o.[HS], o.[AS], o.[HST], o.[AST], o.[HF], o.[AF], o.[HC], o.[AC], o.[HY], o.[AY], o.[HR], o.[AR], o.[AvgH], o.[AvgD], o.[AvgA], o.[Avg_Over_2_5], o.[Avg_Under_2_5], o.[AvgAHH], o.[AvgAHA], o.[AvgCH], o.[AvgCD], o.[AvgCA], o.[AvgC_Over_2_5], o.[AvgC_Under_2_5], o.[AvgCAHH], o.[AvgCAHA]
+FROM Occurrences o
+WHERE o.[Occurrence] > 1
+  AND NOT EXISTS (SELECT 1 FROM dbo.FootballMatchesDuplicates a WHERE a.[MatchID] = o.[MatchID]);
+
+DECLARE @Duplicates INT = (SELECT COUNT(*) FROM dbo.FootballMatchesDuplicates a
+                           WHERE EXISTS (SELECT 1 FROM dbo.FootballMatches m WHERE m.[MatchID] = a.[MatchID]));
+IF @Duplicates = 0
+    CREATE UNIQUE NONCLUSTERED INDEX UX_FootballMatches_NaturalKey ON dbo.FootballMatches ([MatchDate], [HomeTeam], [AwayTeam]);
+ELSE
+    RAISERROR('%d duplicated matches archived in dbo.FootballMatchesDuplicates, UX_FootballMatches_NaturalKey not created. Review them, then run EXEC dbo.RemoveDuplicateMatches.', 10, 1, @Duplicates) WITH NOWAIT;
+END;
+GO
+
+-- Last matches of a team (DataLoader.load_for_fixtures): one seek per team and side
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_FootballMatches_HomeTeam_Date' AND object_id = OBJECT_ID('dbo.FootballMatches'))
+BEGIN
+CREATE NONCLUSTERED INDEX IX_FootballMatches_HomeTeam_Date ON dbo.FootballMatches ([HomeTeam], [MatchDate] DESC) INCLUDE ([AwayTeam]);
+END;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_FootballMatches_AwayTeam_Date' AND object_id = OBJECT_ID('dbo.FootballMatches'))
+BEGIN
+CREATE NONCLUSTERED INDEX IX_FootballMatches_AwayTeam_Date ON dbo.FootballMatches ([AwayTeam], [MatchDate] DESC) INCLUDE ([HomeTeam]);
 END;
\ No newline at end of file
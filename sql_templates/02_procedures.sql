@@ -7,99 +7,147 @@ CREATE PROCEDURE dbo.UpsertFootballMatches
 AS
 BEGIN
     SET NOCOUNT ON;
+    SET XACT_ABORT ON;
 
-    -- Declare a table variable to hold the parsed JSON data
-    DECLARE @SourceData TABLE (
-        Division VARCHAR(2),
-        MatchDate DATE,
-        MatchTime TIME(0),
-        HomeTeam VARCHAR(100),
-        AwayTeam VARCHAR(100),
-        FTHG INT, FTAG INT, FTR CHAR(1), HTHG INT, HTAG INT, HTR CHAR(1),
-        HS INT, [AS] INT, HST INT, AST INT, HF INT, AF INT, HC INT, AC INT, HY INT, AY INT, HR INT, AR INT,
-        AvgH FLOAT, AvgD FLOAT, AvgA FLOAT, Avg_Over_2_5 FLOAT, Avg_Under_2_5 FLOAT, AvgAHH FLOAT, AvgAHA FLOAT,
-        AvgCH FLOAT, AvgCD FLOAT, AvgCA FLOAT, AvgC_Over_2_5 FLOAT, AvgC_Under_2_5 FLOAT, AvgCAHH FLOAT, AvgCAHA FLOAT
-    );
-
-    -- Insert parsed JSON data into the table variable
-    INSERT INTO @SourceData (
-        Division,MatchDate, MatchTime, HomeTeam, AwayTeam,
-        FTHG, FTAG, FTR, HTHG, HTAG, HTR,
-        HS, [AS], HST, AST, HF, AF, HC, AC, HY, AY, HR, AR,
-        AvgH, AvgD, AvgA, Avg_Over_2_5, Avg_Under_2_5, AvgAHH, AvgAHA,
-        AvgCH, AvgCD, AvgCA, AvgC_Over_2_5, AvgC_Under_2_5, AvgCAHH, AvgCAHA
-    )
+    -- Shred the JSON in one pass with a typed schema into a temp table (which, unlike a
+    -- table variable, has statistics for the MERGE plan)
     SELECT
-        JSON_VALUE(value, '$.Division'),
-        CAST(JSON_VALUE(value, '$.MatchDate') AS DATE),
-        CAST(JSON_VALUE(value, '$.MatchTime') AS TIME(0)),
-        JSON_VALUE(value, '$.HomeTeam'),
-        JSON_VALUE(value, '$.AwayTeam'),
-        CAST(JSON_VALUE(value, '$.FTHG') AS INT),
-        CAST(JSON_VALUE(value, '$.FTAG') AS INT),
-        JSON_VALUE(value, '$.FTR'),
-        CAST(JSON_VALUE(value, '$.HTHG') AS INT),
-        CAST(JSON_VALUE(value, '$.HTAG') AS INT),
-        JSON_VALUE(value, '$.HTR'),
-        CAST(JSON_VALUE(value, '$.HS') AS INT),
-        CAST(JSON_VALUE(value, '$.AS') AS INT),
-        CAST(JSON_VALUE(value, '$.HST') AS INT),
-        CAST(JSON_VALUE(value, '$.AST') AS INT),
-        CAST(JSON_VALUE(value, '$.HF') AS INT),
-        CAST(JSON_VALUE(value, '$.AF') AS INT),
-        CAST(JSON_VALUE(value, '$.HC') AS INT),
-        CAST(JSON_VALUE(value, '$.AC') AS INT),
-        CAST(JSON_VALUE(value, '$.HY') AS INT),
-        CAST(JSON_VALUE(value, '$.AY') AS INT),
-        CAST(JSON_VALUE(value, '$.HR') AS INT),
-        CAST(JSON_VALUE(value, '$.AR') AS INT),
-        CAST(JSON_VALUE(value, '$.AvgH') AS FLOAT),
-        CAST(JSON_VALUE(value, '$.AvgD') AS FLOAT),
-        CAST(JSON_VALUE(value, '$.AvgA') AS FLOAT),
-        CAST(JSON_VALUE(value, '$.Avg_Over_2_5') AS FLOAT),
-        CAST(JSON_VALUE(value, '$.Avg_Under_2_5') AS FLOAT),
-        CAST(JSON_VALUE(value, '$.AvgAHH') AS FLOAT),
-        CAST(JSON_VALUE(value, '$.AvgAHA') AS FLOAT),
-        CAST(JSON_VALUE(value, '$.AvgCH') AS FLOAT),
-        CAST(JSON_VALUE(value, '$.AvgCD') AS FLOAT),
-        CAST(JSON_VALUE(value, '$.AvgCA') AS FLOAT),
-        CAST(JSON_VALUE(value, '$.AvgC_Over_2_5') AS FLOAT),
-        CAST(JSON_VALUE(value, '$.AvgC_Under_2_5') AS FLOAT),
-        CAST(JSON_VALUE(value, '$.AvgCAHH') AS FLOAT),
-        CAST(JSON_VALUE(value, '$.AvgCAHA') AS FLOAT)
-    FROM OPENJSON(@jsonData);
+        src.*,
+        -- Content hash of the non-key columns: only rows whose content changed are updated
+        CAST(HASHBYTES('SHA2_256', (
+            SELECT src.[Division], src.[MatchTime], src.[FTHG], src.[FTAG], src.[FTR], src.[HTHG],
+                   src.[HTAG], src.[HTR], src.[HS], src.[AS], src.[HST], src.[AST], src.[HF], src.[AF],
+                   src.[HC], src.[AC], src.[HY], src.[AY], src.[HR], src.[AR], src.[AvgH], src.[AvgD],
+                   src.[AvgA], src.[Avg_Over_2_5], src.[Avg_Under_2_5], src.[AvgAHH], src.[AvgAHA], src.[AvgCH], src.[AvgCD],
+                   src.[AvgCA], src.[AvgC_Over_2_5], src.[AvgC_Under_2_5], src.[AvgCAHH], src.[AvgCAHA]
+            FOR JSON PATH, WITHOUT_ARRAY_WRAPPER, INCLUDE_NULL_VALUES
+        )) AS BINARY(32)) AS [RowHash],
+        -- Duplicated matches in the payload: the last occurrence wins
+        ROW_NUMBER() OVER (PARTITION BY src.[MatchDate], src.[HomeTeam], src.[AwayTeam] ORDER BY src.[Ordinal] DESC) AS [Occurrence]
+    INTO #SourceData
+    FROM (
+        SELECT CAST(j.[key] AS INT) AS [Ordinal], typed.*
+        FROM OPENJSON(@jsonData) AS j
+        CROSS APPLY OPENJSON(j.[value]) WITH (
+            [Division] VARCHAR(2) '$.Division',
+            [MatchDate] DATE '$.MatchDate',
+            [MatchTime] TIME(0) '$.MatchTime',
+            [HomeTeam] VARCHAR(100) '$.HomeTeam',
+            [AwayTeam] VARCHAR(100) '$.AwayTeam',
+            [FTHG] INT '$.FTHG',
+            [FTAG] INT '$.FTAG',
+            [FTR] CHAR(1) '$.FTR',
+            [HTHG] INT '$.HTHG',
+            [HTAG] INT '$.HTAG',
+            [HTR] CHAR(1) '$.HTR',
+            [HS] INT '$.HS',
+            [AS] INT '$.AS',
+            [HST] INT '$.HST',
+            [AST] INT '$.AST',
+            [HF] INT '$.HF',
+            [AF] INT '$.AF',
+            [HC] INT '$.HC',
+            [AC] INT '$.AC',
+            [HY] INT '$.HY',
+            [AY] INT '$.AY',
+            [HR] INT '$.HR',
+            [AR] INT '$.AR',
+            [AvgH] FLOAT '$.AvgH',
+            [AvgD] FLOAT '$.AvgD',
+            [AvgA] FLOAT '$.AvgA',
+            [Avg_Over_2_5] FLOAT '$.Avg_Over_2_5',
+            [Avg_Under_2_5] FLOAT '$.Avg_Under_2_5',
+            [AvgAHH] FLOAT '$.AvgAHH',
+            [AvgAHA] FLOAT '$.AvgAHA',
+            [AvgCH] FLOAT '$.AvgCH',
+            [AvgCD] FLOAT '$.AvgCD',
+            [AvgCA] FLOAT '$.AvgCA',
+            [AvgC_Over_2_5] FLOAT '$.AvgC_Over_2_5',
+            [AvgC_Under_2_5] FLOAT '$.AvgC_Under_2_5',
+            [AvgCAHH] FLOAT '$.AvgCAHH',
+            [AvgCAHA] FLOAT '$.AvgCAHA'
+        ) AS typed
+    ) AS src
+    -- Rows without a natural key can not be matched
+    WHERE src.[MatchDate] IS NOT NULL AND src.[HomeTeam] IS NOT NULL AND src.[AwayTeam] IS NOT NULL;
+
+    DELETE FROM #SourceData WHERE [Occurrence] > 1;
 
     -- Get total rows from the input JSON
     DECLARE @TotalRows int;
-    SELECT @TotalRows = COUNT(*) FROM @SourceData;
+    SELECT @TotalRows = COUNT(*) FROM #SourceData;
     PRINT CONCAT('Total rows received from CSV: ', @TotalRows);
 
-    -- Use MERGE statement to perform conditional inserts
-    MERGE dbo.FootballMatches AS Target
-    USING @SourceData AS Source
-    ON Target.HomeTeam = Source.HomeTeam
-    AND Target.AwayTeam = Source.AwayTeam
-    AND Target.MatchDate = Source.MatchDate
-    AND Target.MatchTime = Source.MatchTime
+    DECLARE @Actions TABLE ([Action] NVARCHAR(10));
+
+    -- Natural key (MatchDate, HomeTeam, AwayTeam) backed by the unique index UX_FootballMatches_NaturalKey
+    MERGE dbo.FootballMatches WITH (HOLDLOCK) AS Target
+    USING #SourceData AS Source
+    ON Target.[MatchDate] = Source.[MatchDate]
+    AND Target.[HomeTeam] = Source.[HomeTeam]
+    AND Target.[AwayTeam] = Source.[AwayTeam]
+    WHEN MATCHED AND (Target.[RowHash] IS NULL OR Target.[RowHash] <> Source.[RowHash]) THEN
+        UPDATE SET
+            [Division] = Source.[Division], [MatchTime] = Source.[MatchTime], [FTHG] = Source.[FTHG], [FTAG] = Source.[FTAG], [FTR] = Source.[FTR], [HTHG] = Source.[HTHG],
+            [HTAG] = Source.[HTAG], [HTR] = Source.[HTR], [HS] = Source.[HS], [AS] = Source.[AS], [HST] = Source.[HST], [AST] = Source.[AST],
+            [HF] = Source.[HF], [AF] = Source.[AF], [HC] = Source.[HC], [AC] = Source.[AC], [HY] = Source.[HY], [AY] = Source.[AY],
+            [HR] = Source.[HR], [AR] = Source.[AR], [AvgH] = Source.[AvgH], [AvgD] = Source.[AvgD], [AvgA] = Source.[AvgA], [Avg_Over_2_5] = Source.[Avg_Over_2_5],
+            [Avg_Under_2_5] = Source.[Avg_Under_2_5], [AvgAHH] = Source.[AvgAHH], [AvgAHA] = Source.[AvgAHA], [AvgCH] = Source.[AvgCH], [AvgCD] = Source.[AvgCD], [AvgCA] = Source.[AvgCA],
+            [AvgC_Over_2_5] = Source.[AvgC_Over_2_5], [AvgC_Under_2_5] = Source.[AvgC_Under_2_5], [AvgCAHH] = Source.[AvgCAHH], [AvgCAHA] = Source.[AvgCAHA], [RowHash] = Source.[RowHash]
     WHEN NOT MATCHED THEN
         INSERT (
-            [Division],[MatchDate], [MatchTime], [HomeTeam], [AwayTeam],
-            [FTHG], [FTAG], [FTR], [HTHG], [HTAG], [HTR],
-            [HS], [AS], [HST], [AST], [HF], [AF], [HC], [AC], [HY], [AY], [HR], [AR],
-            [AvgH], [AvgD], [AvgA], [Avg_Over_2_5], [Avg_Under_2_5], [AvgAHH], [AvgAHA],
-            [AvgCH], [AvgCD], [AvgCA], [AvgC_Over_2_5], [AvgC_Under_2_5], [AvgCAHH], [AvgCAHA]
+            [Division], [MatchDate], [MatchTime], [HomeTeam], [AwayTeam], [FTHG], [FTAG], [FTR], [HTHG], [HTAG], [HTR],
+            [HS], [AS], [HST], [AST], [HF], [AF], [HC], [AC], [HY], [AY], [HR],
+            [AR], [AvgH], [AvgD], [AvgA], [Avg_Over_2_5], [Avg_Under_2_5], [AvgAHH], [AvgAHA], [AvgCH], [AvgCD], [AvgCA],
+            [AvgC_Over_2_5], [AvgC_Under_2_5], [AvgCAHH], [AvgCAHA], [RowHash]
         )
         VALUES (
-            Source.[Division], Source.[MatchDate], Source.[MatchTime], Source.[HomeTeam], Source.[AwayTeam],
-            Source.[FTHG], Source.[FTAG], Source.[FTR], Source.[HTHG], Source.[HTAG], Source.[HTR],
-            Source.[HS], Source.[AS], Source.[HST], Source.[AST], Source.[HF], Source.[AF], Source.[HC], Source.[AC], Source.[HY], Source.[AY], Source.[HR], Source.[AR],
-            Source.[AvgH], Source.[AvgD], Source.[AvgA], Source.[Avg_Over_2_5], Source.[Avg_Under_2_5], Source.[AvgAHH], Source.[AvgAHA],
-            Source.[AvgCH], Source.[AvgCD], Source.[AvgCA], Source.[AvgC_Over_2_5], Source.[AvgC_Under_2_5], Source.[AvgCAHH], Source.[AvgCAHA]
-        );
+            Source.[Division], Source.[MatchDate], Source.[MatchTime], Source.[HomeTeam], Source.[AwayTeam], Source.[FTHG], Source.[FTAG], Source.[FTR], Source.[HTHG], Source.[HTAG], Source.[HTR],
+            Source.[HS], Source.[AS], Source.[HST], Source.[AST], Source.[HF], Source.[AF], Source.[HC], Source.[AC], Source.[HY], Source.[AY], Source.[HR],
+            Source.[AR], Source.[AvgH], Source.[AvgD], Source.[AvgA], Source.[Avg_Over_2_5], Source.[Avg_Under_2_5], Source.[AvgAHH], Source.[AvgAHA], Source.[AvgCH], Source.[AvgCD], Source.[AvgCA],
+            Source.[AvgC_Over_2_5], Source.[AvgC_Under_2_5], Source.[AvgCAHH], Source.[AvgCAHA], Source.[RowHash]
+        )
+    OUTPUT $action INTO @Actions;
+
+    -- Get rows inserted and updated by the MERGE statement
+    DECLARE @InsertedRows int, @UpdatedRows int;
+    SELECT @InsertedRows = COUNT(CASE WHEN [Action] = 'INSERT' THEN 1 END),
+           @UpdatedRows = COUNT(CASE WHEN [Action] = 'UPDATE' THEN 1 END)
+    FROM @Actions;
+    PRINT CONCAT(@InsertedRows, ' new rows inserted and ', @UpdatedRows, ' rows updated in dbo.FootballMatches.');
+    SELECT @InsertedRows AS InsertedRowsCount, @UpdatedRows AS UpdatedRowsCount;
+END;
+GO
+
+IF OBJECT_ID('dbo.RemoveDuplicateMatches', 'P') IS NOT NULL
+    DROP PROCEDURE dbo.RemoveDuplicateMatches;
+GO
+
+-- Explicit clean-up step of the natural key migration (see the tables script): deletes from
+-- dbo.FootballMatches the duplicated matches archived in dbo.FootballMatchesDuplicates (the first
+-- inserted row of every match is kept), then creates UX_FootballMatches_NaturalKey. Never run
+-- automatically: review the archive first, then
+--     EXEC dbo.RemoveDuplicateMatches;
+CREATE PROCEDURE dbo.RemoveDuplicateMatches
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    BEGIN TRANSACTION;
+    -- Only archived rows are deleted, so every deleted row can be restored from the archive
+    DELETE m
+    FROM dbo.FootballMatches m
+    JOIN dbo.FootballMatchesDuplicates a ON a.[MatchID] = m.[MatchID];
+    DECLARE @DeletedRows INT = @@ROWCOUNT;
+    PRINT CONCAT(@DeletedRows, ' archived duplicated matches deleted from dbo.FootballMatches.');
+
+    IF EXISTS (SELECT 1 FROM dbo.FootballMatches GROUP BY [MatchDate], [HomeTeam], [AwayTeam] HAVING COUNT(*) > 1)
+        PRINT 'Duplicated matches not archived yet remain: run the tables script again to archive them.';
+    ELSE IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'UX_FootballMatches_NaturalKey' AND object_id = OBJECT_ID('dbo.FootballMatches'))
+        CREATE UNIQUE NONCLUSTERED INDEX UX_FootballMatches_NaturalKey ON dbo.FootballMatches ([MatchDate], [HomeTeam], [AwayTeam]);
+    COMMIT TRANSACTION;
 
-    -- Get rows inserted by the MERGE statement
-    DECLARE @InsertedRows int;
-    SET @InsertedRows = @@ROWCOUNT;
-    PRINT CONCAT(@InsertedRows, ' new rows inserted into dbo.FootballMatches.');
+    SELECT @DeletedRows AS DeletedRowsCount;
 END;
 GO
@@ -5,15 +5,78 @@ import json
 import csv
 import io
 import datetime
+import gzip
+import hashlib
+import tempfile
+import threading
+import time
 import pyodbc
 import requests
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from modules.loader.DataLoader import DataLoader
+from modules.loader.MatchStore import MatchStore
 from modules.processor.DataProcessor import DataProcessor
+from modules.processor.EloRatings import EloRatingEngine
 from modules.model.LinRegModel import LinRegModel
+from modules.model.ModelTournament import ModelTournament
+from modules.model.WalkForwardBacktester import WalkForwardBacktester
 from modules.ModelBlobStorage import ModelBlobStorage
+from modules.ModelRegistry import ModelRegistry
+from modules.PredictionCache import PredictionCache
+from modules.TrainingJobs import TrainingJobs
+from modules.SingleFlight import SingleFlight
+from modules.MicroBatcher import MicroBatcher
 import numpy as np
+import pandas as pd
 
 
+# Blob holding the materialized latest-form snapshot used to build prediction features
+FEATURE_SNAPSHOT_BLOB = "feature_snapshot.json"
+# Upcoming fixtures scored after each training run and the blob holding their predictions
+FUTURE_MATCHES_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "futur_matches.csv")
+UPCOMING_PREDICTIONS_BLOB = "predictions/upcoming_predictions.json"
+
+# Prediction results of this worker, keyed by fixture, model version and data version
+prediction_cache = PredictionCache(maxsize=int(os.environ.get("PREDICTION_CACHE_SIZE", 256)),
+                                   ttl=float(os.environ.get("PREDICTION_CACHE_TTL_SECONDS", 300)))
+
+# Internal change tracking columns, not part of the get_datas payload (RowHash is a 256-bit
+# hash: as a JSON integer it overflows the int64 columns of the clients)
+GET_DATAS_EXCLUDED_COLUMNS = ("RowVersion", "RowHash")
+
+# Page size of the change feed (/api/changes)
+CHANGES_DEFAULT_LIMIT = 5000
+CHANGES_MAX_LIMIT = 50000
+
+# I/O pool of /predict: the model blob, the feature snapshot and the match history are
+# independent network reads, fetched concurrently with a timeout per dependency
+predict_io_pool = ThreadPoolExecutor(max_workers=6, thread_name_prefix="predict-io")
+PREDICT_MODEL_TIMEOUT_SECONDS = float(os.environ.get("PREDICT_MODEL_TIMEOUT_SECONDS", 30))
+PREDICT_SNAPSHOT_TIMEOUT_SECONDS = float(os.environ.get("PREDICT_SNAPSHOT_TIMEOUT_SECONDS", 10))
+PREDICT_HISTORY_TIMEOUT_SECONDS = float(os.environ.get("PREDICT_HISTORY_TIMEOUT_SECONDS", 30))
+# Concurrent /predict requests of a cold worker share one in-flight load of the model,
+# the snapshot and the history of a fixture instead of each fetching them
+predict_loads = SingleFlight("predict-loads")
+# Optional micro-batching of the snapshot predictions: concurrent requests wait up to
+# PREDICT_BATCH_WAIT_MS for each other and share one feature build and one inference (0 = off)
+PREDICT_BATCH_WAIT_MS = float(os.environ.get("PREDICT_BATCH_WAIT_MS", 0))
+predict_batcher = MicroBatcher(max_batch=int(os.environ.get("PREDICT_BATCH_SIZE", 32)),
+                               max_wait_ms=PREDICT_BATCH_WAIT_MS, name="predict")
+
+# Match history shared read-only by the routes of this worker: one MatchStore, replaced when
+# the data version changes (checked at most every MATCH_STORE_CHECK_SECONDS)
+MATCH_STORE_CHECK_SECONDS = float(os.environ.get("MATCH_STORE_CHECK_SECONDS", 30))
+match_store = {"store": None, "checked_at": 0.0, "body": None}
+match_store_lock = threading.Lock()
+match_store_loads = SingleFlight("match-store")
+# Local copy of the store (memory-mapped on restart, then only the changed rows are fetched)
+MATCH_STORE_DIR = os.environ.get("MATCH_STORE_DIR", os.path.join(tempfile.gettempdir(), "match_store"))
+
+# Background training jobs, deduplicated on the parameters and the data version
+training_jobs = TrainingJobs()
+# Walk-forward backtests (one retrain per fold and candidate) run as background jobs as well
+backtest_jobs = TrainingJobs(prefix="jobs/backtest")
+
 app = func.FunctionApp(http_auth_level=func.AuthLevel.ANONYMOUS)
 @app.route(route="test", methods=["GET"])
 def test(req: func.HttpRequest) -> func.HttpResponse:
@@ -43,8 +106,12 @@ def test(req: func.HttpRequest) -> func.HttpResponse:
 
 @app.route(route="get_datas", methods=["GET"])
 def get_datas(req: func.HttpRequest) -> func.HttpResponse:
-    """ Function to retrieve football match data from the database using pyodbc.
-    This function is triggered by an HTTP GET request and retrieves all data from the FootballMatches table.
+    """ Function to retrieve football match data from the database.
+    This function is triggered by an HTTP GET request and returns all data of the FootballMatches table,
+    served from the MatchStore shared by the routes of this worker (see get_match_store).
+    With the optional 'since' query parameter (YYYY-MM-DD) only the matches played on or after
+    that date are returned, so clients can fetch incrementally and merge into their local copy.
+    The response carries an ETag (304 when If-None-Match matches) and is gzip compressed when accepted.
     
     Args:
         req (func.HttpRequest): The HTTP request object.
@@ -52,55 +119,110 @@ def get_datas(req: func.HttpRequest) -> func.HttpResponse:
     Returns:
         func.HttpResponse: A JSON response containing the list of football matches.
     """
-    logging.info('get_datas::Retrieving football matches from database using pyodbc.')
+    logging.info('get_datas::Retrieving football matches from the match store of this worker.')
 
-    sql_connection_string = get_sql_connection_string()
+    since = req.params.get('since')
+    if since:
+        try:
+            since = datetime.datetime.strptime(since, '%Y-%m-%d').date()
+        except ValueError:
+            return func.HttpResponse(
+                json.dumps({"status": "error", "message": "Invalid 'since' parameter, expected YYYY-MM-DD."}),
+                mimetype="application/json",
+                status_code=400
+            )
+
+    try:
+        store = get_match_store()
+        if store is None:
+            return func.HttpResponse(
+                json.dumps({"status": "error", "message": "Database operation failed: the match history could not be loaded."}),
+                mimetype="application/json",
+                status_code=500
+            )
+
+        if since:
+            # The store is sorted by date: the matches since a date are a slice of its columns
+            matches_list = [map_db_to_csv_format(match) for match in store.since(since).to_records(get_datas_columns(store))]
+            body = json.dumps(matches_list, default=str) # default=str handles non-JSON serializable types
+        else:
+            matches_list = store
+            body = get_match_store_body(store)
+        logging.info(f'get_datas::Successfully retrieved {len(matches_list)} records from FootballMatches.')
+        return json_http_response(req, body)
+
+    except Exception as e:
+        logging.error(f"get_datas::An unexpected error occurred during data retrieval: {e}", exc_info=True)
+        return func.HttpResponse(
+            json.dumps({"status": "error", "message": f"An unexpected error occurred: {str(e)}"}),
+            mimetype="application/json",
+            status_code=500
+        )
+
+@app.route(route="changes", methods=["GET"])
+def get_changes(req: func.HttpRequest) -> func.HttpResponse:
+    """ Change feed of the FootballMatches table.
+    Returns the rows inserted or updated after the given cursor (the RowVersion of the last row the
+    client has seen, 0 for a full sync), oldest change first, in a compact columnar form:
+    {"cursor": next cursor, "has_more": bool, "columns": [...], "rows": [[...], ...]}.
+    Clients keep a replica in sync by upserting the rows on MatchID and calling again with the
+    returned cursor until has_more is false.
+
+    Args:
+        req (func.HttpRequest): The HTTP request object ('cursor' and 'limit' query parameters).
+
+    Returns:
+        func.HttpResponse: The changes as JSON.
+    """
+    logging.info('get_changes::Retrieving the changes of FootballMatches.')
+    try:
+        cursor_value = int(req.params.get('cursor', 0))
+        limit = min(int(req.params.get('limit', CHANGES_DEFAULT_LIMIT)), CHANGES_MAX_LIMIT)
+        if cursor_value < 0 or limit < 1:
+            raise ValueError
+    except ValueError:
+        return func.HttpResponse(
+            json.dumps({"status": "error", "message": "'cursor' and 'limit' must be positive integers."}),
+            mimetype="application/json",
+            status_code=400
+        )
 
     cnxn = None
     cursor = None
     try:
-        cnxn = pyodbc.connect(sql_connection_string)
+        cnxn = pyodbc.connect(get_sql_connection_string())
         cursor = cnxn.cursor()
-
-        # Execute the SELECT query
-        cursor.execute("SELECT * FROM [dbo].[FootballMatches]")
-        
-        # Fetch all column names from the cursor description
+        # Rows of still running transactions (RowVersion >= MIN_ACTIVE_ROWVERSION) are left out:
+        # they could commit with a RowVersion lower than the returned cursor and be skipped
+        cursor.execute("""SELECT TOP (?) CAST([RowVersion] AS BIGINT) AS [RowVersion], [MatchID], [Division], [MatchDate], [MatchTime],
+                                 [HomeTeam], [AwayTeam], [FTHG], [FTAG], [FTR], [HTHG], [HTAG], [HTR],
+                                 [HS], [AS], [HST], [AST], [HF], [AF], [HC], [AC], [HY], [AY], [HR], [AR]
+                          FROM [dbo].[FootballMatches]
+                          WHERE [RowVersion] > CAST(CAST(? AS BIGINT) AS BINARY(8))
+                            AND [RowVersion] < MIN_ACTIVE_ROWVERSION()
+                          ORDER BY [RowVersion]""", limit, cursor_value)
         columns = [column[0] for column in cursor.description]
-        
-        # Fetch all rows and convert them to a list of dictionaries
-        matches_list = []
+        rows = []
         for row in cursor.fetchall():
-            match_dict = {}
-            for i, col_name in enumerate(columns):
-                # Ensure date and time objects are converted to strings if needed
-                if isinstance(row[i], datetime.date):
-                    match_dict[col_name] = row[i].strftime('%Y-%m-%d')
-                elif isinstance(row[i], datetime.time):
-                    match_dict[col_name] = row[i].strftime('%H:%M:%S')
-                else:
-                    match_dict[col_name] = row[i]
-            # Map database column names back to CSV format
-            csv_formatted_match = map_db_to_csv_format(match_dict)
-            matches_list.append(csv_formatted_match)
-        
-        logging.info(f'get_datas::Successfully retrieved {len(matches_list)} records from FootballMatches.')
-        
-        return func.HttpResponse(
-            json.dumps(matches_list, default=str), # default=str handles non-JSON serializable types
-            mimetype="application/json"
-        )
+            rows.append([value.strftime('%Y-%m-%d') if isinstance(value, datetime.date)
+                         else value.strftime('%H:%M:%S') if isinstance(value, datetime.time)
+                         else value for value in row])
+
+        next_cursor = rows[-1][0] if rows else cursor_value
+        logging.info(f'get_changes::{len(rows)} changes after cursor {cursor_value}, next cursor {next_cursor}.')
+        body = json.dumps({"cursor": next_cursor, "has_more": len(rows) == limit, "columns": columns, "rows": rows}, default=str)
+        return json_http_response(req, body)
 
     except pyodbc.Error as db_error:
         sqlstate = db_error.args[0]
-        logging.error(f"get_datas::Database error retrieving data: SQLSTATE={sqlstate}, Error={db_error}", exc_info=True)
+        logging.error(f"get_changes::Database error retrieving changes: SQLSTATE={sqlstate}, Error={db_error}", exc_info=True)
         return func.HttpResponse(
             json.dumps({"status": "error", "message": f"Database operation failed: {str(db_error)}"}),
             mimetype="application/json",
             status_code=500
         )
     except Exception as e:
-        logging.error(f"get_datas::An unexpected error occurred during data retrieval: {e}", exc_info=True)
+        logging.error(f"get_changes::An unexpected error occurred while retrieving changes: {e}", exc_info=True)
         return func.HttpResponse(
             json.dumps({"status": "error", "message": f"An unexpected error occurred: {str(e)}"}),
             mimetype="application/json",
@@ -259,14 +381,25 @@ def upload_football_matches_csv(req: func.HttpRequest) -> func.HttpResponse:
             # Execute the stored procedure. The '?' acts as a placeholder for the @jsonData parameter.
             # {CALL dbo.UpsertFootballMatches(?)} is the ODBC syntax for calling a stored procedure with parameters.
             cursor.execute("{CALL dbo.UpsertFootballMatches(?)}", json_data_payload)
+            counts = cursor.fetchone()
+            inserted_rows = counts.InsertedRowsCount if counts else 0
+            updated_rows = counts.UpdatedRowsCount if counts else 0
             cnxn.commit() # Commit the transaction if successful
 
-            logging.info(f"upload_football_matches_csv::Successfully executed dbo.UpsertFootballMatches for {total_rows_processed} records via pyodbc.")
+            logging.info(f"upload_football_matches_csv::Successfully executed dbo.UpsertFootballMatches for {total_rows_processed} records via pyodbc: {inserted_rows} inserted, {updated_rows} updated.")
+
+            if inserted_rows or updated_rows:
+                prediction_cache.invalidate("matches upserted")
+                try:
+                    refresh_feature_snapshot()
+                except Exception as snapshot_error:
+                    logging.error(f"upload_football_matches_csv::Failed to refresh the feature snapshot: {snapshot_error}", exc_info=True)
             
-            # The exact number of inserted rows is printed by the stored procedure to the SQL Server logs.
-            # This Python function won't get that specific count back without a SELECT statement from the SP.
             return func.HttpResponse(
-                json.dumps({"status": "success", "message": f"Successfully processed and submitted {total_rows_processed} records to SQL for upsertion via stored procedure. Check database logs for exact insert counts."}),
+                json.dumps({"status": "success",
+                            "message": f"Successfully processed {total_rows_processed} records: {inserted_rows} inserted, {updated_rows} updated, {total_rows_processed - inserted_rows - updated_rows} unchanged.",
+                            "inserted": inserted_rows,
+                            "updated": updated_rows}),
                 mimetype="application/json"
             )
 
@@ -327,40 +460,128 @@ def predict(req: func.HttpRequest) -> func.HttpResponse:
 
         logging.info(f'predict::Received data for prediction: {post_data}')
 
-        blob_model = ModelBlobStorage()
+        cache_key = prediction_cache.key(post_data["HomeTeam"], post_data["AwayTeam"], post_data["Date"])
+        cached_result = prediction_cache.get(cache_key)
+        if cached_result is not None:
+            logging.info(f'predict::Prediction served from cache: {cached_result}')
+            return func.HttpResponse(
+                json.dumps({"status": "success", "message": "Prediction completed successfully.", "results": cached_result, "cached": True}),
+                mimetype="application/json",
+                status_code=200
+            )
+
+        # Start the model and snapshot downloads at once; the match history is only
+        # needed when there is no usable snapshot
+        model_future = predict_io_pool.submit(predict_loads.do, "model", lambda: ModelRegistry().load())
+        snapshot_future = predict_io_pool.submit(predict_loads.do, "snapshot",
+                                                 lambda: ModelBlobStorage().load_json(FEATURE_SNAPSHOT_BLOB))
+        history_future = version_future = None
+        try:
+            snapshot = snapshot_future.result(timeout=PREDICT_SNAPSHOT_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            logging.warning(f"predict::Feature snapshot not loaded within {PREDICT_SNAPSHOT_TIMEOUT_SECONDS}s, using the match history.")
+            snapshot = None
+        except Exception as snapshot_error:
+            logging.warning(f"predict::Failed to load the feature snapshot: {snapshot_error}")
+            snapshot = None
+        fixtures = [(post_data["HomeTeam"], post_data["AwayTeam"])]
+        history_last_n = max(DataProcessor.DEFAULT_WINDOWS)
+        if not snapshot:
+            # The history read overlaps with the model download (with the default windows,
+            # the windows of the model are not known yet)
+            history_future = predict_io_pool.submit(load_shared_match_history, fixtures, history_last_n)
+            version_future = submit_data_version_load()
 
-        model_package = blob_model.load_model("olympiakos_prediction_model.pkl")
+        try:
+            model_package = model_future.result(timeout=PREDICT_MODEL_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            logging.error(f"predict::Model not loaded within {PREDICT_MODEL_TIMEOUT_SECONDS}s.")
+            return func.HttpResponse(
+                json.dumps({"status": "error", "message": "Timed out while loading the model."}),
+                mimetype="application/json",
+                status_code=504
+            )
 
         metadata = model_package.get("metadata", {})
         model = model_package.get("model")#LinRegModel(model=model_package.get("model"))
         logging.info(f"predict::Loaded model with metadata: {metadata}")
         logging.info(f'predict::Model loaded successfully: {type(model)}')
 
-        connection_string = get_sql_connection_string()
-        data_loader = DataLoader(sql_connection_string=connection_string)
-        data = data_loader.load_from_database()
-        if data:
-            logging.info("Data loaded successfully.")
-        
+        # Build the features the model was trained on
+        feature_config = metadata.get("feature_config") or {}
+        if isinstance(feature_config, str):
+            feature_config = json.loads(feature_config)
+        processor = DataProcessor(feature_config.get("windows"), feature_config.get("columns"), feature_config.get("ratings", False))
+
+        # Build the features from the materialized snapshot when available (and built with
+        # the same features), otherwise fall back to the full match history.
+        if snapshot and snapshot.get("windows") == processor.windows and snapshot.get("columns") == processor.cols_4_avg \
+                and (not processor.ratings or snapshot.get("ratings")):
+            logging.info(f"predict::Using feature snapshot built at {snapshot.get('built_at')}")
+            # Same version as the history path (snapshots built before data_version was stored fall back to their content)
+            data_version = snapshot.get("data_version") or f"{snapshot.get('matches_count')}:{snapshot.get('last_match_date')}"
+            if PREDICT_BATCH_WAIT_MS > 0:
+                # Batched with the concurrent requests on the same model and snapshot
+                result = predict_batcher.submit(
+                    (model_package.get("version"), data_version, json.dumps(feature_config, sort_keys=True)), post_data,
+                    lambda matches: predict_from_snapshot(model, processor, snapshot, matches))
+                prediction_cache.put(post_data["HomeTeam"], post_data["AwayTeam"], post_data["Date"], result,
+                                     model_package.get("version"), data_version)
+                return func.HttpResponse(
+                    json.dumps({"status": "success", "message": "Prediction completed successfully.", "results": result}),
+                    mimetype="application/json",
+                    status_code=200
+                )
+            samples = processor.get_samples_from_snapshot(snapshot, json.dumps([post_data]))
         else:
-            logging.error("Failed to load data.")
-            return
+            if history_future is None or history_last_n < max(processor.windows):
+                history_future = predict_io_pool.submit(load_shared_match_history, fixtures, max(processor.windows))
+                version_future = version_future or submit_data_version_load()
+            try:
+                data = history_future.result(timeout=PREDICT_HISTORY_TIMEOUT_SECONDS)
+            except FutureTimeoutError:
+                logging.error(f"predict::Match history not loaded within {PREDICT_HISTORY_TIMEOUT_SECONDS}s.")
+                return func.HttpResponse(
+                    json.dumps({"status": "error", "message": "Timed out while loading the match history."}),
+                    mimetype="application/json",
+                    status_code=504
+                )
+            if data:
+                logging.info("Data loaded successfully.")
+            else:
+                logging.error("predict::Failed to load the match history.")
+                return func.HttpResponse(
+                    json.dumps({"status": "error", "message": "Match history not available."}),
+                    mimetype="application/json",
+                    status_code=503
+                )
 
-        processor = DataProcessor()
-        #X_train, X_test, y_train, y_test = processor.process_data(data)
+            #X_train, X_test, y_train, y_test = processor.process_data(data)
 
-        samples = processor.get_samples_to_predict_from_json(data, json.dumps([post_data]))
+            samples = processor.get_samples_to_predict_from_json(data, json.dumps([post_data]),
+                                                                 get_current_ratings(data, snapshot) if processor.ratings else None)
+            # The version of the match history, as recorded in the snapshot, so that requests served
+            # by either path share the cached results (read in parallel with the history from SQL)
+            if isinstance(data, MatchStore):
+                data_version = data.version
+            elif version_future is None:
+                data_version = load_shared_data_version()
+            else:
+                try:
+                    data_version = version_future.result(timeout=PREDICT_HISTORY_TIMEOUT_SECONDS)
+                except FutureTimeoutError:
+                    # Same as a failed version query: the result is cached under an unknown version
+                    logging.warning(f"predict::Data version not loaded within {PREDICT_HISTORY_TIMEOUT_SECONDS}s.")
+                    data_version = None
         logging.info(f'predict::Samples for prediction: {samples}')
         
-        result = model.predict(samples)
-        results = []
-        for i in range(0, len(result), 2):
-            result[i] = np.flip(result[i])
-            results.append(np.mean([result[i], result[i + 1]], axis = 0))
+        results = model.predict_fixtures(fixtures, samples)
             
         # Convert each NumPy array in the results list to a standard Python list
         serializable_results = [arr.tolist() for arr in results]
         logging.info(f'predict::Prediction results: {json.dumps(serializable_results, indent=2)}')
+        prediction_cache.put(post_data["HomeTeam"], post_data["AwayTeam"], post_data["Date"], serializable_results[0],
+                             model_package.get("version"), data_version)
 
         return func.HttpResponse(
             json.dumps({"status": "success", "message": "Prediction completed successfully.", "results": serializable_results[0]}),
@@ -376,28 +597,276 @@ def predict(req: func.HttpRequest) -> func.HttpResponse:
             status_code=500
         )
     
+@app.route(route="predict/cache", methods=["GET"])
+def predict_cache_stats(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Hit/miss counters of the prediction result cache of this worker, the number of
+    loads shared by concurrent requests and the sizes of the prediction batches.
+    """
+    return func.HttpResponse(
+        json.dumps({"status": "success", "cache": prediction_cache.stats(), "loads": predict_loads.stats(),
+                    "batches": predict_batcher.stats()}),
+        mimetype="application/json",
+        status_code=200
+    )
+
 # ==============================================
 # ML Model Training and Saving
 # ==============================================
 @app.route(route="models/train", methods=["POST"])
 def train_and_save_model(req: func.HttpRequest) -> func.HttpResponse:
-    """Train a simple model and save it to blob storage"""
+    """Submit a background job training a model and saving it to blob storage.
+    The rolling windows and averaged columns of the features and the competing models
+    (see ModelTournament.CANDIDATES) can be given in the JSON body, e.g.
+    {"windows": [3, 5, 10, 20], "columns": ["goals_for", "Win"], "candidates": ["logistic", "gradient_boosting"], "ratings": true}
+    Requests with the same parameters on the same data join the same job ({"force": true} starts a new one).
+    Returns 202 with the job id; the job status is served by GET models/train/{job_id}."""
 
     logging.info('Training and saving model.')
     
     try:
-    
-        blob_name,performance = train_and_save_model()
-       
+        try:
+            feature_config = req.get_json() or {}
+        except ValueError:
+            feature_config = {}
+
+        job = submit_training_job(feature_config.get("windows"), feature_config.get("columns"),
+                                  feature_config.get("candidates"), feature_config.get("ratings"),
+                                  force=bool(feature_config.get("force")))
+        return training_job_response(job)
+
+    except Exception as e:
+        logging.error(f"Error in train_and_save_model: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": str(e)}),
+            status_code=500,
+            headers={"Content-Type": "application/json"}
+        )
+
+@app.route(route="models/train/{job_id}", methods=["GET"])
+def get_training_job(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Status (queued, running, succeeded or failed) and result of a training job.
+    """
+    return job_status_response(training_jobs, req.route_params.get("job_id"), "training", "models/train")
+
+def job_status_response(jobs, job_id, kind, route):
+    """
+    The status of a job of jobs (see TrainingJobs), 404 if it is unknown.
+    """
+    try:
+        job = jobs.get(job_id)
+    except Exception as e:
+        logging.error(f"job_status_response-> An unexpected error occurred while reading the {kind} job {job_id}: {e}", exc_info=True)
+        return func.HttpResponse(
+            json.dumps({"status": "error", "message": f"An unexpected error occurred: {str(e)}"}),
+            mimetype="application/json",
+            status_code=500
+        )
+    if job is None:
+        return func.HttpResponse(
+            json.dumps({"status": "error", "message": f"Unknown {kind} job '{job_id}'."}),
+            mimetype="application/json",
+            status_code=404
+        )
+    return training_job_response(job, route)
+
+def training_job_response(job, route="models/train"):
+    """
+    202 while the job is queued or running, 200 once it is finished.
+    """
+    return func.HttpResponse(
+        json.dumps({"status": "success", "job": job, "status_url": f"/api/{route}/{job['job_id']}"}),
+        mimetype="application/json",
+        status_code=202 if job["status"] in TrainingJobs.ACTIVE else 200
+    )
+
+
+@app.route(route="models/backtest", methods=["POST"])
+def backtest_models(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Submit a background job running a walk-forward backtest of the candidate models: retrained
+    at every season (or month, or week) boundary on the previous matches only. Optional JSON body, e.g.
+    {"candidates": ["logistic", "poisson_goals"], "frequency": "month", "warmup_seasons": 2,
+     "windows": [5, 10], "columns": ["goals_for", "Win"], "ratings": true}
+    Requests with the same parameters on the same data join the same job ({"force": true} starts a new one).
+    Returns 202 with the job id; the report is the result of the job, served by GET models/backtest/{job_id}.
+    """
+    try:
+        try:
+            body = req.get_json() or {}
+        except ValueError:
+            body = {}
+        processor = DataProcessor(body.get("windows"), body.get("columns"), body.get("ratings"))
+        backtester = WalkForwardBacktester(processor, body.get("candidates"), body.get("frequency", "season"),
+                                           int(body.get("warmup_seasons", 2)))
+    except (ValueError, TypeError) as e:
+        return func.HttpResponse(
+            json.dumps({"status": "error", "message": str(e)}),
+            mimetype="application/json",
+            status_code=400
+        )
+
+    try:
+        params = {key: body.get(key) for key in ("candidates", "frequency", "warmup_seasons", "windows", "columns", "ratings")}
+        data_version = DataLoader(sql_connection_string=get_sql_connection_string()).load_data_version()
+        if body.get("force"):
+            params["forced_at"] = datetime.datetime.now().isoformat()
+        elif data_version is None:
+            # Unknown data version: only the requests of the same minute coalesce
+            params["requested_at"] = datetime.datetime.now().strftime("%Y-%m-%dT%H:%M")
+
+        def run():
+            data = get_match_store(refresh=True)
+            if not data:
+                raise ValueError("No match history available.")
+            return backtester.run(data)
+
+        job, _ = backtest_jobs.submit(params, data_version, run)
+        return training_job_response(job, "models/backtest")
+    except Exception as e:
+        logging.error(f"backtest_models::An unexpected error occurred during the backtest: {e}", exc_info=True)
+        return func.HttpResponse(
+            json.dumps({"status": "error", "message": f"An unexpected error occurred: {str(e)}"}),
+            mimetype="application/json",
+            status_code=500
+        )
+
+@app.route(route="models/backtest/{job_id}", methods=["GET"])
+def get_backtest_job(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Status (queued, running, succeeded or failed) of a backtest job, with the report once it succeeded.
+    """
+    return job_status_response(backtest_jobs, req.route_params.get("job_id"), "backtest", "models/backtest")
+
+@app.route(route="models", methods=["GET"])
+def list_model_versions(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    List the registered model versions and the current one.
+    """
+    try:
+        registry = ModelRegistry()
+        return func.HttpResponse(
+            json.dumps({"status": "success", "current": registry.current(), "versions": registry.list_versions()}, default=str),
+            mimetype="application/json",
+            status_code=200
+        )
+    except Exception as e:
+        logging.error(f"list_model_versions::An unexpected error occurred while listing the models: {e}", exc_info=True)
+        return func.HttpResponse(
+            json.dumps({"status": "error", "message": f"An unexpected error occurred: {str(e)}"}),
+            mimetype="application/json",
+            status_code=500
+        )
+
+@app.route(route="models/promote", methods=["POST"])
+def promote_model_version(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Make a registered version the current model. Expects {"version": "..."}.
+    """
+    try:
+        version = (req.get_json() or {}).get("version")
+    except ValueError:
+        version = None
+    if not version:
+        return func.HttpResponse(
+            json.dumps({"status": "error", "message": "Missing 'version' in the request body."}),
+            mimetype="application/json",
+            status_code=400
+        )
+    return switch_model_version(lambda registry: registry.promote(version), "promote_model_version")
+
+@app.route(route="models/rollback", methods=["POST"])
+def rollback_model_version(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Make the previously promoted version the current model again.
+    """
+    return switch_model_version(lambda registry: registry.rollback(), "rollback_model_version")
+
+def switch_model_version(switch, caller):
+    """
+    Point the registry to another version (only the manifest is rewritten), then refresh
+    what depends on the current model: prediction cache, feature snapshot and published predictions.
+    """
+    try:
+        registry = ModelRegistry()
+        entry = switch(registry)
+    except ValueError as e:
+        return func.HttpResponse(
+            json.dumps({"status": "error", "message": str(e)}),
+            mimetype="application/json",
+            status_code=404
+        )
+    except Exception as e:
+        logging.error(f"{caller}::An unexpected error occurred while switching the model version: {e}", exc_info=True)
+        return func.HttpResponse(
+            json.dumps({"status": "error", "message": f"An unexpected error occurred: {str(e)}"}),
+            mimetype="application/json",
+            status_code=500
+        )
+
+    prediction_cache.invalidate(f"current model switched to {entry['version']}")
+    try:
+        model_package = registry.load(entry["version"])
+        feature_config = get_model_feature_config()
+        refresh_feature_snapshot(feature_config)
+        publish_upcoming_predictions(model_package["model"], entry["version"], feature_config)
+    except Exception as e:
+        logging.error(f"{caller}::Failed to refresh the snapshot and predictions of version {entry['version']}: {e}", exc_info=True)
+
+    return func.HttpResponse(
+        json.dumps({"status": "success", "message": f"Current model version is now {entry['version']}.", "version": entry["version"]}),
+        mimetype="application/json",
+        status_code=200
+    )
 
+@app.route(route="predictions", methods=["GET"])
+def get_predictions(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Serve the predictions of the upcoming fixtures published after the last training run,
+    straight from blob storage.
+    """
+    logging.info('get_predictions::Retrieving the published predictions.')
+
+    try:
+        predictions = ModelBlobStorage().load_json(UPCOMING_PREDICTIONS_BLOB)
+        if predictions is None:
+            return func.HttpResponse(
+                json.dumps({"status": "error", "message": "No predictions published yet. Train a model first."}),
+                mimetype="application/json",
+                status_code=404
+            )
+
+        return json_http_response(req, json.dumps(predictions))
+
+    except Exception as e:
+        logging.error(f"get_predictions::An unexpected error occurred while retrieving the predictions: {e}", exc_info=True)
         return func.HttpResponse(
-                json.dumps({"status": "success", "message": f"Model Successfully trained for prediction.","performance": performance, "blob_name": blob_name}),
+            json.dumps({"status": "error", "message": f"An unexpected error occurred: {str(e)}"}),
+            mimetype="application/json",
+            status_code=500
+        )
+
+
+@app.route(route="features/snapshot", methods=["POST"])
+def build_feature_snapshot(req: func.HttpRequest) -> func.HttpResponse:
+    """Rebuild the materialized feature snapshot used by /predict"""
+
+    logging.info('build_feature_snapshot::Rebuilding the feature snapshot.')
+
+    try:
+        snapshot = refresh_feature_snapshot()
+
+        return func.HttpResponse(
+                json.dumps({"status": "success", "message": "Feature snapshot rebuilt successfully.",
+                            "blob_name": FEATURE_SNAPSHOT_BLOB, "built_at": snapshot["built_at"],
+                            "teams": len(snapshot["teams"]), "h2h_pairs": len(snapshot["h2h"])}),
                 status_code=201,
                 mimetype="application/json"
             )
 
     except Exception as e:
-        logging.error(f"Error in train_and_save_model: {str(e)}")
+        logging.error(f"build_feature_snapshot::Error rebuilding the feature snapshot: {str(e)}", exc_info=True)
         return func.HttpResponse(
             json.dumps({"error": str(e)}),
             status_code=500,
@@ -430,12 +899,18 @@ def data_sync_timer(data_sync_timer: func.TimerRequest) -> None:
 
         # Call the main function to run the full pipeline
         total_new_row = data_loader.process_and_insert_data(csv_url, sql_connection_string, stored_procedure_name)
-        if total_new_row == 0:
-            logging.info('sync_sql_table::No new rows were inserted into the SQL table.')
+        if not total_new_row:
+            logging.info('sync_sql_table::No rows were inserted or updated in the SQL table.')
         else:
-            logging.info(f'sync_sql_table::Total new rows inserted into the SQL table: {total_new_row}')
+            logging.info(f'sync_sql_table::Total rows inserted or updated in the SQL table: {total_new_row}')
+            prediction_cache.invalidate("matches upserted")
+            logging.info('sync_sql_table::Refresh the feature snapshot with new data.')
+            refresh_feature_snapshot()
             logging.info('sync_sql_table:Trigger training of the model with new data.')
-            train_and_save_model()
+            # Joins a training already submitted for this data; the timer waits for its own job
+            job = submit_training_job()
+            job = training_jobs.wait(job["job_id"])
+            logging.info(f"sync_sql_table:Training job {job['job_id']} is {job['status']}.")
         
         logging.info(json.dumps({"status": "success", "message": "SQL table synced successfully."}))
    
@@ -446,21 +921,174 @@ def data_sync_timer(data_sync_timer: func.TimerRequest) -> None:
 
 
 #--------------- UTILITY FUNCTIONS ---------------#
-def train_and_save_model():
+def submit_training_job(windows=None, columns=None, candidates=None, ratings=None, force=False):
+    """
+    Submit train_and_save_model as a background job, or join the job already submitted with the
+    same parameters for the current version of the match history.
+
+    Args:
+        windows, columns, candidates, ratings: See train_and_save_model.
+        force: Start a new job even if one already trained on the same data.
+
+    Returns:
+        dict: The status of the job (see TrainingJobs).
+    """
+    params = {"windows": windows, "columns": columns, "candidates": candidates, "ratings": ratings}
+    data_version = DataLoader(sql_connection_string=get_sql_connection_string()).load_data_version()
+    if force:
+        params["forced_at"] = datetime.datetime.now().isoformat()
+    elif data_version is None:
+        # Unknown data version: only the requests of the same minute coalesce
+        params["requested_at"] = datetime.datetime.now().strftime("%Y-%m-%dT%H:%M")
+
+    def run():
+        blob_name, performance = train_and_save_model(windows, columns, candidates, ratings)
+        return {"blob_name": blob_name, "performance": performance}
+
+    job, _ = training_jobs.submit(params, data_version, run)
+    return job
+
+def train_and_save_model(windows=None, columns=None, candidates=None, ratings=None):
     """ 
     Utility function to train and save the model.
+
+    Args:
+        windows: The rolling windows of the averaged features (optional, defaults to DataProcessor.DEFAULT_WINDOWS).
+        columns: The averaged columns (optional, defaults to DataProcessor.DEFAULT_COLS_4_AVG).
+        candidates: The competing models (optional, defaults to MODEL_CANDIDATES or every candidate).
+        ratings: Add the Elo ratings to the features (optional, defaults to DataProcessor.DEFAULT_RATINGS).
     """
-    model,performance,X_train_len = train_model()
+    model,performance,X_train_len,feature_config,tournament = train_model(windows, columns, candidates, ratings)
 
     # Create model package with metadata
     logging.info("Saving model to blob storage...")
 
+    # The registry may suffix the version when another training saved the same one
+    blob_name, version = save_model(model, performance, X_train_len, "olympiakos_prediction_model.pkl", feature_config,
+                                    datetime.datetime.now().strftime("%Y%m%d_%H%M%S"), tournament)
 
-    blob_name = save_model(model, performance, X_train_len, "olympiakos_prediction_model.pkl")
+    try:
+        # Keep the feature snapshot consistent with the features of the new model (also after a
+        # default training following a custom one, or /predict stays on the history path)
+        refresh_feature_snapshot(feature_config)
+    except Exception as e:
+        logging.error(f"train_and_save_model-> Failed to refresh the feature snapshot: {e}", exc_info=True)
+
+    try:
+        publish_upcoming_predictions(model, version, feature_config)
+    except Exception as e:
+        # The model is saved: a failure to score the fixtures must not fail the training
+        logging.error(f"train_and_save_model-> Failed to publish the upcoming predictions: {e}", exc_info=True)
 
     return blob_name, performance
 
-def save_model(model, performance,X_train_len, model_name):
+def publish_upcoming_predictions(model, version, feature_config=None):
+    """
+    Score every upcoming fixture in one batch with the given model and publish the
+    results to blob storage (latest and per model version).
+
+    Args:
+        model: The trained model (see AbstractModel.predict_fixtures).
+        version: The version of the model.
+        feature_config: The windows and columns of the features the model was trained on.
+
+    Returns:
+        dict: The published predictions.
+    """
+    feature_config = feature_config or {}
+    fixtures = pd.read_csv(FUTURE_MATCHES_CSV, dtype=str).dropna(subset=["HomeTeam", "AwayTeam", "Date"])
+    fixtures = fixtures.apply(lambda col: col.str.strip())
+
+    data = get_match_store()
+    if not data:
+        raise ValueError("publish_upcoming_predictions-> No match history available to build the features.")
+
+    # Only fixtures not played yet, between teams with a history
+    known_teams = set(data.teams)
+    played = set(zip(data.decoded("HomeTeam"), data.decoded("AwayTeam"), data.decoded("Date")))
+    fixture_dates = pd.to_datetime(fixtures["Date"], format="%d/%m/%Y").dt.strftime("%Y-%m-%d")
+    is_played = [key in played for key in zip(fixtures["HomeTeam"], fixtures["AwayTeam"], fixture_dates)]
+    is_known = fixtures["HomeTeam"].isin(known_teams) & fixtures["AwayTeam"].isin(known_teams)
+    upcoming = fixtures[~pd.Series(is_played, index=fixtures.index) & is_known]
+    skipped = fixtures[~is_known][["HomeTeam", "AwayTeam", "Date"]].to_dict("records")
+    if skipped:
+        logging.info(f"publish_upcoming_predictions-> Fixtures skipped (team without history): {skipped}")
+
+    predictions = []
+    if upcoming.shape[0] > 0:
+        processor = DataProcessor(feature_config.get("windows"), feature_config.get("columns"), feature_config.get("ratings", False))
+        # The samples are built per fixture: repeated fixtures (e.g. league and play-off
+        # matches of the same pair) are predicted once and mapped back to every match
+        pairs = upcoming.drop_duplicates(subset=["HomeTeam", "AwayTeam"])
+        fixture_pairs = list(zip(pairs["HomeTeam"], pairs["AwayTeam"]))
+        samples = processor.get_samples_to_predict_from_json(data, pairs.to_json(orient="records"))
+        results = model.predict_fixtures(fixture_pairs, samples)
+        if len(results) != len(fixture_pairs):
+            raise ValueError(f"publish_upcoming_predictions-> {len(results)} predictions for {len(fixture_pairs)} fixtures.")
+        results = dict(zip(fixture_pairs, results))
+        for fixture in upcoming.to_dict("records"):
+            home_win, draw, home_loss = results[(fixture["HomeTeam"], fixture["AwayTeam"])]
+            predictions.append({**fixture, "HW": round(float(home_win), 3), "HD": round(float(draw), 3), "HL": round(float(home_loss), 3)})
+
+    published = {
+        "model_version": version,
+        "generated_at": datetime.datetime.now().isoformat(),
+        "predictions": predictions,
+        "skipped": skipped
+    }
+    storage_helper = ModelBlobStorage()
+    storage_helper.save_json(UPCOMING_PREDICTIONS_BLOB, published)
+    storage_helper.save_json(UPCOMING_PREDICTIONS_BLOB.replace(".json", f"_v{version}.json"), published)
+    logging.info(f"publish_upcoming_predictions-> {len(predictions)} predictions published for model version {version}.")
+    return published
+
+def refresh_feature_snapshot(feature_config=None):
+    """
+    Rebuild the materialized feature snapshot from the match history and save it to blob storage.
+
+    Args:
+        feature_config: The windows and columns of the features (see DataProcessor.get_feature_config).
+            Defaults to the feature configuration of the current model.
+
+    Returns:
+        dict: The snapshot that was saved.
+    """
+    # Called after upserts: the data version is checked now
+    data = get_match_store(refresh=True)
+    if not data:
+        raise ValueError("refresh_feature_snapshot-> No match history available to build the feature snapshot.")
+
+    storage_helper = ModelBlobStorage()
+    if feature_config is None:
+        feature_config = get_model_feature_config(storage_helper)
+    processor = DataProcessor(feature_config.get("windows"), feature_config.get("columns"), feature_config.get("ratings", False))
+    # The head to head index and the ratings of the previous snapshot are updated incrementally
+    previous_snapshot = storage_helper.load_json(FEATURE_SNAPSHOT_BLOB)
+    snapshot = processor.build_feature_snapshot(data, previous_snapshot)
+    # Version of the match history (see DataLoader.load_data_version), the data version of the cached predictions
+    snapshot["data_version"] = data.version
+    storage_helper.save_json(FEATURE_SNAPSHOT_BLOB, snapshot)
+    logging.info(f"refresh_feature_snapshot-> Feature snapshot saved to blob storage: {FEATURE_SNAPSHOT_BLOB}")
+    return snapshot
+
+def get_model_feature_config(storage_helper=None):
+    """
+    Feature configuration (windows, columns and ratings) of the current model, read from the blob metadata.
+    Models trained before the features were configurable use the default configuration.
+
+    Returns:
+        dict: {"windows": [...], "columns": [...], "ratings": bool}
+    """
+    storage_helper = storage_helper or ModelBlobStorage()
+    current = ModelRegistry(storage=storage_helper).current()
+    if current is not None:
+        blob_metadata = current.get("metadata", {})
+    else:
+        blob_metadata = storage_helper.get_model_metadata(ModelRegistry.LEGACY_BLOB_NAME) or {}
+    feature_config = json.loads(blob_metadata.get("feature_config", "{}"))
+    return DataProcessor(feature_config.get("windows"), feature_config.get("columns"), feature_config.get("ratings", False)).get_feature_config()
+
+def save_model(model, performance,X_train_len, model_name, feature_config=None, version=None, tournament=None):
     """
     Save the trained model to blob storage with metadata.
     
@@ -468,72 +1096,100 @@ def save_model(model, performance,X_train_len, model_name):
         model: The trained model object to be saved.
         metadata: Metadata associated with the model.
         model_name: Name of the model to be saved in blob storage.
+        feature_config: The windows and columns of the features the model was trained on.
+        version: Version string (optional, defaults to timestamp).
+        tournament: The results of every candidate of the training tournament (optional).
         
     Returns:
-        The name of the blob where the model is saved.
+        tuple: The name of the blob where the model is saved and its version (suffixed by the
+            registry when the version already existed).
     """
     try:
         model_metadata ={
             "performance": performance,
             "training_samples": {X_train_len},
-            "content_type": "application/octet-stream"
+            "content_type": "application/octet-stream",
+            "feature_config": json.dumps(feature_config or DataProcessor().get_feature_config()),
+            "model_type": getattr(model, "name", type(model).__name__)
         }
+        if tournament:
+            model_metadata["tournament"] = json.dumps(tournament)
        
         logging.info(f"save_model-> Model metadata: {model_metadata}")
-        # Save to blob storage
-        storage_helper = ModelBlobStorage()
+        # Save a new immutable version to the model registry and make it the current one
         model_name = "olympiakos_prediction_model"
         logging.info(f"Saving model '{model_name}' to blob storage...")
-        blob_name = storage_helper.save_model(model,model_metadata, model_name)
+        entry = ModelRegistry(model_name).register(model, model_metadata, version)
+        blob_name = entry["blob_name"]
         logging.info(f"save_model->Model saved successfully to blob storage with name: {blob_name}")
+        prediction_cache.invalidate("new model saved")
         
         
-        return blob_name
+        return blob_name, entry["version"]
     except Exception as e:
         logging.error(f"ModelBlobStorage::save_model -> Error saving model '{model_name}' to blob storage: {str(e)}", exc_info=True)
         raise e
     
-def train_model():
+def train_model(windows=None, columns=None, candidates=None, ratings=None):
     """
     Utility function to train and save the model.
     This function can be called from the Azure portal or other triggers.
 
+    Args:
+        windows: The rolling windows of the averaged features (optional).
+        columns: The averaged columns (optional).
+        candidates: The competing models (optional, defaults to the comma separated
+            MODEL_CANDIDATES setting or every candidate of ModelTournament.CANDIDATES).
+        ratings: Add the Elo ratings to the features (optional, defaults to DataProcessor.DEFAULT_RATINGS).
+
     Returns
-        model: The trained model object.
+        model: The trained model object (the winner of the tournament).
         performance: The performance metrics of the trained model.
+        X_train_len: The number of training samples.
+        feature_config: The windows and columns of the features.
+        tournament: The winner and the results of every candidate.
+
+    Raises:
+        ValueError: No match history available; the errors of the training are raised as well.
     """
     logging.info('train_model-> Training and saving model.')
     try:
-        # Initialize DataLoader with SQL connection string
-        sql_connection_string = get_sql_connection_string()
-        data_loader = DataLoader(sql_connection_string=sql_connection_string)
-        data = data_loader.load_from_database()
-        if data:
-            logging.info("train_model-> Data downloaded successfully.")
-        
-        else:
-            logging.error("train_model-> Failed to download data.")
-            return
+        data = get_match_store(refresh=True)
+        # Optionally train on the last seasons only (a slice of the store)
+        training_seasons = os.environ.get("TRAINING_SEASONS")
+        if data and training_seasons:
+            data = data.since(DataLoader.season_start(int(training_seasons)))
+        if not data:
+            raise ValueError("train_model-> No match history available to train the model.")
+        logging.info("train_model-> Data downloaded successfully.")
 
-        processor = DataProcessor()
-        X_train, X_test, y_train, y_test = processor.process_data(data) 
+        processor = DataProcessor(windows, columns, ratings)
+        X_train, X_test, y_train, y_test, context_train, context_test = processor.process_data(data, with_context=True)
         logging.info("train_model->Data processed successfully.")
-        # Train the model
-        logging.info("train_model->Training the model...")
-        model = LinRegModel()
-        performance =model.train(X_train, X_test, y_train, y_test)
-        logging.info("train_model->Model trained successfully.")
+        # Train the candidate models in parallel and keep the best one
+        logging.info("train_model->Training the models...")
+        candidates = candidates or [name.strip() for name in os.environ.get("MODEL_CANDIDATES", "").split(",") if name.strip()]
+        result = ModelTournament(candidates).run(X_train, X_test, y_train, y_test, context_train, context_test)
+        model, performance = result["model"], result["performance"]
+        tournament = {"winner": result["winner"], "results": result["results"]}
+        logging.info(f"train_model->Model trained successfully, winner: {result['winner']}.")
+        train_len = len(X_train)
+        if model.uses_context:
+            # The winner was fitted on the training seasons only (up to the test cutoff): the team
+            # strengths and ratings are refitted on the whole history, so the saved model knows the
+            # teams promoted since and their current form
+            context = pd.concat([context_train, context_test])
+            model.train(context, None, pd.concat([y_train, y_test]), None, assess_predictions=False)
+            train_len = len(context)
+            logging.info(f"train_model->{result['winner']} refitted on the whole history ({train_len} rows).")
         # Create model package with metadata
         logging.info("train_model->Saving model to blob storage...")
 
-        return model,performance,len(X_train)
+        return model,performance,train_len,processor.get_feature_config(),tournament
     except Exception as e:
-        logging.error(f"trai_model->Error in train_model: {str(e)}")
-        return func.HttpResponse(
-            json.dumps({"error": str(e)}),
-            status_code=500,
-            headers={"Content-Type": "application/json"}
-        )
+        # Raised to the caller (the training job is reported as failed with the error)
+        logging.error(f"train_model->Error in train_model: {str(e)}", exc_info=True)
+        raise
 def map_db_to_csv_format(db_record):
     """
     Maps database column names back to CSV format column names.
@@ -607,6 +1263,29 @@ def map_db_to_csv_format(db_record):
     
     return mapped_record    
 
+def json_http_response(req: func.HttpRequest, body: str) -> func.HttpResponse:
+    """
+    Builds a JSON response with an ETag (content hash), answering 304 when the client already
+    has this content (If-None-Match) and compressing the body when the client accepts gzip.
+
+    Args:
+        req (func.HttpRequest): The HTTP request object.
+        body (str): The JSON body.
+
+    Returns:
+        func.HttpResponse: The response.
+    """
+    etag = '"' + hashlib.sha256(body.encode('utf-8')).hexdigest()[:32] + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag in [tag.strip() for tag in req.headers.get('If-None-Match', '').split(',')]:
+        return func.HttpResponse(status_code=304, headers=headers)
+
+    payload = body.encode('utf-8')
+    if 'gzip' in req.headers.get('Accept-Encoding', ''):
+        payload = gzip.compress(payload, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+    return func.HttpResponse(payload, mimetype="application/json", headers=headers)
+
 def get_sql_connection_string():
     """
     Retrieves the SQL connection string from environment variables.
@@ -623,3 +1302,167 @@ def get_sql_connection_string():
 
 
 
+
+def load_match_history(fixtures=None, last_n=None):
+    """
+    Loads the match history from the SQL database.
+
+    Args:
+        fixtures: (HomeTeam, AwayTeam) pairs to predict: only their last_n matches per team and
+            their head to head matches are loaded. The full history by default.
+        last_n: Number of last matches of every team.
+
+    Returns:
+        list: The matches as dictionaries, or None if the load failed.
+    """
+    data_loader = DataLoader(sql_connection_string=get_sql_connection_string())
+    if fixtures:
+        return data_loader.load_for_fixtures(fixtures, last_n)
+    return data_loader.load_from_database()
+
+def get_current_ratings(data, snapshot=None):
+    """
+    The Elo ratings after the whole match history, for prediction features built from a history
+    that may only hold the last matches of the fixture teams (see load_shared_match_history).
+
+    Args:
+        data: The match history of the request
+        snapshot (dict): The feature snapshot, if any (its ratings are used even when its windows differ)
+
+    Returns:
+        EloRatingEngine: The ratings, or None to compute them from data (the whole history)
+    """
+    if isinstance(data, MatchStore):
+        return None
+    if snapshot and snapshot.get("ratings"):
+        return EloRatingEngine.from_dict(snapshot["ratings"])
+    store = get_match_store()
+    if store is None:
+        logging.warning("get_current_ratings-> Match store not available, ratings computed from the fixture teams matches.")
+        return None
+    rating_engine = EloRatingEngine()
+    rating_engine.add_matches(store.history_frame())
+    return rating_engine
+
+def predict_from_snapshot(model, processor, snapshot, matches):
+    """
+    Predict a batch of matches from the feature snapshot with one feature build and one inference.
+
+    Args:
+        matches (list[dict]): The matches to predict (HomeTeam, AwayTeam, Date, Time)
+
+    Returns:
+        list: The home win, draw and home loss probabilities of every match, in order
+    """
+    # The samples are built per fixture: repeated fixtures are predicted once
+    fixtures = list(dict.fromkeys((match["HomeTeam"], match["AwayTeam"]) for match in matches))
+    first_matches = {}
+    for match in matches:
+        first_matches.setdefault((match["HomeTeam"], match["AwayTeam"]), match)
+    samples = processor.get_samples_from_snapshot(snapshot, json.dumps([first_matches[fixture] for fixture in fixtures]))
+    results = dict(zip(fixtures, model.predict_fixtures(fixtures, samples).tolist()))
+    logging.info(f"predict_from_snapshot-> {len(matches)} matches predicted in one batch ({len(fixtures)} fixtures).")
+    return [results[(match["HomeTeam"], match["AwayTeam"])] for match in matches]
+
+
+def load_shared_match_history(fixtures, last_n):
+    """
+    load_match_history of fixtures, shared with the concurrent requests loading the same history
+    (the returned list must not be modified). The MatchStore of this worker is used instead
+    while it is current.
+    """
+    store = peek_match_store()
+    if store is not None:
+        return store
+    return predict_loads.do(("history", tuple(fixtures), last_n), load_match_history, fixtures, last_n)
+
+def load_shared_data_version():
+    """
+    DataLoader.load_data_version, shared with the concurrent requests reading it.
+    """
+    return predict_loads.do("data_version",
+                            lambda: DataLoader(sql_connection_string=get_sql_connection_string()).load_data_version())
+
+def submit_data_version_load():
+    """
+    Start reading the data version on predict_io_pool, alongside a match history read from SQL.
+
+    Returns:
+        Future: The data version, or None when the MatchStore of this worker (which has its version) is current.
+    """
+    if peek_match_store() is not None:
+        return None
+    return predict_io_pool.submit(load_shared_data_version)
+
+def get_match_store(refresh=False):
+    """
+    The MatchStore of the whole match history, shared read-only by the routes of this worker.
+    It is loaded once and replaced only when the data version changes; concurrent callers
+    share one load.
+
+    Args:
+        refresh: Check the data version now (after upserts) instead of every MATCH_STORE_CHECK_SECONDS
+
+    Returns:
+        MatchStore: The matches, or None if they could not be loaded.
+    """
+    with match_store_lock:
+        store, checked_at = match_store["store"], match_store["checked_at"]
+    if store is not None and not refresh and time.monotonic() - checked_at < MATCH_STORE_CHECK_SECONDS:
+        return store
+    return match_store_loads.do("store", refresh_match_store, store)
+
+def peek_match_store():
+    """
+    The MatchStore of this worker if it was checked within MATCH_STORE_CHECK_SECONDS, without any query.
+    """
+    with match_store_lock:
+        if match_store["store"] is not None and time.monotonic() - match_store["checked_at"] < MATCH_STORE_CHECK_SECONDS:
+            return match_store["store"]
+    return None
+
+def refresh_match_store(store=None):
+    """
+    Check the data version of a store and replace it when it changed, merging only the changed
+    rows. A new worker process starts from the store saved in MATCH_STORE_DIR by a previous one.
+    """
+    if store is None:
+        # Warm restart: map the local copy, validated against the database below
+        store = MatchStore.open(MATCH_STORE_DIR)
+
+    new_store = DataLoader(sql_connection_string=get_sql_connection_string()).load_match_store(base=store)
+    if new_store is None:
+        logging.error("refresh_match_store-> Failed to load the match store, keeping the previous one.")
+        return store
+    with match_store_lock:
+        if match_store["store"] is not new_store:
+            # The previous store is freed once the requests using it are done
+            match_store.update(store=new_store, body=None)
+        match_store["checked_at"] = time.monotonic()
+    if new_store is not store:
+        logging.info(f"refresh_match_store-> Match store version {new_store.version}: {len(new_store)} matches, "
+                     f"{new_store.nbytes / 2**20:.1f} MiB.")
+        try:
+            new_store.save(MATCH_STORE_DIR)
+        except OSError as e:
+            logging.warning(f"refresh_match_store-> Match store not saved locally: {e}")
+    return new_store
+
+def get_datas_columns(store):
+    """
+    The columns of a store returned by get_datas.
+    """
+    return [column for column in store.columns if column not in GET_DATAS_EXCLUDED_COLUMNS]
+
+def get_match_store_body(store):
+    """
+    The get_datas JSON body of the whole history of a store, serialized once per store.
+    """
+    with match_store_lock:
+        if match_store["body"] is not None and match_store["body"][0] is store:
+            return match_store["body"][1]
+    body = json.dumps([map_db_to_csv_format(match) for match in store.to_records(get_datas_columns(store))], default=str)
+    with match_store_lock:
+        if match_store["store"] is store:
+            match_store["body"] = (store, body)
+    return body
@@ -0,0 +1,90 @@
+import logging
+import threading
+from concurrent.futures import Future
+
+# ==============================================
+# Micro-Batching of Concurrent Calls
+# ==============================================
+class MicroBatcher:
+    """
+    Collects the items submitted concurrently under the same key for a few milliseconds and
+    processes them with one call of a batch function, then hands every caller its own result.
+
+    There is no background thread: the first caller of a batch (its leader) waits up to
+    max_wait_ms for other items, or less when max_batch items are collected, then runs the
+    batch function in its own thread; the other callers wait for their result.
+    """
+
+    def __init__(self, max_batch: int = 32, max_wait_ms: float = 5, name: str = "micro-batcher"):
+        """
+        Args:
+            max_batch: Maximum number of items of a batch (a full batch is run at once)
+            max_wait_ms: Time in milliseconds the leader of a batch waits for other items
+            name: Name of the batcher in the logs
+        """
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self.largest = 0
+        # Open batch of every key: {"items", "futures", "full" (threading.Event)}
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, item, run_batch, timeout: float = None):
+        """
+        Process an item in the next batch of key.
+
+        Args:
+            key: Items with the same key can be processed together (hashable)
+            item: The item to process
+            run_batch: Called with the list of items of a batch; returns the list of their results
+                (run by the leader of the batch, so the items of a key must accept any of the
+                run_batch functions submitted with it)
+            timeout: Maximum wait in seconds for the result (concurrent.futures.TimeoutError)
+
+        Returns:
+            The result of the item
+        """
+        future = Future()
+        with self._lock:
+            batch = self._open.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._open[key] = {"items": [], "futures": [], "full": threading.Event()}
+            batch["items"].append(item)
+            batch["futures"].append(future)
+            if len(batch["items"]) >= self.max_batch:
+                # Closed: the next item starts a new batch
+                del self._open[key]
+                batch["full"].set()
+
+        if leader:
+            batch["full"].wait(self.max_wait)
+            with self._lock:
+                if self._open.get(key) is batch:
+                    del self._open[key]
+                self.batches += 1
+                self.items += len(batch["items"])
+                self.largest = max(self.largest, len(batch["items"]))
+            self._run(batch, run_batch)
+        return future.result(timeout=timeout)
+
+    def _run(self, batch, run_batch):
+        try:
+            results = run_batch(batch["items"])
+            if len(results) != len(batch["items"]):
+                raise ValueError(f"MicroBatcher::_run -> {len(results)} results for {len(batch['items'])} items.")
+        except BaseException as e:
+            logging.error(f"MicroBatcher::_run -> {self.name}: batch of {len(batch['items'])} items failed: {e}")
+            for future in batch["futures"]:
+                future.set_exception(e)
+            return
+        for future, result in zip(batch["futures"], results):
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"batches": self.batches, "items": self.items, "largest": self.largest,
+                    "mean_size": round(self.items / self.batches, 2) if self.batches else None}
@@ -7,6 +7,8 @@ from datetime import datetime
 import azure.functions as func
 from azure.storage.blob import BlobServiceClient
 from azure.identity import DefaultAzureCredential
+from azure.core.exceptions import ResourceNotFoundError
+from azure.core import MatchConditions
 import logging
 
 # ==============================================
@@ -121,12 +123,141 @@ class ModelBlobStorage:
             logging.error(f"Error loading model: {str(e)}")
             raise
     
+    def get_model_metadata(self, blob_name: str) -> dict:
+        """
+        Get the blob metadata of a model without downloading it
+        
+        Args:
+            blob_name: Name of the blob containing the model
+            
+        Returns:
+            dict: The blob metadata, or None if the blob does not exist
+        """
+        try:
+            blob_client = self.blob_service_client.get_blob_client(
+                container=self.models_container,
+                blob=blob_name
+            )
+            return blob_client.get_blob_properties().metadata or {}
+            
+        except ResourceNotFoundError:
+            logging.info(f"Model not found: {blob_name}")
+            return None
+        except Exception as e:
+            logging.error(f"Error getting model metadata: {str(e)}")
+            raise
+    
+    def save_json(self, blob_name: str, payload) -> str:
+        """
+        Save a JSON serializable artifact (feature snapshot, ...) to blob storage
+        
+        Args:
+            blob_name: Name of the blob
+            payload: The JSON serializable object to save
+            
+        Returns:
+            str: Blob name of the saved artifact
+        """
+        try:
+            blob_client = self.blob_service_client.get_blob_client(
+                container=self.models_container,
+                blob=blob_name
+            )
+            blob_client.upload_blob(
+                data=json.dumps(payload, default=str).encode('utf-8'),
+                overwrite=True,
+                metadata={"upload_date": datetime.now().isoformat()}
+            )
+            logging.debug(f"ModelBlobStorage::save_json -> Artifact saved successfully: {blob_name}")
+            return blob_name
+            
+        except Exception as e:
+            logging.error(f"Error saving artifact: {str(e)}")
+            raise
+    
+    def load_json(self, blob_name: str):
+        """
+        Load a JSON artifact from blob storage
+        
+        Args:
+            blob_name: Name of the blob containing the artifact
+            
+        Returns:
+            The deserialized object, or None if the blob does not exist
+        """
+        try:
+            blob_client = self.blob_service_client.get_blob_client(
+                container=self.models_container,
+                blob=blob_name
+            )
+            return json.loads(blob_client.download_blob().readall())
+            
+        except ResourceNotFoundError:
+            logging.info(f"Artifact not found: {blob_name}")
+            return None
+        except Exception as e:
+            logging.error(f"Error loading artifact: {str(e)}")
+            raise
+    
+    def save_bytes(self, blob_name: str, data: bytes, metadata: dict = None, overwrite: bool = True, etag: str = None) -> dict:
+        """
+        Save raw bytes to blob storage
+        
+        Args:
+            blob_name: Name of the blob
+            data: The content
+            metadata: Blob metadata (values must be strings)
+            overwrite: Replace an existing blob (False makes the blob immutable: the upload fails if it exists)
+            etag: Only replace the blob if it still has this ETag (optimistic concurrency)
+            
+        Returns:
+            dict: The upload properties (etag, last_modified)
+        """
+        try:
+            blob_client = self.blob_service_client.get_blob_client(
+                container=self.models_container,
+                blob=blob_name
+            )
+            conditions = {"etag": etag, "match_condition": MatchConditions.IfNotModified} if etag else {}
+            return blob_client.upload_blob(data=data, overwrite=overwrite, metadata=metadata, **conditions)
+            
+        except Exception as e:
+            logging.error(f"Error saving blob '{blob_name}': {str(e)}")
+            raise
+    
+    def load_bytes(self, blob_name: str, with_etag: bool = False):
+        """
+        Load raw bytes from blob storage
+        
+        Args:
+            blob_name: Name of the blob
+            with_etag: Also return the ETag of the blob
+            
+        Returns:
+            bytes (or (bytes, etag)), None (or (None, None)) if the blob does not exist
+        """
+        try:
+            blob_client = self.blob_service_client.get_blob_client(
+                container=self.models_container,
+                blob=blob_name
+            )
+            downloader = blob_client.download_blob()
+            data = downloader.readall()
+            return (data, downloader.properties.etag) if with_etag else data
+            
+        except ResourceNotFoundError:
+            logging.info(f"Blob not found: {blob_name}")
+            return (None, None) if with_etag else None
+        except Exception as e:
+            logging.error(f"Error loading blob '{blob_name}': {str(e)}")
+            raise
+    
     def list_models(self, model_name_prefix: str = None) -> list:
         """
         List all models in blob storage
         
         Args:
-            model_name_prefix: Filter by model name prefix (optional)
+            model_name_prefix: Filter by model name prefix (optional, filtered by the storage service)
             
         Returns:
             list: List of model information dictionaries
@@ -137,10 +268,7 @@ class ModelBlobStorage:
             )
             
             models = []
-            for blob in container_client.list_blobs(include=['metadata']):
-                if model_name_prefix and not blob.name.startswith(model_name_prefix):
-                    continue
-                    
+            for blob in container_client.list_blobs(name_starts_with=model_name_prefix, include=['metadata']):
                 models.append({
                     "blob_name": blob.name,
                     "size_bytes": blob.size,
@@ -0,0 +1,236 @@
+import os
+import json
+import pickle
+import uuid
+import hashlib
+import logging
+import tempfile
+import threading
+from datetime import datetime
+from azure.core.exceptions import ResourceExistsError
+from modules.ModelBlobStorage import ModelBlobStorage
+from modules.SingleFlight import SingleFlight
+
+# ==============================================
+# Versioned Model Registry
+# ==============================================
+class ModelRegistry:
+    """
+    Registry of immutable, versioned model artifacts in blob storage:
+
+        registry/<model_name>/versions/<version>.pkl   (written once, never overwritten)
+        registry/<model_name>/current.json             (manifest naming the current version)
+
+    Switching or rolling back the model only rewrites the small manifest (conditionally on its
+    ETag, so concurrent promotions can not overwrite each other). Artifacts are cached on the
+    local disk of the worker under their SHA-256, so an unchanged model is never downloaded again,
+    and the last unpickled packages are kept in memory.
+    """
+    LEGACY_BLOB_NAME = "olympiakos_prediction_model.pkl"
+    HISTORY_SIZE = 20
+    # Attempts to save a version whose name is already taken, with a new suffix each time
+    REGISTER_ATTEMPTS = 3
+
+    # Unpickled model packages by SHA-256, shared by the registry instances of the worker
+    _packages = {}
+    _packages_lock = threading.Lock()
+    # Concurrent loads of the same artifact share one download
+    _downloads = SingleFlight("model-artifacts")
+
+    def __init__(self, model_name: str = "olympiakos_prediction_model", storage: ModelBlobStorage = None, cache_dir: str = None):
+        """
+        Args:
+            model_name: Name of the registered model
+            storage: Blob storage helper (created when not given)
+            cache_dir: Local disk cache of the artifacts (MODEL_CACHE_DIR, defaults to the temp directory)
+        """
+        self.model_name = model_name
+        self.storage = storage or ModelBlobStorage()
+        self.cache_dir = cache_dir or os.environ.get("MODEL_CACHE_DIR", os.path.join(tempfile.gettempdir(), "model_cache"))
+        self.prefix = f"registry/{model_name}"
+        self.manifest_blob = f"{self.prefix}/current.json"
+
+    def version_blob(self, version: str) -> str:
+        return f"{self.prefix}/versions/{version}.pkl"
+
+    def current(self) -> dict:
+        """
+        The manifest of the current version (one small read), or None if no version was promoted yet.
+        """
+        manifest, _ = self._read_manifest()
+        return manifest
+
+    def register(self, model, model_metadata: dict, version: str = None, promote: bool = True) -> dict:
+        """
+        Save a new immutable version of the model and (by default) make it the current one.
+
+        Args:
+            model: The trained model
+            model_metadata: Metadata of the model (performance, feature_config, ...)
+            version: Version string (optional, defaults to timestamp). When a version with this name
+                already exists (e.g. two trainings finished in the same second), a unique suffix is added.
+            promote: Point the manifest to the new version
+
+        Returns:
+            dict: The registry entry of the version (version, blob_name, sha256, size_bytes, metadata)
+        """
+        requested_version = version or datetime.now().strftime("%Y%m%d_%H%M%S")
+        version = requested_version
+        for attempt in range(1, self.REGISTER_ATTEMPTS + 1):
+            model_package = {
+                "model": model,
+                "metadata": model_metadata,
+                "version": version,
+                "saved_at": datetime.now().isoformat()
+            }
+            model_bytes = pickle.dumps(model_package)
+            sha256 = hashlib.sha256(model_bytes).hexdigest()
+            blob_name = self.version_blob(version)
+
+            blob_metadata = {key: str(value) for key, value in model_metadata.items()}
+            blob_metadata.update({"model_name": self.model_name, "version": version, "sha256": sha256,
+                                  "upload_date": datetime.now().isoformat()})
+            try:
+                # overwrite=False: a version is immutable
+                self.storage.save_bytes(blob_name, model_bytes, blob_metadata, overwrite=False)
+                break
+            except ResourceExistsError:
+                if attempt == self.REGISTER_ATTEMPTS:
+                    raise
+                version = f"{requested_version}_{uuid.uuid4().hex[:8]}"
+                logging.warning(f"ModelRegistry::register -> Version '{requested_version}' already exists, saving as '{version}'.")
+        self._write_cache(sha256, model_bytes)
+        logging.info(f"ModelRegistry::register -> Version '{version}' saved to {blob_name} ({len(model_bytes)} bytes, sha256 {sha256[:12]}).")
+
+        entry = {"version": version, "blob_name": blob_name, "sha256": sha256,
+                 "size_bytes": len(model_bytes), "metadata": blob_metadata}
+        if promote:
+            self._set_current(entry)
+        return entry
+
+    def load(self, version: str = None) -> dict:
+        """
+        Load a model package ({"model", "metadata", "version", "saved_at"}), the current version by default.
+        The artifact is read from memory or the local disk cache when its SHA-256 is already known.
+        Before the first promotion the legacy (unversioned) model blob is loaded.
+        """
+        if version is None:
+            entry = self.current()
+            if entry is None:
+                logging.info(f"ModelRegistry::load -> No current version, loading the legacy blob {self.LEGACY_BLOB_NAME}.")
+                return self.storage.load_model(self.LEGACY_BLOB_NAME)
+        else:
+            entry = self._entry(version)
+        return self._load_entry(entry)
+
+    def promote(self, version: str) -> dict:
+        """
+        Make an existing version the current one (only the manifest is rewritten).
+        """
+        entry = self._entry(version)
+        self._set_current(entry)
+        return entry
+
+    def rollback(self) -> dict:
+        """
+        Make the previously promoted version the current one again.
+        """
+        manifest = self.current()
+        history = (manifest or {}).get("history", [])
+        if len(history) < 2:
+            raise ValueError("ModelRegistry::rollback -> No previous version to roll back to.")
+        entry = self._entry(history[-2])
+        self._set_current(entry, rollback=True)
+        return entry
+
+    def list_versions(self) -> list:
+        """
+        The registered versions (most recent first) with their metadata.
+        """
+        versions = self.storage.list_models(f"{self.prefix}/versions/")
+        for version in versions:
+            version["version"] = version["metadata"].get("version")
+        return sorted(versions, key=lambda version: version["last_modified"], reverse=True)
+
+    def _entry(self, version: str) -> dict:
+        blob_name = self.version_blob(version)
+        metadata = self.storage.get_model_metadata(blob_name)
+        if metadata is None:
+            raise ValueError(f"ModelRegistry -> Unknown version '{version}'.")
+        return {"version": version, "blob_name": blob_name, "sha256": metadata.get("sha256"), "metadata": metadata}
+
+    def _read_manifest(self):
+        data, etag = self.storage.load_bytes(self.manifest_blob, with_etag=True)
+        return (json.loads(data) if data else None), etag
+
+    def _set_current(self, entry: dict, rollback: bool = False):
+        manifest, etag = self._read_manifest()
+        history = list((manifest or {}).get("history", []))
+        if rollback:
+            history = history[:-1]
+        elif not history or history[-1] != entry["version"]:
+            history.append(entry["version"])
+        new_manifest = {**entry, "promoted_at": datetime.now().isoformat(),
+                        "previous_version": (manifest or {}).get("version"),
+                        "history": history[-self.HISTORY_SIZE:]}
+        # The manifest is replaced only if nobody changed it since it was read
+        # (or created only if it still does not exist)
+        self.storage.save_bytes(self.manifest_blob, json.dumps(new_manifest).encode("utf-8"),
+                                {"version": entry["version"]}, overwrite=etag is not None, etag=etag)
+        logging.info(f"ModelRegistry::_set_current -> Current version of '{self.model_name}' is now '{entry['version']}'.")
+
+    def _cache_path(self, sha256: str) -> str:
+        return os.path.join(self.cache_dir, f"{sha256}.pkl")
+
+    def _write_cache(self, sha256: str, data: bytes):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write then rename so that a concurrent reader never sees a partial file
+            tmp_path = f"{self._cache_path(sha256)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as cache_file:
+                cache_file.write(data)
+            os.replace(tmp_path, self._cache_path(sha256))
+        except OSError as e:
+            logging.warning(f"ModelRegistry::_write_cache -> Artifact not cached locally: {e}")
+
+    def _read_cache(self, sha256: str):
+        try:
+            with open(self._cache_path(sha256), "rb") as cache_file:
+                data = cache_file.read()
+        except OSError:
+            return None
+        if hashlib.sha256(data).hexdigest() != sha256:
+            logging.warning(f"ModelRegistry::_read_cache -> Corrupted cache file for {sha256[:12]}, ignored.")
+            return None
+        return data
+
+    def _load_entry(self, entry: dict) -> dict:
+        sha256 = entry.get("sha256")
+        with self._packages_lock:
+            if sha256 in self._packages:
+                return self._packages[sha256]
+        return self._downloads.do(sha256 or entry["blob_name"], self._fetch_entry, entry)
+
+    def _fetch_entry(self, entry: dict) -> dict:
+        sha256 = entry.get("sha256")
+        data = self._read_cache(sha256) if sha256 else None
+        if data is None:
+            data = self.storage.load_bytes(entry["blob_name"])
+            if data is None:
+                raise ValueError(f"ModelRegistry -> Artifact {entry['blob_name']} not found.")
+            actual_sha256 = hashlib.sha256(data).hexdigest()
+            if sha256 and actual_sha256 != sha256:
+                raise ValueError(f"ModelRegistry -> Checksum mismatch for {entry['blob_name']}.")
+            sha256 = actual_sha256
+            self._write_cache(sha256, data)
+            logging.info(f"ModelRegistry::load -> Version '{entry['version']}' downloaded ({len(data)} bytes).")
+        else:
+            logging.info(f"ModelRegistry::load -> Version '{entry['version']}' read from the local cache.")
+
+        model_package = pickle.loads(data)
+        with self._packages_lock:
+            # Keep the current and the previous packages only
+            while len(self._packages) >= 2:
+                self._packages.pop(next(iter(self._packages)))
+            self._packages[sha256] = model_package
+        return model_package
@@ -0,0 +1,100 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+# ==============================================
+# Prediction Result Cache
+# ==============================================
+class PredictionCache:
+    """
+    LRU + TTL cache of prediction results keyed by fixture (HomeTeam, AwayTeam, Date),
+    model version and data version.
+    The cache is cleared as soon as a new model version or data version is seen, or
+    explicitly when a model is saved or matches are upserted by this worker.
+    The TTL bounds the staleness of entries when another worker changes the model or data.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300):
+        """
+        Args:
+            maxsize: Maximum number of cached results (least recently used are evicted)
+            ttl: Time to live of a result in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.model_version = None
+        self.data_version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, home_team: str, away_team: str, date: str) -> tuple:
+        """
+        Cache key of a fixture for the current model and data versions
+        """
+        return (home_team, away_team, date, self.model_version, self.data_version)
+
+    def get(self, key: tuple):
+        """
+        Get a cached result
+
+        Returns:
+            The cached result, or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, home_team: str, away_team: str, date: str, value, model_version=None, data_version=None):
+        """
+        Cache the result of a fixture computed with the given model and data versions.
+        Seeing new versions invalidates the results computed with the previous ones.
+        """
+        with self._lock:
+            if (model_version, data_version) != (self.model_version, self.data_version):
+                if self._entries:
+                    logging.info(f"PredictionCache::put -> New model/data version ({model_version}, {data_version}), cache cleared.")
+                self._entries.clear()
+                self.model_version = model_version
+                self.data_version = data_version
+            key = (home_team, away_team, date, model_version, data_version)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, reason: str = None):
+        """
+        Drop every cached result (a new model was saved or new matches were upserted)
+        """
+        with self._lock:
+            self._entries.clear()
+            self.model_version = None
+            self.data_version = None
+        logging.info(f"PredictionCache::invalidate -> Cache cleared: {reason}")
+
+    def stats(self) -> dict:
+        """
+        Hit/miss counters and occupancy of the cache
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else None,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "model_version": self.model_version,
+                "data_version": self.data_version
+            }
@@ -0,0 +1,65 @@
+import logging
+import threading
+from concurrent.futures import Future
+
+# ==============================================
+# Single-Flight Calls
+# ==============================================
+class SingleFlight:
+    """
+    Deduplication of concurrent calls: while a call for a key is in flight, the other callers
+    with the same key wait for it and share its result (or its exception) instead of running
+    it again. Nothing is kept once the call completes, caching is left to the callers; the
+    shared results must be treated as read-only.
+    """
+
+    def __init__(self, name: str = "single-flight"):
+        """
+        Args:
+            name: Name of the group in the logs
+        """
+        self.name = name
+        self.calls = 0
+        self.shared = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, timeout: float = None, **kwargs):
+        """
+        Call fn(*args, **kwargs), or wait for the call already in flight for the same key.
+
+        Args:
+            key: Identity of the call (hashable)
+            fn: The function to call
+            timeout: Maximum wait in seconds for a call in flight (concurrent.futures.TimeoutError)
+
+        Returns:
+            The result of the call
+        """
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = Future()
+                self.calls += 1
+            else:
+                self.shared += 1
+        if not leader:
+            logging.info(f"SingleFlight::do -> {self.name}: waiting for the call in flight for {key}.")
+            return call.result(timeout=timeout)
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._in_flight)}
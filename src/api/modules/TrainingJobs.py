@@ -0,0 +1,198 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError
+from modules.ModelBlobStorage import ModelBlobStorage
+
+# ==============================================
+# Background Training Jobs
+# ==============================================
+class TrainingJobs:
+    """
+    Training runs as background jobs with a status kept in blob storage:
+
+        jobs/training/<job_id>.json   ({"job_id", "status", "params", "data_version", "result", "error", ...})
+
+    The job id is derived from the training parameters and the version of the match history, and
+    the status blob is created only if it does not exist yet (or replaced conditionally on its ETag),
+    so concurrent requests for the same training, on this worker or any other one, coalesce onto
+    one job (single flight). A succeeded job is returned as is until the data changes; a failed job,
+    or a job without progress for TRAINING_JOB_TIMEOUT_SECONDS (worker recycled), is run again.
+    While a job runs, its status is refreshed every TRAINING_JOB_HEARTBEAT_SECONDS, and every status
+    write is conditional on the ETag of the last one: a run whose job was claimed again stops writing.
+    Other long runs (e.g. the backtests) use their own instance with another blob prefix.
+    """
+    PREFIX = "jobs/training"
+    ACTIVE = ("queued", "running")
+
+    def __init__(self, max_workers: int = 1, timeout_seconds: float = None, prefix: str = None, heartbeat_seconds: float = None):
+        """
+        Args:
+            max_workers: Number of jobs run at once by this worker
+            timeout_seconds: Age after which a queued or running job is considered lost
+            prefix: Blob prefix of the job statuses (defaults to PREFIX)
+            heartbeat_seconds: Interval of the status refreshes of a running job
+        """
+        self.prefix = prefix or self.PREFIX
+        self.timeout_seconds = timeout_seconds or float(os.environ.get("TRAINING_JOB_TIMEOUT_SECONDS", 3 * 3600))
+        self.heartbeat_seconds = heartbeat_seconds or float(os.environ.get("TRAINING_JOB_HEARTBEAT_SECONDS", 60))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="training")
+        # Futures of the jobs started by this worker
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def job_id(params: dict, data_version: str) -> str:
+        key = json.dumps({"params": params, "data_version": data_version}, sort_keys=True, default=str)
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+    def blob_name(self, job_id: str) -> str:
+        return f"{self.prefix}/{job_id}.json"
+
+    def submit(self, params: dict, data_version: str, run):
+        """
+        Start the training job of params and data_version, or join the one already submitted.
+
+        Args:
+            params: The training parameters (part of the job identity)
+            data_version: The version of the match history (see DataLoader.load_data_version)
+            run: Called without arguments in the background; returns the (JSON serializable) result
+
+        Returns:
+            tuple: (status of the job, True if this call started it)
+        """
+        job_id = self.job_id(params, data_version)
+        # The lock only guards the futures: the blob reads and writes run outside of it, and the
+        # conditional write of _claim lets a single request start the job
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None and not future.done():
+            # Fast path: already running on this worker
+            return self.get(job_id), False
+
+        status, etag = self._claim(job_id, params, data_version)
+        created = etag is not None
+        if created:
+            with self._lock:
+                self._futures[job_id] = self._executor.submit(self._run, status, etag, run)
+                # Forget the finished jobs, their status is in the blob
+                self._futures = {key: value for key, value in self._futures.items() if not value.done() or key == job_id}
+        logging.info(f"TrainingJobs::submit -> Job {job_id} {'started' if created else 'joined'} ({status['status']}).")
+        return status, created
+
+    def get(self, job_id: str) -> dict:
+        """
+        The status of a job, or None if it is unknown.
+        """
+        data = ModelBlobStorage().load_bytes(self.blob_name(job_id))
+        return json.loads(data) if data else None
+
+    def wait(self, job_id: str, timeout: float = None):
+        """
+        Wait for a job started by this worker and return its status (the current status for
+        the jobs of other workers).
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            future.result(timeout=timeout)
+        return self.get(job_id)
+
+    def _is_lost(self, status: dict) -> bool:
+        updated_at = datetime.fromisoformat(status.get("updated_at") or status["submitted_at"])
+        return (datetime.now() - updated_at).total_seconds() > self.timeout_seconds
+
+    def _claim(self, job_id: str, params: dict, data_version: str):
+        """
+        Returns:
+            tuple: (status of the job, ETag of its status blob if this call claimed it, None otherwise)
+        """
+        storage = ModelBlobStorage()
+        data, etag = storage.load_bytes(self.blob_name(job_id), with_etag=True)
+        if data:
+            status = json.loads(data)
+            if status["status"] == "succeeded" or (status["status"] in self.ACTIVE and not self._is_lost(status)):
+                return status, None
+            logging.info(f"TrainingJobs::_claim -> Job {job_id} is {status['status']}{' (lost)' if status['status'] in self.ACTIVE else ''}, running it again.")
+
+        now = datetime.now().isoformat()
+        status = {"job_id": job_id, "status": "queued", "params": params, "data_version": data_version,
+                  "submitted_at": now, "updated_at": now, "started_at": None, "finished_at": None,
+                  "result": None, "error": None}
+        try:
+            # Created only if absent, or replaced only if unchanged since it was read
+            properties = storage.save_bytes(self.blob_name(job_id), json.dumps(status).encode("utf-8"),
+                                            {"status": "queued"}, overwrite=etag is not None, etag=etag)
+        except (ResourceExistsError, ResourceModifiedError):
+            # Another request claimed the job first: join it
+            return self.get(job_id), None
+        return status, properties["etag"]
+
+    def _save(self, job: dict, **changes) -> bool:
+        """
+        Apply changes to the status of a running job and write it, conditionally on the ETag of the
+        last write of this run.
+
+        Returns:
+            bool: False if the job was claimed again by another request (the status is not written)
+        """
+        with job["lock"]:
+            if job["lost"]:
+                return False
+            status = job["status"]
+            status.update(changes, updated_at=datetime.now().isoformat())
+            try:
+                properties = ModelBlobStorage().save_bytes(self.blob_name(status["job_id"]),
+                                                           json.dumps(status, default=str).encode("utf-8"),
+                                                           {"status": status["status"]}, etag=job["etag"])
+            except ResourceModifiedError:
+                logging.warning(f"TrainingJobs::_save -> Job {status['job_id']} was claimed again, its status is no longer written by this run.")
+                job["lost"] = True
+                return False
+            job["etag"] = properties["etag"]
+            return True
+
+    def _heartbeat(self, job: dict, stop: threading.Event):
+        # Refresh updated_at so that a long run is not considered lost
+        while not stop.wait(self.heartbeat_seconds):
+            try:
+                if not self._save(job):
+                    return
+            except Exception as e:
+                logging.warning(f"TrainingJobs::_heartbeat -> Job {job['status']['job_id']}: {e}")
+
+    def _run(self, status: dict, etag: str, run):
+        job = {"status": dict(status), "etag": etag, "lost": False, "lock": threading.Lock()}
+        job_id = status["job_id"]
+        try:
+            if not self._save(job, status="running", started_at=datetime.now().isoformat()):
+                return job["status"]
+        except Exception as e:
+            logging.error(f"TrainingJobs::_run -> Job {job_id} could not be started: {e}", exc_info=True)
+            try:
+                self._save(job, status="failed", error=f"Status not written: {e}", finished_at=datetime.now().isoformat())
+            except Exception as save_error:
+                logging.error(f"TrainingJobs::_run -> Job {job_id} left queued until it times out: {save_error}")
+            return job["status"]
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, stop), name=f"training-heartbeat-{job_id}", daemon=True)
+        heartbeat.start()
+        try:
+            changes = {"status": "succeeded", "result": run()}
+            logging.info(f"TrainingJobs::_run -> Job {job_id} succeeded.")
+        except Exception as e:
+            logging.error(f"TrainingJobs::_run -> Job {job_id} failed: {e}", exc_info=True)
+            changes = {"status": "failed", "error": str(e)}
+        finally:
+            stop.set()
+            heartbeat.join()
+        try:
+            self._save(job, finished_at=datetime.now().isoformat(), **changes)
+        except Exception as e:
+            logging.error(f"TrainingJobs::_run -> Job {job_id} finished but its status was not written: {e}", exc_info=True)
+        return job["status"]
@@ -6,6 +6,7 @@ import pandas as pd
 import requests
 import logging
 import io
+from modules.loader.MatchStore import MatchStore
 
 class DataLoader:
     """
@@ -59,14 +60,187 @@ class DataLoader:
         self.sql_connection_string = sql_connection_string  # Placeholder for SQL connection string
 
 
-    def load_from_database(self):
+    # Columns of the match history used by the models
+    HISTORY_COLUMNS = """[MatchDate] as [Date], [HomeTeam], [AwayTeam], [FTHG], [FTAG], [FTR], [HS], [AS], [HST], [AST], [HF], [AF], [HC], [AC], [HY], [AY], [HR], [AR]"""
+
+    def load_from_database(self, since=None):
+        """
+        Load the match history from the database.
+
+        Args:
+            since (datetime.date | str): Only load the matches played on or after this date
+                (e.g. the last N seasons for training). All the matches by default.
+
+        Returns:
+            list: The matches as dictionaries, or None if the load failed.
+        """
+        if since is None:
+            return self._query_matches("load_from_database", f"SELECT {self.HISTORY_COLUMNS} FROM [dbo].[FootballMatches]")
+        # Date window, served by the natural key index (MatchDate, HomeTeam, AwayTeam)
+        return self._query_matches("load_from_database",
+                                   f"SELECT {self.HISTORY_COLUMNS} FROM [dbo].[FootballMatches] WHERE [MatchDate] >= ?",
+                                   pd.Timestamp(since).date())
+
+    def load_last_seasons(self, seasons: int, season_start_month: int = 7):
+        """
+        Load the matches of the last seasons (the current one included).
+        A season starts on the first day of season_start_month.
+        """
+        return self.load_from_database(since=self.season_start(seasons, season_start_month))
+
+    @staticmethod
+    def season_start(seasons: int, season_start_month: int = 7):
+        """
+        First day of the last seasons (the current one included).
+        """
+        today = datetime.date.today()
+        first_year = (today.year if today.month >= season_start_month else today.year - 1) - (seasons - 1)
+        return datetime.date(first_year, season_start_month, 1)
+
+    def load_for_fixtures(self, fixtures, last_n: int):
+        """
+        Load only the history needed to predict the given fixtures: the last_n matches of every
+        team playing (home or away) and all the head to head matches of every fixture.
+        The selection is pushed down to SQL, so the rows transferred per prediction are bounded
+        by the number of fixtures instead of growing with the history.
+
+        Args:
+            fixtures (list): (HomeTeam, AwayTeam) pairs.
+            last_n (int): Number of last matches of every team.
+
+        Returns:
+            list: The matches as dictionaries, or None if the load failed.
+        """
+        fixtures_json = json.dumps([{"HomeTeam": home, "AwayTeam": away} for home, away in fixtures])
+        query = f"""
+            WITH Fixtures AS (
+                SELECT [HomeTeam], [AwayTeam]
+                FROM OPENJSON(?) WITH ([HomeTeam] VARCHAR(100) '$.HomeTeam', [AwayTeam] VARCHAR(100) '$.AwayTeam')
+            ),
+            Teams AS (
+                SELECT [HomeTeam] AS [Team] FROM Fixtures
+                UNION
+                SELECT [AwayTeam] FROM Fixtures
+            ),
+            -- Last matches of every team as home side and as away side (index seeks on
+            -- IX_FootballMatches_HomeTeam_Date / IX_FootballMatches_AwayTeam_Date)
+            TeamMatches AS (
+                SELECT t.[Team], last_home.[MatchID], last_home.[MatchDate]
+                FROM Teams t
+                CROSS APPLY (SELECT TOP (?) m.[MatchID], m.[MatchDate] FROM [dbo].[FootballMatches] m
+                             WHERE m.[HomeTeam] = t.[Team] ORDER BY m.[MatchDate] DESC, m.[MatchID] DESC) last_home
+                UNION ALL
+                SELECT t.[Team], last_away.[MatchID], last_away.[MatchDate]
+                FROM Teams t
+                CROSS APPLY (SELECT TOP (?) m.[MatchID], m.[MatchDate] FROM [dbo].[FootballMatches] m
+                             WHERE m.[AwayTeam] = t.[Team] ORDER BY m.[MatchDate] DESC, m.[MatchID] DESC) last_away
+            ),
+            LastMatches AS (
+                SELECT [MatchID], ROW_NUMBER() OVER (PARTITION BY [Team] ORDER BY [MatchDate] DESC, [MatchID] DESC) AS [Rank]
+                FROM TeamMatches
+            ),
+            HeadToHead AS (
+                SELECT m.[MatchID]
+                FROM Fixtures f
+                JOIN [dbo].[FootballMatches] m
+                  ON (m.[HomeTeam] = f.[HomeTeam] AND m.[AwayTeam] = f.[AwayTeam])
+                  OR (m.[HomeTeam] = f.[AwayTeam] AND m.[AwayTeam] = f.[HomeTeam])
+            )
+            SELECT {self.HISTORY_COLUMNS}
+            FROM [dbo].[FootballMatches]
+            WHERE [MatchID] IN (SELECT [MatchID] FROM LastMatches WHERE [Rank] <= ?
+                                UNION
+                                SELECT [MatchID] FROM HeadToHead)"""
+        return self._query_matches("load_for_fixtures", query, fixtures_json, last_n, last_n, last_n)
+
+    def load_data_version(self):
+        """
+        Version of the match history: the number of matches and the highest RowVersion, so any
+        insert, update or delete gives a new version. One aggregate over the RowVersion index.
+
+        Returns:
+            str: "<count>:<rowversion>", or None if the query failed.
+        """
+        if not self.sql_connection_string:
+            logging.error("DataLoader::load_data_version::SQL_CONNECTION_STRING environment variable is not set.")
+            return None
+        cnxn = None
+        try:
+            cnxn = pyodbc.connect(self.sql_connection_string)
+            cursor = cnxn.cursor()
+            cursor.execute("SELECT COUNT_BIG(*), CAST(MAX([RowVersion]) AS BIGINT) FROM [dbo].[FootballMatches]")
+            count, rowversion = cursor.fetchone()
+            return f"{count}:{rowversion or 0}"
+        except pyodbc.Error as db_error:
+            logging.error(f"DataLoader::load_data_version::Database error: {db_error}")
+            return None
+        finally:
+            if cnxn:
+                cnxn.close()
+
+    def load_match_store(self, base=None):
+        """
+        Load the whole FootballMatches table into a MatchStore, column by column from the
+        fetched rows (no dictionary per match).
+
+        With a base store (e.g. mapped from local disk), only the rows changed since its RowVersion
+        watermark are fetched and merged into it; the result is checked against the count and the
+        watermark of the table, and the whole table is loaded when they differ (deleted rows).
+
+        Args:
+            base (MatchStore): A previous store of the table.
+
+        Returns:
+            MatchStore: The matches, versioned with load_data_version (base itself when it is
+                current), or None if the load failed.
+        """
+        logging.info("DataLoader::load_match_store::Attempting to load the match store from the database...")
+        if not self.sql_connection_string:
+            logging.error("DataLoader::load_match_store::SQL_CONNECTION_STRING environment variable is not set.")
+            return None
+        cnxn = None
+        try:
+            cnxn = pyodbc.connect(self.sql_connection_string)
+            cursor = cnxn.cursor()
+            # Version read first: a change during the load gives a newer version at the next check
+            cursor.execute("SELECT COUNT_BIG(*), CAST(MAX([RowVersion]) AS BIGINT) FROM [dbo].[FootballMatches]")
+            count, rowversion = cursor.fetchone()
+            version = f"{count}:{rowversion or 0}"
+            if base is not None and base.version == version:
+                return base
+            if base is not None and "RowVersion" in base and "MatchID" in base:
+                # Rows of still running transactions are left out, as in the change feed
+                cursor.execute("""SELECT * FROM [dbo].[FootballMatches]
+                                  WHERE [RowVersion] > CAST(CAST(? AS BIGINT) AS BINARY(8))
+                                    AND [RowVersion] < MIN_ACTIVE_ROWVERSION()""", base.watermark())
+                columns = [column[0] for column in cursor.description]
+                delta = MatchStore.from_rows(columns, cursor.fetchall())
+                store = base.upsert(delta, version=version)
+                if len(store) == count and store.watermark() == (rowversion or 0):
+                    logging.info(f"DataLoader::load_match_store::{len(delta)} changed matches merged into version {base.version} -> {version}.")
+                    return store
+                logging.info(f"DataLoader::load_match_store::Store version {base.version} out of sync with {version} "
+                             f"({len(store)} matches after the delta), loading the whole table.")
+            cursor.execute("SELECT * FROM [dbo].[FootballMatches]")
+            columns = [column[0] for column in cursor.description]
+            store = MatchStore.from_rows(columns, cursor.fetchall(), version=version)
+            logging.info(f"DataLoader::load_match_store::Loaded {len(store)} matches ({store.nbytes / 2**20:.1f} MiB).")
+            return store
+        except pyodbc.Error as db_error:
+            logging.error(f"DataLoader::load_match_store::Database error: {db_error}", exc_info=True)
+            return None
+        finally:
+            if cnxn:
+                cnxn.close()
+
+    def _query_matches(self, caller, query, *params):
         """
-        Load data from a database connection.
-        This method is a placeholder for future implementation.
+        Run a SELECT on the matches and return the rows as dictionaries
+        (dates and times converted to strings).
         """
-        logging.info("DataLoader::load_from_database::Attempting to load data from the database...")
+        logging.info(f"DataLoader::{caller}::Attempting to load data from the database...")
         if not self.sql_connection_string:
-            logging.error("DataLoader::load_from_database::SQL_CONNECTION_STRING environment variable is not set. Please ensure local.settings.json or Azure App Settings are configured.")
+            logging.error(f"DataLoader::{caller}::SQL_CONNECTION_STRING environment variable is not set. Please ensure local.settings.json or Azure App Settings are configured.")
             return None
 
         cnxn = None
@@ -77,8 +251,7 @@ class DataLoader:
             cursor = cnxn.cursor()
 
             # Execute the SELECT query
-            cursor.execute("""SELECT [MatchDate] as [Date], [HomeTeam], [AwayTeam], [FTHG], [FTAG], [FTR], [HS], [AS], [HST], [AST], [HF], [AF], [HC], [AC], [HY], [AY], [HR], [AR]
-                              FROM [dbo].[FootballMatches]""")
+            cursor.execute(query, *params)
             
             # Fetch all column names from the cursor description
             columns = [column[0] for column in cursor.description]
@@ -98,17 +271,15 @@ class DataLoader:
 
                 matches_list.append(match_dict)
             
-            logging.info(f'DataLoader::load_from_database::Successfully retrieved {len(matches_list)} records from FootballMatches.')
-            
-           
+            logging.info(f'DataLoader::{caller}::Successfully retrieved {len(matches_list)} records from FootballMatches.')
 
         except pyodbc.Error as db_error:
             sqlstate = db_error.args[0]
-            logging.error(f"DataLoader::load_from_database::Database error retrieving data: SQLSTATE={sqlstate}, Error={db_error}", exc_info=True)
+            logging.error(f"DataLoader::{caller}::Database error retrieving data: SQLSTATE={sqlstate}, Error={db_error}", exc_info=True)
             return None
 
         except Exception as e:
-            logging.error(f"DataLoader::load_from_database::An unexpected error occurred during data retrieval: {e}", exc_info=True)
+            logging.error(f"DataLoader::{caller}::An unexpected error occurred during data retrieval: {e}", exc_info=True)
             
         finally:
             if cursor:
@@ -190,6 +361,9 @@ class DataLoader:
             csv_url (str): The URL of the CSV file.
             sql_connection_string (str): The connection string for the SQL Server database.
             stored_procedure_name (str): The name of the stored procedure to call.
+
+        Returns:
+            int: The number of rows inserted or updated (None on failure).
         """
         # 1. Fetch the CSV data from the URL
         print("Fetching CSV from URL...")
@@ -228,16 +402,17 @@ class DataLoader:
             # {CALL dbo.UpsertFootballMatches(?)} is the ODBC syntax for calling a stored procedure with parameters.
             cursor.execute(f"{{CALL {stored_procedure_name}(?)}}", json_payload)
             result = cursor.fetchone()
-            inserted_rows_count = 0
+            inserted_rows_count, updated_rows_count = 0, 0
             # Vérifie si un résultat a été retourné et l'affiche
             if result:
-                inserted_rows_count = result[0] # Ou result.InsertedRowsCount
-                print(f"DataLoader::load_from_database::New inserted rows count: {inserted_rows_count}")
+                inserted_rows_count = result.InsertedRowsCount
+                updated_rows_count = result.UpdatedRowsCount
+                print(f"DataLoader::load_from_database::New inserted rows count: {inserted_rows_count}, updated rows count: {updated_rows_count}")
             cnxn.commit()  # Commit the transaction if successful
             
             logging.info(f"DataLoader::load_from_database::Successfully executed '{stored_procedure_name}' for {total_rows_processed} records.")
 
-            return inserted_rows_count
+            return inserted_rows_count + updated_rows_count
             
         except pyodbc.Error as db_error:
             # Handle database-specific errors
@@ -0,0 +1,421 @@
+import os
+import json
+import shutil
+import logging
+import datetime
+import threading
+import numpy as np
+import pandas as pd
+
+
+class MatchRow:
+    """
+    Read-only view of one match of a MatchStore, with the interface of the match dictionaries
+    of DataLoader (row["HomeTeam"], row.get("FTHG"), row.to_dict()). Nothing is copied: the
+    values are decoded from the columns of the store when read.
+    """
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    def __getitem__(self, column):
+        return self._store.value(column, self._index)
+
+    def __contains__(self, column):
+        return column in self._store
+
+    def get(self, column, default=None):
+        return self[column] if column in self._store else default
+
+    def keys(self):
+        return self._store.columns
+
+    def to_dict(self) -> dict:
+        return {column: self[column] for column in self._store.columns}
+
+    def __repr__(self):
+        return f"MatchRow({self.to_dict()})"
+
+
+class MatchStore:
+    """
+    Immutable columnar copy of the FootballMatches table, shared read-only by the API routes
+    instead of a list of dictionaries (and the DataFrames built from it) per request.
+
+    The matches are sorted by date (then MatchID). Every column is one read-only NumPy array:
+    teams are integer codes into one list of teams shared by HomeTeam and AwayTeam, other text
+    columns (Division, FTR, MatchTime...) integer codes into their distinct values, dates
+    datetime64, nullable integers float64 with NaN, and binary columns (RowVersion, RowHash)
+    fixed width byte matrices. Rows are exposed as MatchRow views and decoded to the values of
+    DataLoader (dates and times as strings, binary as integers) only when read.
+
+    A store can be saved to local disk (one .npy file per column) and mapped back by another
+    process without parsing anything (see save and open), and the rows changed since its
+    RowVersion watermark merged into a new store (see upsert).
+    """
+    TEAM_COLUMNS = ("HomeTeam", "AwayTeam")
+    DATE_COLUMN = "MatchDate"
+    # Names of the match history of DataLoader.load_from_database -> column of the table
+    ALIASES = {"Date": "MatchDate", "Time": "MatchTime"}
+    # Columns of the match history used by the models (see DataLoader.HISTORY_COLUMNS)
+    HISTORY_COLUMNS = ["Date", "HomeTeam", "AwayTeam", "FTHG", "FTAG", "FTR", "HS", "AS", "HST", "AST",
+                       "HF", "AF", "HC", "AC", "HY", "AY", "HR", "AR"]
+
+    def __init__(self, arrays, kinds, teams, categories, version=None):
+        """
+        Use from_rows or from_records. The arrays are made read-only.
+
+        Args:
+            arrays: column -> np.ndarray (codes, datetime64, int64, float64 or uint8 matrices)
+            kinds: column -> "team", "code", "date", "int", "nullable_int", "float" or "binary"
+            teams: The team names of the codes of TEAM_COLUMNS
+            categories: column -> distinct values of the codes of a "code" column
+            version: Version of the data (see DataLoader.load_data_version)
+        """
+        self._arrays = arrays
+        self._kinds = kinds
+        self.teams = list(teams)
+        self._categories = categories
+        self.version = version
+        self.columns = list(arrays)
+        self._lookups = {}
+        for values in arrays.values():
+            values.setflags(write=False)
+        self._length = len(next(iter(arrays.values()))) if arrays else 0
+
+    @classmethod
+    def from_rows(cls, columns, rows, version=None):
+        """
+        Build a store from the rows of a query (e.g. pyodbc cursor.fetchall()), column by column.
+
+        Args:
+            columns: The column names of the rows
+            rows: Sequences of values (None for NULL)
+            version: Version of the data
+        """
+        values = dict(zip(columns, zip(*rows))) if rows else {column: () for column in columns}
+        teams = sorted({team for column in cls.TEAM_COLUMNS if column in values
+                        for team in values[column] if team is not None})
+        team_codes = {team: code for code, team in enumerate(teams)}
+
+        arrays, kinds, categories = {}, {}, {}
+        for column, column_values in values.items():
+            present = [value for value in column_values if value is not None]
+            sample = present[0] if present else None
+            if column in cls.TEAM_COLUMNS:
+                kinds[column] = "team"
+                arrays[column] = np.array([team_codes.get(value, -1) for value in column_values], dtype=np.int32)
+            elif isinstance(sample, (datetime.date, datetime.datetime)) and not isinstance(sample, datetime.time):
+                kinds[column] = "date"
+                arrays[column] = np.array([np.datetime64(value, "D") if value is not None else np.datetime64("NaT")
+                                           for value in column_values], dtype="datetime64[s]")
+            elif isinstance(sample, (bytes, bytearray)):
+                kinds[column] = "binary"
+                width = max(len(value) for value in present)
+                matrix = np.zeros((len(column_values), width + 1), dtype=np.uint8)
+                for i, value in enumerate(column_values):
+                    if value is not None:
+                        # Right aligned (big-endian integers), last byte = not NULL
+                        matrix[i, width - len(value):width] = np.frombuffer(bytes(value), dtype=np.uint8)
+                        matrix[i, width] = 1
+                arrays[column] = matrix
+            elif present and all(isinstance(value, (int, np.integer)) and not isinstance(value, bool) for value in present):
+                if len(present) == len(column_values):
+                    kinds[column] = "int"
+                    arrays[column] = np.array(column_values, dtype=np.int64)
+                else:
+                    kinds[column] = "nullable_int"
+                    arrays[column] = np.array([np.nan if value is None else value for value in column_values], dtype=np.float64)
+            elif present and all(isinstance(value, (int, float, np.number)) and not isinstance(value, bool) for value in present):
+                kinds[column] = "float"
+                arrays[column] = np.array([np.nan if value is None else value for value in column_values], dtype=np.float64)
+            else:
+                # Text (times as HH:MM:SS, like DataLoader): dictionary encoded
+                kinds[column] = "code"
+                text = [value.strftime('%H:%M:%S') if isinstance(value, datetime.time) else value for value in column_values]
+                categories[column] = sorted({value for value in text if value is not None}, key=str)
+                codes = {value: code for code, value in enumerate(categories[column])}
+                arrays[column] = np.array([codes.get(value, -1) if value is not None else -1 for value in text], dtype=np.int32)
+
+        return cls(cls._sorted(arrays, kinds), kinds, teams, categories, version)
+
+    @classmethod
+    def _sorted(cls, arrays, kinds):
+        # Sorted by date (NULL dates last), then by MatchID
+        if kinds.get(cls.DATE_COLUMN) != "date" or not len(arrays[cls.DATE_COLUMN]):
+            return arrays
+        keys = [arrays["MatchID"]] if "MatchID" in arrays else []
+        order = np.lexsort(keys + [arrays[cls.DATE_COLUMN]])
+        return {column: array[order] for column, array in arrays.items()}
+
+    @classmethod
+    def from_records(cls, records, version=None):
+        """
+        Build a store from match dictionaries (e.g. DataLoader.load_from_database); the history
+        names (Date, Time) are stored under the columns of the table.
+        """
+        columns = list(dict.fromkeys(column for record in records for column in record))
+        names = [cls.ALIASES.get(column, column) for column in columns]
+        rows = [[_parsed(column, record.get(column)) for column in columns] for record in records]
+        return cls.from_rows(names, rows, version)
+
+    def __len__(self):
+        return self._length
+
+    def __contains__(self, column):
+        return self.ALIASES.get(column, column) in self._arrays
+
+    def __iter__(self):
+        return (MatchRow(self, index) for index in range(self._length))
+
+    def row(self, index: int) -> MatchRow:
+        return MatchRow(self, index)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self._arrays.values())
+
+    def column(self, column):
+        """
+        The read-only array of a column (codes for teams and text, see teams and categories).
+        """
+        return self._arrays[self.ALIASES.get(column, column)]
+
+    def categories(self, column):
+        column = self.ALIASES.get(column, column)
+        return self.teams if self._kinds[column] == "team" else self._categories[column]
+
+    def value(self, column, index):
+        """
+        The value of a column for one match, as returned by DataLoader.
+        """
+        return self.decoded(column, index, index + 1)[0]
+
+    def decoded(self, column, start=0, stop=None):
+        """
+        The values of a column as a list of Python values (None for NULL), as returned by DataLoader.
+        """
+        column = self.ALIASES.get(column, column)
+        values = self._arrays[column][start:stop]
+        kind = self._kinds[column]
+        if kind in ("team", "code"):
+            lookup = self._lookups.get(column)
+            if lookup is None:
+                # Code -1 (NULL) -> None
+                lookup = self._lookups[column] = np.array(list(self.categories(column)) + [None], dtype=object)
+            return lookup[values].tolist()
+        if kind == "date":
+            return [None if value == "NaT" else value for value in np.datetime_as_string(values, unit="D").tolist()]
+        if kind == "binary":
+            return [int.from_bytes(value[:-1].tobytes(), "big") if value[-1] else None for value in values]
+        if kind == "int":
+            return values.tolist()
+        if kind == "nullable_int":
+            return [None if value != value else int(value) for value in values.tolist()]
+        return [None if value != value else value for value in values.tolist()]
+
+    def since(self, date) -> "MatchStore":
+        """
+        The matches played on or after a date, as a store over views of the same columns.
+        """
+        if not self._length:
+            return self
+        start = int(np.searchsorted(self._arrays[self.DATE_COLUMN], np.datetime64(pd.Timestamp(date).date(), "s"), side="left"))
+        return self._slice(start, self._length)
+
+    def _slice(self, start, stop):
+        store = MatchStore.__new__(MatchStore)
+        store._arrays = {column: array[start:stop] for column, array in self._arrays.items()}
+        store._kinds = self._kinds
+        store.teams = self.teams
+        store._categories = self._categories
+        store._lookups = self._lookups
+        store.version = self.version
+        store.columns = self.columns
+        store._length = max(0, stop - start)
+        return store
+
+    def watermark(self) -> int:
+        """
+        The highest RowVersion of the matches (0 without a RowVersion column).
+        """
+        if "RowVersion" not in self._arrays:
+            return 0
+        return max((value for value in self.decoded("RowVersion") if value is not None), default=0)
+
+    def upsert(self, delta, version=None) -> "MatchStore":
+        """
+        A new store with the matches of delta (e.g. the rows changed since the watermark) replacing
+        the matches with the same MatchID and the others added. Text codes are re-encoded over the
+        union of the values, so the store itself is left unchanged.
+
+        Args:
+            delta (MatchStore): The changed matches
+            version: Version of the data of the new store
+        """
+        if not len(delta):
+            return MatchStore(dict(self._arrays), self._kinds, self.teams, self._categories, version)
+        replaced = np.isin(self._arrays["MatchID"], delta._arrays["MatchID"])
+        keep = np.flatnonzero(~replaced)
+        teams = sorted(set(self.teams) | set(delta.teams))
+        arrays, kinds, categories = {}, {}, {}
+        for column in self.columns:
+            kind, base = self._kinds[column], self._arrays[column][keep]
+            if column in delta._arrays:
+                delta_kind, added = delta._kinds[column], delta._arrays[column]
+            else:
+                delta_kind, added = "code", np.full(len(delta), -1, dtype=np.int32)
+            # Columns of NULL only are read as text without values: take the kind of the other side
+            if delta_kind == "code" and not delta._categories.get(column) and kind != "code":
+                delta_kind, added = _nullable(kind), _nulls(kind, base, len(delta))
+            elif kind == "code" and not self._categories.get(column) and delta_kind != "code":
+                kind, base = _nullable(delta_kind), _nulls(delta_kind, added, len(base))
+
+            if kind == "team":
+                kinds[column] = "team"
+                arrays[column] = np.concatenate([_recoded(base, self.teams, teams), _recoded(added, delta.teams, teams)])
+            elif kind == "code":
+                old, new = self._categories.get(column, []), delta._categories.get(column, [])
+                categories[column] = sorted(set(old) | set(new), key=str)
+                arrays[column] = np.concatenate([_recoded(base, old, categories[column]), _recoded(added, new, categories[column])])
+                kinds[column] = "code"
+            elif kind == "binary":
+                width = max(base.shape[1], added.shape[1])
+                arrays[column] = np.concatenate([_padded(base, width), _padded(added, width)])
+                kinds[column] = "binary"
+            elif kind == delta_kind:
+                arrays[column] = np.concatenate([base, added])
+                kinds[column] = kind
+            else:
+                # int and nullable_int -> nullable_int, any float -> float
+                kinds[column] = "nullable_int" if {kind, delta_kind} <= {"int", "nullable_int"} else "float"
+                arrays[column] = np.concatenate([base.astype(np.float64), added.astype(np.float64)])
+        return MatchStore(self._sorted(arrays, kinds), kinds, teams, categories, version)
+
+    def save(self, directory) -> str:
+        """
+        Write the store to a new subdirectory of directory named after its version (one .npy file
+        per column and a layout.json), then make it the current one and remove the previous ones.
+        The subdirectory is renamed into place once complete, so a reader never sees a partial store.
+
+        Returns:
+            str: The path of the saved store.
+        """
+        name = str(self.version or "unversioned").replace(":", "_")
+        path = os.path.join(directory, name)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(tmp_path, exist_ok=True)
+        for i, column in enumerate(self.columns):
+            np.save(os.path.join(tmp_path, f"{i}.npy"), np.ascontiguousarray(self._arrays[column]))
+        layout = {"version": self.version, "columns": self.columns, "kinds": self._kinds, "teams": self.teams,
+                  "categories": self._categories, "length": self._length}
+        with open(os.path.join(tmp_path, "layout.json"), "w") as layout_file:
+            json.dump(layout, layout_file)
+        if os.path.isdir(path):
+            # Same version already saved (by another worker process)
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        else:
+            os.replace(tmp_path, path)
+
+        pointer = os.path.join(directory, "current")
+        with open(f"{pointer}.{os.getpid()}.{threading.get_ident()}.tmp", "w") as pointer_file:
+            pointer_file.write(name)
+        os.replace(f"{pointer}.{os.getpid()}.{threading.get_ident()}.tmp", pointer)
+        # Processes still mapping a removed store keep their pages until they drop it
+        for entry in os.listdir(directory):
+            if entry not in (name, "current") and not entry.endswith(".tmp"):
+                shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+        logging.info(f"MatchStore::save -> {self._length} matches saved to {path}.")
+        return path
+
+    @classmethod
+    def open(cls, directory):
+        """
+        Map the current store saved in directory (read-only memory maps, nothing is parsed).
+
+        Returns:
+            MatchStore: The saved store, or None if there is none or it cannot be read.
+        """
+        try:
+            with open(os.path.join(directory, "current")) as pointer_file:
+                path = os.path.join(directory, pointer_file.read().strip())
+            with open(os.path.join(path, "layout.json")) as layout_file:
+                layout = json.load(layout_file)
+            arrays = {column: np.load(os.path.join(path, f"{i}.npy"), mmap_mode="r")
+                      for i, column in enumerate(layout["columns"])}
+        except (OSError, ValueError) as e:
+            logging.info(f"MatchStore::open -> No saved store in {directory}: {e}")
+            return None
+        if any(len(array) != layout["length"] for array in arrays.values()):
+            logging.warning(f"MatchStore::open -> Saved store {path} is incomplete, ignored.")
+            return None
+        store = cls(arrays, layout["kinds"], layout["teams"], layout["categories"], layout["version"])
+        logging.info(f"MatchStore::open -> {len(store)} matches of version {store.version} mapped from {path}.")
+        return store
+
+    def to_records(self, columns=None) -> list:
+        """
+        The matches as dictionaries (table column names), as returned by DataLoader.
+        """
+        columns = columns or self.columns
+        decoded = [self.decoded(column) for column in columns]
+        return [dict(zip(columns, values)) for values in zip(*decoded)]
+
+    def history_frame(self, columns=None) -> pd.DataFrame:
+        """
+        The match history in the form of DataLoader.load_from_database (HISTORY_COLUMNS names),
+        with categorical teams over the team codes, datetime64 dates and numeric statistics.
+        """
+        frame = {}
+        for name in columns or self.HISTORY_COLUMNS:
+            column = self.ALIASES.get(name, name)
+            if column not in self._arrays:
+                continue
+            kind = self._kinds[column]
+            values = self._arrays[column]
+            if kind in ("team", "code"):
+                values = pd.Categorical.from_codes(values, categories=self.categories(column))
+            elif kind == "binary":
+                values = self.decoded(column)
+            frame[name] = values
+        return pd.DataFrame(frame)
+
+
+def _recoded(codes, categories, new_categories):
+    # Codes over categories -> codes over new_categories (a superset), -1 (NULL) kept
+    index = {value: code for code, value in enumerate(new_categories)}
+    mapping = np.array([index[value] for value in categories] + [-1], dtype=np.int32)
+    return mapping[codes]
+
+
+def _padded(matrix, width):
+    # Binary matrices (values right aligned, NULL flag last) widened to width bytes
+    if matrix.shape[1] == width:
+        return matrix
+    padded = np.zeros((matrix.shape[0], width), dtype=np.uint8)
+    padded[:, width - matrix.shape[1]:] = matrix
+    return padded
+
+
+def _nulls(kind, like, length):
+    # A column of NULL values of the kind of like
+    if kind in ("team", "code"):
+        return np.full(length, -1, dtype=np.int32)
+    if kind == "date":
+        return np.full(length, np.datetime64("NaT"), dtype=like.dtype)
+    if kind == "binary":
+        return np.zeros((length, like.shape[1]), dtype=np.uint8)
+    return np.full(length, np.nan, dtype=np.float64)
+
+
+def _nullable(kind):
+    return "nullable_int" if kind == "int" else kind
+
+
+def _parsed(column, value):
+    # Dates of the match dictionaries are YYYY-MM-DD strings
+    if column in ("Date", "MatchDate") and isinstance(value, str):
+        return datetime.date.fromisoformat(value[:10])
+    return value
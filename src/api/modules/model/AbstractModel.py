@@ -1,4 +1,7 @@
 from abc import ABC, abstractmethod
+from sklearn.metrics import brier_score_loss, classification_report, f1_score, log_loss, precision_score, recall_score, accuracy_score
+import logging
+import json
 
 
 class AbstractModel(ABC):
@@ -7,10 +10,74 @@ class AbstractModel(ABC):
     This class serves as a template for creating specific data models.
     """
 
+    # Name of the model in the logs and the tournament results
+    name = "Model"
+    # Trained on the match context (team, opponent, venue, goals, Date) instead of the
+    # averaged features, see DataProcessor.process_data
+    uses_context = False
+
     def __init__(self):
         super().__init__()
         self.model = None
-        
+
+    def evaluate(self, X_test, y_test):
+        """
+        Performance of the trained model on the test set, the same metrics for every implementation
+        (self.model must provide predict, predict_proba and classes_ like a scikit-learn classifier).
+        """
+        y_pred = self.model.predict(X_test)
+
+        # For log loss and brier score, we need predicted probabilities
+        if hasattr(self.model, "predict_proba"):
+            y_proba = self.model.predict_proba(X_test)
+        else:
+            y_proba = None  # Some models might not support predict_proba
+
+        # Metrics
+        accuracy = accuracy_score(y_test, y_pred)
+        precision = precision_score(y_test, y_pred, average='weighted', zero_division=0)
+        recall = recall_score(y_test, y_pred, average='weighted', zero_division=0)
+        f1 = f1_score(y_test, y_pred, average='weighted', zero_division=0)
+
+        # Initialize defaults
+        logloss = None
+        brier = None
+
+        # Log loss requires probabilities and multi-class support
+        if y_proba is not None:
+            try:
+                logloss = log_loss(y_test, y_proba, labels=self.model.classes_)
+                # Brier score is typically used for binary classification, but we can calculate it for each class and average
+                brier = brier_score_loss(y_test, y_proba, labels=[-1, 0, 1])
+            except Exception as e:
+                print(f"Error calculating logloss or Brier for {self.name}: {e}")
+
+        performance = {
+            'Accuracy': "{:.5f}".format(accuracy),
+            'Precision': "{:.5f}".format(precision),
+            'Recall': "{:.5f}".format(recall),
+            'F1-Score': "{:.5f}".format(f1),
+            'LogLoss': None if logloss is None else "{:.5f}".format(logloss),
+            'BrierScore': None if brier is None else "{:.5f}".format(brier)
+        }
+
+        # Print classification report
+        logging.info(f"\nClassification Report for {self.name}:\n")
+        logging.info("\n"+classification_report(y_test, y_pred, labels=self.model.classes_, target_names=[['Loss', 'Draw', 'Win'][c + 1] for c in self.model.classes_], zero_division=0))
+
+        # 6. Model Evaluation
+        logging.info("\nModel Performance Summary:\n"+json.dumps(performance, indent=4))
+        return performance
+
+    def predict_fixtures(self, fixtures, samples):
+        """
+        Predict the outcome probabilities of a batch of fixtures.
+        :param fixtures: (home team, away team) pairs.
+        :param samples: Their features as built by DataProcessor (two rows per fixture).
+        :return: np.ndarray of shape (n_matches, 3): home win, draw and home loss probabilities.
+        """
+        return self.predict_matches(samples)
+
     @abstractmethod
     def train(self,X_train, X_test, y_train, y_test):
         """
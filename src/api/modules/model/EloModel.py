@@ -0,0 +1,113 @@
+from modules.model.AbstractModel import AbstractModel
+from modules.model.PoissonGoalsModel import DixonColesEstimator
+from modules.processor.EloRatings import EloRatingEngine
+from sklearn.linear_model import LogisticRegression
+import numpy as np
+import copy
+
+
+class EloClassifier:
+    """
+    Rating-based classifier: the Elo ratings before kickoff (EloRatingEngine) mapped to
+    Loss/Draw/Win probabilities by a logistic regression on the rating difference.
+    Follows the scikit-learn classifier interface on the rows of DataProcessor (team, opponent,
+    venue, goals_for, goals_against, Date), like DixonColesEstimator.
+    """
+    classes_ = np.array([-1, 0, 1])
+
+    def __init__(self, rating_engine=None):
+        self.rating_engine = rating_engine or EloRatingEngine()
+        self.classifier = LogisticRegression(max_iter=1000)
+
+    def _row_features(self, X, rating_engine):
+        # Stream the matches of the rows through the engine and read the ratings before kickoff
+        matches = DixonColesEstimator.matches_from_rows(X)
+        before = rating_engine.add_matches(matches)
+        home_features, _ = rating_engine.pair_features(before[:, 0], before[:, 1])
+        elo_diff = dict(zip(zip(matches['Date'].to_numpy(), matches['HomeTeam'].to_numpy(), matches['AwayTeam'].to_numpy()),
+                            home_features['elo_diff']))
+
+        is_home = X['venue'].to_numpy() == 0
+        team = X['team'].astype(str).to_numpy()
+        opponent = X['opponent'].astype(str).to_numpy()
+        home = np.where(is_home, team, opponent)
+        away = np.where(is_home, opponent, team)
+        keys = zip(X['Date'].astype('datetime64[ns]').to_numpy(), home, away)
+        home_diff = np.fromiter((elo_diff[key] for key in keys), dtype=np.float64, count=X.shape[0])
+        # Rating difference from the point of view of the row team, and its venue
+        return np.column_stack([np.where(is_home, home_diff, -home_diff), X['venue'].to_numpy()]) / [400, 1]
+
+    def fit(self, X, y):
+        self.rating_engine = EloRatingEngine(self.rating_engine.k, self.rating_engine.home_advantage,
+                                             self.rating_engine.initial_rating)
+        self.classifier.fit(self._row_features(X, self.rating_engine), np.asarray(y))
+        return self
+
+    def predict_proba(self, X):
+        # The matches to predict update a copy of the ratings, so each one is predicted
+        # from the ratings before its kickoff and the fitted ratings are left unchanged
+        return self.classifier.predict_proba(self._row_features(X, copy.deepcopy(self.rating_engine)))
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def update_ratings(self, X):
+        """
+        Stream the matches of rows played after the fitted ones into the ratings (the classifier is unchanged).
+
+        Returns:
+            int: The number of matches added.
+        """
+        return self.rating_engine.update_from(DixonColesEstimator.matches_from_rows(X))
+
+    def outcome_proba(self, home_teams, away_teams):
+        """
+        Home win, draw and home loss probabilities of a batch of fixtures from the current ratings.
+        """
+        home_ratings = np.array([self.rating_engine.rating(team) for team in home_teams], dtype=np.float64)
+        away_ratings = np.array([self.rating_engine.rating(team) for team in away_teams], dtype=np.float64)
+        features = np.column_stack([(home_ratings - away_ratings) / 400, np.zeros(len(home_ratings))])
+        # Loss, Draw, Win of the home team -> Win, Draw, Loss
+        return self.classifier.predict_proba(features)[:, ::-1]
+
+
+class EloModel (AbstractModel):
+    """
+    Rating-based model for predicting match outcomes from the Elo ratings of the teams.
+    Trained on the match context (see DataProcessor.process_data with_context).
+    """
+    name = "EloRatings"
+    uses_context = True
+
+    def __init__(self, model=None):
+        super().__init__()
+        self.model = model if model is not None else EloClassifier()
+
+    def train(self, X_train, X_test, y_train, y_test, assess_predictions=True):
+        """
+        Stream the training matches through the ratings, fit the outcome probabilities and
+        evaluate them on the test matches. The test matches are then added to the ratings, so
+        that the fixtures are predicted from the ratings after the last known match.
+        """
+        self.model.fit(X_train, y_train)
+
+        performance = self.evaluate(X_test, y_test) if assess_predictions else None
+        if X_test is not None and X_test.shape[0] > 0:
+            self.model.update_ratings(X_test)
+        return performance
+
+    def save_model_to_blob(self, blob_storage_path, file_name):
+        raise NotImplementedError("This method should be implemented in subclasses.")
+
+    def load_model_from_blob(self, blob_storage_path, file_name):
+        raise NotImplementedError("This method should be implemented in subclasses.")
+
+    def predict_fixtures(self, fixtures, samples=None):
+        """
+        Predict the outcome probabilities of a batch of fixtures from the current ratings
+        (the averaged features are not used).
+        :param fixtures: (home team, away team) pairs.
+        :return: np.ndarray of shape (n_matches, 3): home win, draw and home loss probabilities.
+        """
+        home_teams, away_teams = zip(*fixtures) if len(fixtures) else ((), ())
+        return self.model.outcome_proba(home_teams, away_teams)
@@ -0,0 +1,16 @@
+from modules.model.LinRegModel import LinRegModel
+from sklearn.ensemble import HistGradientBoostingClassifier
+
+
+class GradientBoostingModel (LinRegModel):
+    """
+    Histogram gradient boosting model for predicting match outcomes.
+    Same features, training, metrics and predictions as LinRegModel, with a
+    gradient boosted trees classifier instead of the logistic regression.
+    """
+    name = "HistGradientBoosting"
+
+    def __init__(self, model=None):
+        super().__init__(model if model is not None else HistGradientBoostingClassifier(
+            learning_rate=0.05, max_iter=300, max_leaf_nodes=15, min_samples_leaf=40,
+            l2_regularization=1.0, early_stopping=True, validation_fraction=0.15, random_state=42))
@@ -1,16 +1,15 @@
 from modules.model.AbstractModel import AbstractModel
-from sklearn.metrics import brier_score_loss, classification_report, f1_score, log_loss, precision_score, recall_score, accuracy_score
 from sklearn.linear_model import LogisticRegression
 import pandas as pd
 import numpy as np
 import logging
-import json
 
 class LinRegModel (AbstractModel):
     """
     Linear Regression Model for predicting match outcomes.
     This class implements the train method to fit a linear regression model.
     """
+    name = "LogisticRegression"
 
     def __init__(self,model=None):
         super().__init__()
@@ -23,57 +22,12 @@ class LinRegModel (AbstractModel):
         """
         Train the linear regression model using the provided training data.
         """
-        # Dictionary to store model performance
-        performance = {}
-
         self.model.fit(X_train, y_train)
         
         if not assess_predictions:
             return
 
-        y_pred = self.model.predict(X_test)
-
-        # For log loss and brier score, we need predicted probabilities
-        if hasattr(self.model, "predict_proba"):
-            y_proba = self.model.predict_proba(X_test)
-        else:
-            y_proba = None  # Some models might not support predict_proba
-
-        # Metrics
-        accuracy = accuracy_score(y_test, y_pred)
-        precision = precision_score(y_test, y_pred, average='weighted', zero_division=0)
-        recall = recall_score(y_test, y_pred, average='weighted', zero_division=0)
-        f1 = f1_score(y_test, y_pred, average='weighted', zero_division=0)
-
-        # Initialize defaults
-        logloss = None
-        brier = None
-
-        # Log loss requires probabilities and multi-class support
-        if y_proba is not None:
-            try:
-                logloss = log_loss(y_test, y_proba)
-                # Brier score is typically used for binary classification, but we can calculate it for each class and average
-                brier = brier_score_loss(y_test, y_proba, labels=[-1, 0, 1])
-            except Exception as e:
-                print(f"Error calculating logloss or Brier for LogisticRegression: {e}")
-
-        performance = {
-            'Accuracy': "{:.5f}".format(accuracy),
-            'Precision': "{:.5f}".format(precision),
-            'Recall': "{:.5f}".format(recall),
-            'F1-Score': "{:.5f}".format(f1),
-            'LogLoss': "{:.5f}".format(logloss),
-            'BrierScore': "{:.5f}".format(brier)
-        }
-
-        # Print classification report
-        logging.info(f"\nClassification Report for LogisticRegression:\n")
-        logging.info("\n"+classification_report(y_test, y_pred, target_names=[['Loss', 'Draw', 'Win'][c + 1] for c in self.model.classes_]))
-
-        # 6. Model Evaluation
-        logging.info("\nModel Performance Summary:\n"+json.dumps(performance, indent=4))
-        return performance
+        return self.evaluate(X_test, y_test)
 
         
 
@@ -90,6 +44,20 @@ class LinRegModel (AbstractModel):
         """
         raise NotImplementedError("This method should be implemented in subclasses.")
     
+    def predict_matches(self, samples):
+        """
+        Predict the outcome probabilities of a batch of matches in one matrix inference.
+        :param samples: Features with two rows per match, the home team (venue = 0) then the away team (venue = 1),
+            as built by DataProcessor.
+        :return: np.ndarray of shape (n_matches, 3): home win, draw and home loss probabilities.
+        """
+        # Columns follow classes_: Loss = -1, Draw = 0, Win = 1 from the point of view of the row team
+        proba = self.model.predict_proba(samples)
+        home = proba[0::2, ::-1] # Reversed for the home team: Win, Draw, Loss
+        away = proba[1::2] # Loss, Draw, Win of the away team = Win, Draw, Loss of the home team
+        # Average the results for both predictions
+        return (home + away) / 2
+
     def predict(self, samples):
         """
         Predict the outcomes using the trained model.
@@ -0,0 +1,165 @@
+import os
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threadpoolctl import threadpool_limits
+from modules.model.LinRegModel import LinRegModel
+from modules.model.GradientBoostingModel import GradientBoostingModel
+from modules.model.PoissonGoalsModel import PoissonGoalsModel
+from modules.model.EloModel import EloModel
+from modules.model.SharedFrameStore import SharedFrameStore
+
+# Models competing in the tournament: name -> AbstractModel implementation (created without arguments)
+CANDIDATES = {
+    "logistic": LinRegModel,
+    "gradient_boosting": GradientBoostingModel,
+    "poisson_goals": PoissonGoalsModel,
+    "elo_ratings": EloModel,
+}
+
+# Frames shared with the workers (see SharedFrameStore)
+SHARED_FRAMES = ["X_train", "X_test", "y_train", "y_test", "context_train", "context_test"]
+
+
+class ModelTournament:
+    """
+    Train and evaluate several AbstractModel implementations on the same features and keep the best one.
+
+    The feature matrices are written once to a SharedFrameStore which every worker process maps
+    read-only (instead of pickling one copy of the features per candidate), and the candidates are
+    fitted in parallel in a process pool, so the wall-clock time is about the one of the slowest candidate.
+    Every candidate reports the metrics of AbstractModel.evaluate; the winner has the lowest
+    log loss (ties broken by accuracy).
+    """
+
+    def __init__(self, candidates=None, max_workers=None, scratch_dir=None):
+        """
+        Args:
+            candidates: Names of the competing models (keys of CANDIDATES, all of them by default)
+            max_workers: Number of worker processes (defaults to one per candidate, at most the CPU count)
+            scratch_dir: Directory of the memory-mapped features (defaults to the temp directory)
+        """
+        candidates = list(candidates or CANDIDATES.keys())
+        unknown = [name for name in candidates if name not in CANDIDATES]
+        if unknown:
+            raise ValueError(f"ModelTournament -> Unknown candidates {unknown}, expected some of {list(CANDIDATES)}.")
+        self.candidates = candidates
+        self.max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(candidates)))
+        self.scratch_dir = scratch_dir
+
+    def run(self, X_train, X_test, y_train, y_test, context_train=None, context_test=None) -> dict:
+        """
+        Run the tournament on the features returned by DataProcessor.process_data (with_context=True
+        for the candidates trained on the match context, which fail without it).
+
+        Returns:
+            dict: {"winner": name, "model": the trained winner, "performance": its metrics,
+                   "results": {name: {"performance", "fit_seconds"} or {"error"}}}
+        """
+        started = time.perf_counter()
+        frames = {"X_train": X_train, "X_test": X_test, "y_train": y_train, "y_test": y_test,
+                  "context_train": context_train, "context_test": context_test}
+        if self.max_workers == 1:
+            outcomes = {name: _play(name, frames) for name in self.candidates}
+        else:
+            outcomes = self._run_parallel(frames)
+
+        results = {}
+        best = None
+        for name, outcome in outcomes.items():
+            if "error" in outcome:
+                logging.error(f"ModelTournament::run -> Candidate '{name}' failed: {outcome['error']}")
+                results[name] = {"error": outcome["error"]}
+                continue
+            results[name] = {"performance": outcome["performance"], "fit_seconds": outcome["fit_seconds"]}
+            if best is None or _rank(outcome["performance"]) < _rank(outcomes[best]["performance"]):
+                best = name
+        if best is None:
+            raise RuntimeError(f"ModelTournament::run -> Every candidate failed: {results}")
+
+        logging.info(f"ModelTournament::run -> Winner '{best}' out of {len(self.candidates)} candidates "
+                     f"in {time.perf_counter() - started:.1f}s ({self.max_workers} workers).")
+        return {"winner": best, "model": outcomes[best]["model"],
+                "performance": outcomes[best]["performance"], "results": results}
+
+    def _run_parallel(self, frames) -> dict:
+        with SharedFrameStore(scratch_dir=self.scratch_dir) as store:
+            for key, frame in frames.items():
+                store.put(key, frame)
+            jobs = {name: (_play_shared, name) for name in self.candidates}
+            return run_jobs(jobs, store, self.max_workers, "ModelTournament")
+
+
+def run_jobs(jobs, store, max_workers, caller):
+    """
+    Run jobs on the frames of a SharedFrameStore in a process pool, falling back to this
+    process when no pool can be started.
+
+    Args:
+        jobs: key -> (function, *args); function(store, *args) must be a module level function
+        store: The SharedFrameStore the workers map
+        max_workers: Number of worker processes
+        caller: Name of the caller in the logs
+
+    Returns:
+        dict: key -> result of the job, or {"error": message} if it raised
+    """
+    # Split the CPU between the workers so the native thread pools do not oversubscribe it
+    threads = max(1, (os.cpu_count() or 1) // max_workers)
+    results = {}
+    try:
+        # Spawned, not forked: the callers (Functions host, training job thread) are multi-threaded
+        # and a forked child could inherit locks held by other threads (logging, BLAS, azure SDK)
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {key: pool.submit(_run_job, store.data_dir, threads, *job) for key, job in jobs.items()}
+            for key, future in futures.items():
+                try:
+                    results[key] = future.result()
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    results[key] = {"error": f"{type(e).__name__}: {e}"}
+    except (BrokenProcessPool, OSError) as e:
+        # No usable process pool in this sandbox: run the remaining jobs in this process
+        logging.warning(f"{caller}::run_jobs -> Process pool unavailable ({e}), running sequentially.")
+        for key, (function, *args) in jobs.items():
+            if key not in results:
+                try:
+                    results[key] = function(store, *args)
+                except Exception as e:
+                    results[key] = {"error": f"{type(e).__name__}: {e}"}
+    return results
+
+
+def _run_job(data_dir, threads, function, *args):
+    # Runs in a worker process
+    with threadpool_limits(limits=threads):
+        return function(SharedFrameStore(data_dir), *args)
+
+
+def _rank(performance):
+    # Lowest log loss first, then highest accuracy (a missing log loss ranks last)
+    logloss = performance.get("LogLoss")
+    return (float("inf") if logloss is None else float(logloss), -float(performance.get("Accuracy") or 0))
+
+
+def _play_shared(store, name):
+    return _play(name, {key: store.get(key) for key in SHARED_FRAMES})
+
+
+def _play(name, data):
+    started = time.perf_counter()
+    try:
+        model = CANDIDATES[name]()
+        if model.uses_context:
+            if data["context_train"] is None:
+                raise ValueError("the match context is required (DataProcessor.process_data with_context=True)")
+            X_train, X_test = data["context_train"], data["context_test"]
+        else:
+            X_train, X_test = data["X_train"], data["X_test"]
+        performance = model.train(X_train, X_test, data["y_train"], data["y_test"])
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    return {"model": model, "performance": performance, "fit_seconds": round(time.perf_counter() - started, 3)}
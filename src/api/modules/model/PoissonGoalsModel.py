@@ -0,0 +1,247 @@
+from modules.model.AbstractModel import AbstractModel
+from scipy.optimize import minimize
+from scipy.special import gammaln
+import pandas as pd
+import numpy as np
+import logging
+
+
+class DixonColesEstimator:
+    """
+    Dixon-Coles goals model: the home and away goals are Poisson distributed with
+    log(home rate) = home advantage + attack[home] - defence[away] and
+    log(away rate) = attack[away] - defence[home], with the Dixon-Coles correction (rho) of the
+    0-0, 1-0, 0-1 and 1-1 scores and an exponential time decay of the weight of old matches.
+
+    The weighted log-likelihood and its gradient are computed over all the matches at once
+    (per team sums with np.bincount), so a refit on every season is a few L-BFGS iterations over
+    NumPy arrays. Follows the scikit-learn classifier interface (fit, predict, predict_proba,
+    classes_) on the rows of DataProcessor (team, opponent, venue, goals_for, goals_against, Date),
+    so it is evaluated with the same metrics as the other models.
+    """
+    classes_ = np.array([-1, 0, 1])
+
+    def __init__(self, decay=0.0019, alpha=1.0, max_goals=10):
+        """
+        Parameters:
+            decay (float): Time decay per day of the weight of a match (0 = every match has the same weight).
+            alpha (float): L2 penalty of the attack and defence ratings (keeps them identifiable and
+                shrinks the teams with few matches to the average).
+            max_goals (int): Size of the score grid (0 to max_goals - 1 goals per team).
+        """
+        self.decay = decay
+        self.alpha = alpha
+        self.max_goals = max_goals
+        self.teams = []
+        self.team_index = {}
+        self.attack = np.zeros(0)
+        self.defence = np.zeros(0)
+        self.home_advantage = 0.0
+        self.rho = 0.0
+
+    @staticmethod
+    def matches_from_rows(X):
+        """
+        One row per match (HomeTeam, AwayTeam, FTHG, FTAG, Date) from the rows of DataProcessor,
+        where a match can appear twice (home team row and away team row).
+        """
+        venue = X['venue'].to_numpy()
+        is_home = venue == 0
+        team = X['team'].astype(str).to_numpy()
+        opponent = X['opponent'].astype(str).to_numpy()
+        goals_for = X['goals_for'].to_numpy(dtype=np.float64)
+        goals_against = X['goals_against'].to_numpy(dtype=np.float64)
+        matches = pd.DataFrame({
+            'HomeTeam': np.where(is_home, team, opponent),
+            'AwayTeam': np.where(is_home, opponent, team),
+            'FTHG': np.where(is_home, goals_for, goals_against),
+            'FTAG': np.where(is_home, goals_against, goals_for),
+            'Date': pd.to_datetime(X['Date']).to_numpy(),
+        })
+        return matches.drop_duplicates(subset=['Date', 'HomeTeam', 'AwayTeam'])
+
+    def fit(self, X, y=None):
+        """
+        Fit the ratings on the rows of DataProcessor (see matches_from_rows).
+        """
+        return self.fit_matches(self.matches_from_rows(X))
+
+    def fit_matches(self, matches):
+        """
+        Fit the ratings on one row per match (HomeTeam, AwayTeam, FTHG, FTAG, Date).
+        """
+        matches = matches.dropna(subset=['FTHG', 'FTAG'])
+        codes, teams = pd.factorize(np.concatenate([matches['HomeTeam'].to_numpy(), matches['AwayTeam'].to_numpy()]), sort=True)
+        self.teams = list(teams)
+        self.team_index = {team: code for code, team in enumerate(self.teams)}
+        n_matches, n_teams = matches.shape[0], len(self.teams)
+        home, away = codes[:n_matches], codes[n_matches:]
+        home_goals = matches['FTHG'].to_numpy(dtype=np.float64)
+        away_goals = matches['FTAG'].to_numpy(dtype=np.float64)
+        dates = pd.to_datetime(matches['Date']).to_numpy(dtype='datetime64[D]').astype(np.int64)
+        weights = np.exp(-self.decay * (dates.max() - dates)) if n_matches > 0 else np.zeros(0)
+
+        # Low scores corrected by rho
+        s00 = (home_goals == 0) & (away_goals == 0)
+        s01 = (home_goals == 0) & (away_goals == 1)
+        s10 = (home_goals == 1) & (away_goals == 0)
+        s11 = (home_goals == 1) & (away_goals == 1)
+
+        def objective(params):
+            attack, defence = params[:n_teams], params[n_teams:2 * n_teams]
+            home_advantage, rho = params[-2], params[-1]
+            log_lambda = home_advantage + attack[home] - defence[away]
+            log_mu = attack[away] - defence[home]
+            lam, mu = np.exp(log_lambda), np.exp(log_mu)
+
+            tau = np.ones(n_matches)
+            tau[s00] = 1 - lam[s00] * mu[s00] * rho
+            tau[s01] = 1 + lam[s01] * rho
+            tau[s10] = 1 + mu[s10] * rho
+            tau[s11] = 1 - rho
+            tau = np.maximum(tau, 1e-10)
+
+            log_likelihood = weights @ (home_goals * log_lambda - lam + away_goals * log_mu - mu + np.log(tau))
+            penalty = self.alpha * (attack @ attack + defence @ defence)
+
+            # Derivatives of the weighted log-likelihood by log(lambda), log(mu) and rho
+            d_lambda = home_goals - lam
+            d_mu = away_goals - mu
+            d_rho = np.zeros(n_matches)
+            d_lambda[s00] -= lam[s00] * mu[s00] * rho / tau[s00]
+            d_mu[s00] -= lam[s00] * mu[s00] * rho / tau[s00]
+            d_rho[s00] = -lam[s00] * mu[s00] / tau[s00]
+            d_lambda[s01] += lam[s01] * rho / tau[s01]
+            d_rho[s01] = lam[s01] / tau[s01]
+            d_mu[s10] += mu[s10] * rho / tau[s10]
+            d_rho[s10] = mu[s10] / tau[s10]
+            d_rho[s11] = -1 / tau[s11]
+            d_lambda *= weights
+            d_mu *= weights
+
+            gradient = np.empty_like(params)
+            gradient[:n_teams] = np.bincount(home, d_lambda, n_teams) + np.bincount(away, d_mu, n_teams) - 2 * self.alpha * attack
+            gradient[n_teams:2 * n_teams] = -np.bincount(away, d_lambda, n_teams) - np.bincount(home, d_mu, n_teams) - 2 * self.alpha * defence
+            gradient[-2] = d_lambda.sum()
+            gradient[-1] = weights @ d_rho
+            # Minimize the negative penalized log-likelihood
+            return penalty - log_likelihood, -gradient
+
+        initial = np.zeros(2 * n_teams + 2)
+        initial[-2] = 0.25
+        bounds = [(None, None)] * (2 * n_teams + 1) + [(-0.2, 0.2)]
+        result = minimize(objective, initial, jac=True, method='L-BFGS-B', bounds=bounds)
+        if not result.success:
+            logging.warning(f"DixonColesEstimator::fit -> Optimization did not converge: {result.message}")
+
+        params = result.x
+        self.attack, self.defence = params[:n_teams], params[n_teams:2 * n_teams]
+        self.home_advantage, self.rho = float(params[-2]), float(params[-1])
+        return self
+
+    def _codes(self, teams):
+        # Unknown teams get the average ratings (index n_teams, a zero rating)
+        return np.fromiter((self.team_index.get(team, len(self.teams)) for team in teams), dtype=np.int64)
+
+    def rates(self, home_teams, away_teams):
+        """
+        Expected home and away goals of a batch of fixtures.
+        """
+        attack = np.append(self.attack, 0.0)
+        defence = np.append(self.defence, 0.0)
+        home, away = self._codes(home_teams), self._codes(away_teams)
+        return (np.exp(self.home_advantage + attack[home] - defence[away]),
+                np.exp(attack[away] - defence[home]))
+
+    def score_grid(self, home_teams, away_teams):
+        """
+        Score probabilities of a batch of fixtures.
+
+        Returns:
+            np.ndarray: (n_fixtures, max_goals, max_goals), [i, h, a] = P(fixture i ends h - a).
+        """
+        lam, mu = self.rates(home_teams, away_teams)
+        goals = np.arange(self.max_goals)
+        log_factorials = gammaln(goals + 1)
+        home_pmf = np.exp(goals * np.log(lam)[:, None] - lam[:, None] - log_factorials)
+        away_pmf = np.exp(goals * np.log(mu)[:, None] - mu[:, None] - log_factorials)
+        grid = home_pmf[:, :, None] * away_pmf[:, None, :]
+        grid[:, 0, 0] *= 1 - lam * mu * self.rho
+        grid[:, 0, 1] *= 1 + lam * self.rho
+        grid[:, 1, 0] *= 1 + mu * self.rho
+        grid[:, 1, 1] *= 1 - self.rho
+        return grid
+
+    def outcome_proba(self, home_teams, away_teams):
+        """
+        Home win, draw and home loss probabilities of a batch of fixtures.
+        """
+        grid = self.score_grid(home_teams, away_teams)
+        home_win = np.tril(np.ones((self.max_goals, self.max_goals)), -1)
+        outcomes = np.stack([(grid * home_win).sum(axis=(1, 2)),
+                             np.trace(grid, axis1=1, axis2=2),
+                             (grid * home_win.T).sum(axis=(1, 2))], axis=1)
+        # Renormalize the mass beyond the grid
+        return outcomes / outcomes.sum(axis=1, keepdims=True)
+
+    def predict_proba(self, X):
+        """
+        Loss, Draw, Win probabilities of the team of every row of DataProcessor (columns follow classes_).
+        """
+        is_home = X['venue'].to_numpy() == 0
+        team = X['team'].astype(str).to_numpy()
+        opponent = X['opponent'].astype(str).to_numpy()
+        outcomes = self.outcome_proba(np.where(is_home, team, opponent), np.where(is_home, opponent, team))
+        # Home team row: Loss = home loss, Win = home win; away team row: the reverse
+        return np.where(is_home[:, None], outcomes[:, ::-1], outcomes)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class PoissonGoalsModel (AbstractModel):
+    """
+    Team attack/defence goals model (Dixon-Coles) for predicting match outcomes and scores.
+    Trained on the team identities and goals of the matches instead of the averaged features
+    (see DataProcessor.process_data with_context).
+    """
+    name = "DixonColesPoisson"
+    uses_context = True
+
+    def __init__(self, model=None):
+        super().__init__()
+        self.model = model if model is not None else DixonColesEstimator()
+
+    def train(self, X_train, X_test, y_train, y_test, assess_predictions=True):
+        """
+        Fit the team ratings on the training matches and evaluate the outcome probabilities on the test matches.
+        """
+        self.model.fit(X_train, y_train)
+
+        if not assess_predictions:
+            return
+
+        return self.evaluate(X_test, y_test)
+
+    def save_model_to_blob(self, blob_storage_path, file_name):
+        raise NotImplementedError("This method should be implemented in subclasses.")
+
+    def load_model_from_blob(self, blob_storage_path, file_name):
+        raise NotImplementedError("This method should be implemented in subclasses.")
+
+    def predict_fixtures(self, fixtures, samples=None):
+        """
+        Predict the outcome probabilities of a batch of fixtures from the team ratings
+        (the averaged features are not used).
+        :param fixtures: (home team, away team) pairs.
+        :return: np.ndarray of shape (n_matches, 3): home win, draw and home loss probabilities.
+        """
+        home_teams, away_teams = zip(*fixtures) if len(fixtures) else ((), ())
+        return self.model.outcome_proba(home_teams, away_teams)
+
+    def score_grid(self, fixtures):
+        """
+        Score probabilities of a batch of fixtures, see DixonColesEstimator.score_grid.
+        """
+        home_teams, away_teams = zip(*fixtures) if len(fixtures) else ((), ())
+        return self.model.score_grid(home_teams, away_teams)
@@ -0,0 +1,104 @@
+import os
+import json
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+
+class SharedFrameStore:
+    """
+    DataFrames written once to memory-mapped .npy files in a scratch directory, so that worker
+    processes map them read-only instead of receiving a pickled copy each (the pages are shared
+    through the OS page cache).
+
+    Numeric frames are stored as one float64 matrix (a DataFrame over it is a view of the mapped
+    pages); other frames column by column, categoricals as integer codes and dates as int64.
+    Used as a context manager, the directory is removed on exit.
+    """
+
+    def __init__(self, data_dir=None, scratch_dir=None):
+        """
+        Args:
+            data_dir: Directory of an existing store (in the worker processes)
+            scratch_dir: Parent of a new store directory (defaults to the temp directory)
+        """
+        self.owner = data_dir is None
+        self.data_dir = data_dir or tempfile.mkdtemp(prefix="frames_", dir=scratch_dir)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.owner:
+            shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def _path(self, name):
+        return os.path.join(self.data_dir, name)
+
+    def _write_array(self, name, values):
+        shared = np.lib.format.open_memmap(self._path(f"{name}.npy"), mode="w+", dtype=values.dtype, shape=values.shape)
+        shared[...] = values
+        shared.flush()
+        del shared
+
+    def _read_array(self, name):
+        return np.load(self._path(f"{name}.npy"), mmap_mode="r")
+
+    def put(self, key, frame):
+        """
+        Write a DataFrame or a Series (its index is not kept).
+        """
+        if frame is None:
+            return
+        layout = {"series": isinstance(frame, pd.Series)}
+        if layout["series"]:
+            layout["name"] = frame.name
+            frame = frame.to_frame(name="values")
+        layout["columns"] = list(frame.columns)
+        if all(pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) for dtype in frame.dtypes) \
+                and not layout["series"]:
+            layout["kind"] = "matrix"
+            self._write_array(key, frame.to_numpy(dtype=np.float64))
+        else:
+            layout["kind"] = "columns"
+            layout["categories"] = {}
+            layout["dates"] = []
+            for i, col in enumerate(frame.columns):
+                values = frame[col]
+                if isinstance(values.dtype, pd.CategoricalDtype):
+                    layout["categories"][col] = values.cat.categories.tolist()
+                    values = values.cat.codes
+                elif pd.api.types.is_datetime64_any_dtype(values.dtype):
+                    layout["dates"].append(col)
+                    values = values.astype("datetime64[ns]").astype(np.int64)
+                self._write_array(f"{key}.{i}", values.to_numpy())
+        with open(self._path(f"{key}.json"), "w") as layout_file:
+            json.dump(layout, layout_file)
+
+    def get(self, key):
+        """
+        Map a frame written by put (None if there is none).
+        """
+        if not os.path.exists(self._path(f"{key}.json")):
+            return None
+        with open(self._path(f"{key}.json")) as layout_file:
+            layout = json.load(layout_file)
+        if layout["kind"] == "matrix":
+            # No copy: the DataFrame is a view of the mapped pages
+            return pd.DataFrame(self._read_array(key), columns=layout["columns"], copy=False)
+
+        columns = {}
+        for i, col in enumerate(layout["columns"]):
+            values = self._read_array(f"{key}.{i}")
+            if col in layout["categories"]:
+                values = pd.Categorical.from_codes(values, categories=layout["categories"][col])
+            elif col in layout["dates"]:
+                values = np.asarray(values).astype("datetime64[ns]")
+            columns[col] = values
+        if layout["series"]:
+            return pd.Series(columns["values"], name=layout["name"], copy=False)
+        return pd.DataFrame(columns, copy=False)
@@ -0,0 +1,146 @@
+import os
+import time
+import logging
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from modules.processor.DataProcessor import DataProcessor
+from modules.model.SharedFrameStore import SharedFrameStore
+from modules.model.ModelTournament import CANDIDATES, run_jobs
+
+# Metrics averaged over the folds, weighted by the number of test rows
+SUMMARY_METRICS = ["Accuracy", "LogLoss", "BrierScore"]
+
+
+class WalkForwardBacktester:
+    """
+    Walk-forward evaluation of models: at every season (or month, or week) boundary a model is
+    trained on all the matches played before it and tested on the matches up to the next boundary.
+
+    The features of the whole history are built once (every feature of a row only depends on
+    the previous matches, see DataProcessor.build_features) and sorted by date, so each fold is
+    two row ranges of the same matrix instead of a new feature computation. The independent
+    (fold, model) jobs run in a process pool on a SharedFrameStore of the features.
+    """
+    FREQUENCIES = ["season", "month", "week"]
+
+    def __init__(self, processor=None, candidates=None, frequency="season", warmup_seasons=2,
+                 season_start_month=7, max_workers=None, scratch_dir=None):
+        """
+        Args:
+            processor: The DataProcessor building the features (default features when not given)
+            candidates: Names of the models to evaluate (keys of ModelTournament.CANDIDATES, logistic by default)
+            frequency: Retraining boundaries: "season", "month" or "week" (about one matchday)
+            warmup_seasons: Seasons only used for training before the first test fold
+            season_start_month: First month of a season
+            max_workers: Number of worker processes (defaults to the CPU count)
+            scratch_dir: Directory of the memory-mapped features (defaults to the temp directory)
+        """
+        if frequency not in self.FREQUENCIES:
+            raise ValueError(f"WalkForwardBacktester -> Unknown frequency '{frequency}', expected one of {self.FREQUENCIES}.")
+        self.candidates = list(candidates or ["logistic"])
+        unknown = [name for name in self.candidates if name not in CANDIDATES]
+        if unknown:
+            raise ValueError(f"WalkForwardBacktester -> Unknown candidates {unknown}, expected some of {list(CANDIDATES)}.")
+        self.processor = processor or DataProcessor()
+        self.frequency = frequency
+        self.warmup_seasons = warmup_seasons
+        self.season_start_month = season_start_month
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.scratch_dir = scratch_dir
+
+    def boundaries(self, dates):
+        """
+        The retraining dates: from the end of the warm-up seasons to after the last match.
+        """
+        first, last = dates.min(), dates.max()
+        first_season = first.year if first.month >= self.season_start_month else first.year - 1
+        start = pd.Timestamp(first_season + self.warmup_seasons, self.season_start_month, 1)
+        if self.frequency == "season":
+            frequency = pd.DateOffset(years=1)
+        elif self.frequency == "month":
+            frequency = pd.DateOffset(months=1)
+        else:
+            frequency = pd.DateOffset(weeks=1)
+        return list(pd.date_range(start, last + frequency, freq=frequency))
+
+    def run(self, data) -> dict:
+        """
+        Backtest the candidates on a match history.
+
+        Args:
+            data: The match history as returned by DataLoader.load_from_database
+
+        Returns:
+            dict: {"frequency", "candidates", "folds": [per fold and candidate: start, end, train_rows,
+                   test_rows, performance or error], "summary": {candidate: weighted metrics over the folds}}
+        """
+        started = time.perf_counter()
+        features = self.processor.build_features(data).sort_values("Date", kind="stable").reset_index(drop=True)
+        dates = features["Date"]
+        bounds = self.boundaries(dates)
+        # Rows are sorted by date: a fold is the rows between two positions
+        positions = np.searchsorted(dates.to_numpy(), np.array(bounds, dtype="datetime64[ns]"), side="left")
+        folds = [(bounds[i], bounds[i + 1], int(positions[i]), int(positions[i + 1]))
+                 for i in range(len(bounds) - 1) if positions[i + 1] > positions[i] and positions[i] > 0]
+        if not folds:
+            raise ValueError("WalkForwardBacktester::run -> Not enough history for a test fold after the warm-up seasons.")
+
+        frames = {"X": features[self.processor.get_predictors()], "y": features["result"],
+                  "context": features[DataProcessor.CONTEXT_COLUMNS]}
+        jobs = {(name, i): (_run_fold, name, train_end, test_end)
+                for i, (_, _, train_end, test_end) in enumerate(folds) for name in self.candidates}
+        max_workers = max(1, min(self.max_workers, len(jobs)))
+        if max_workers == 1:
+            outcomes = {key: _play_fold(frames, *job[1:]) for key, job in jobs.items()}
+        else:
+            with SharedFrameStore(scratch_dir=self.scratch_dir) as store:
+                for key, frame in frames.items():
+                    store.put(key, frame)
+                outcomes = run_jobs(jobs, store, max_workers, "WalkForwardBacktester")
+
+        report_folds = []
+        for (name, i), outcome in sorted(outcomes.items(), key=lambda item: (item[0][1], item[0][0])):
+            start, end, train_end, test_end = folds[i]
+            report_folds.append({"candidate": name, "start": start.strftime("%Y-%m-%d"), "end": end.strftime("%Y-%m-%d"),
+                                 "train_rows": train_end, "test_rows": test_end - train_end, **outcome})
+        report = {"frequency": self.frequency, "candidates": self.candidates, "folds": report_folds,
+                  "summary": {name: _summary([fold for fold in report_folds if fold["candidate"] == name])
+                              for name in self.candidates}}
+        logging.info(f"WalkForwardBacktester::run -> {len(jobs)} folds backtested in {time.perf_counter() - started:.1f}s "
+                     f"({max_workers} workers): {report['summary']}")
+        return report
+
+
+def _summary(folds):
+    scored = [fold for fold in folds if "performance" in fold]
+    summary = {"folds": len(scored), "failed_folds": len(folds) - len(scored), "test_rows": sum(fold["test_rows"] for fold in scored)}
+    for metric in SUMMARY_METRICS:
+        values = [(float(fold["performance"][metric]), fold["test_rows"]) for fold in scored
+                  if fold["performance"].get(metric) is not None]
+        total = sum(rows for _, rows in values)
+        summary[metric] = round(sum(value * rows for value, rows in values) / total, 5) if total else None
+    return summary
+
+
+def _run_fold(store, name, train_end, test_end):
+    return _play_fold({key: store.get(key) for key in ("X", "y", "context")}, name, train_end, test_end)
+
+
+def _play_fold(frames, name, train_end, test_end):
+    started = time.perf_counter()
+    try:
+        model = CANDIDATES[name]()
+        y = frames["y"]
+        y_train, y_test = y.iloc[:train_end], y.iloc[train_end:test_end]
+        if model.uses_context:
+            X_train, X_test = frames["context"].iloc[:train_end], frames["context"].iloc[train_end:test_end]
+        else:
+            # Scaled on the training rows of the fold only, as in DataProcessor.process_data
+            scaler = StandardScaler().set_output(transform="pandas")
+            X_train = scaler.fit_transform(frames["X"].iloc[:train_end])
+            X_test = scaler.transform(frames["X"].iloc[train_end:test_end])
+        performance = model.train(X_train, X_test, y_train, y_test)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    return {"performance": performance, "fit_seconds": round(time.perf_counter() - started, 3)}
@@ -1,7 +1,13 @@
-from tokenize import group
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder, StandardScaler
+from sklearn.preprocessing import StandardScaler
+from datetime import datetime
+from modules.processor.HeadToHeadIndex import HeadToHeadIndex
+from modules.processor.RollingFeatures import RollingFeatureEngine
+from modules.processor.EloRatings import EloRatingEngine
+from modules.loader.MatchStore import MatchStore
 import logging
+import io
 
 class DataProcessor:
     """
@@ -9,168 +15,173 @@ class DataProcessor:
     It includes methods for filtering, transforming, and validating data.
     """
 
-    def __init__(self):
+    # Rolling windows (number of previous matches) and columns averaged by default
+    DEFAULT_WINDOWS = [5, 10, 15]
+    DEFAULT_COLS_4_AVG = ["goals_for", "goals_against", "shots", "shots_on_target", "yellow_cards", "red_cards", "Win", "Loss", "Draw"] # , "fouls", "corners"
+    # Elo ratings in the features by default (training and backtest; the snapshot follows the model)
+    DEFAULT_RATINGS = False
+
+    def __init__(self, windows=None, cols_4_avg=None, ratings=None):
         """
         Initialize the DataProcessor.
+
+        Parameters:
+            windows (list[int]): The rolling windows of the averaged features (defaults to DEFAULT_WINDOWS).
+            cols_4_avg (list[str]): The averaged columns (defaults to DEFAULT_COLS_4_AVG).
+            ratings (bool): Add the Elo ratings before kickoff to the features (see EloRatingEngine,
+                defaults to DEFAULT_RATINGS).
         """
-        pass
-
-    def add_averages(self, group, cols, windows):
-        group = group.sort_values("Date")
-        
-        for window in windows:
-            new_cols = [f"{col}_avg{window}" for col in cols]
-            averages_stats = group[cols].rolling(window=window, closed='left').mean()
-            group[new_cols] = averages_stats
-            group = group.dropna(subset=new_cols) 
-        
-        return group
-    
-    def add_h2h_stats(self, group):
-        opponents_grouped = group.groupby('opponent')
-        for opponent, h2h_df in opponents_grouped:
-            h2h_df = h2h_df.sort_values('Date')
-            
-            for index, row in h2h_df.iterrows():
-                prev_matches = h2h_df[h2h_df['Date'] < row.Date]
-                prev_matches_home = prev_matches[prev_matches['venue'] == 0]
-                prev_matches_guest = prev_matches[prev_matches['venue'] == 1]
-
-                group.loc[group['Date'] == row.Date, 'h2h_home_win'] = 0
-                group.loc[group['Date'] == row.Date, 'h2h_home_draw'] = 0
-                group.loc[group['Date'] == row.Date, 'h2h_home_loss'] = 0
-                group.loc[group['Date'] == row.Date, 'h2h_guest_win'] = 0
-                group.loc[group['Date'] == row.Date, 'h2h_guest_draw'] = 0
-                group.loc[group['Date'] == row.Date, 'h2h_guest_loss'] = 0
-                row[['h2h_home_win', 'h2h_home_draw', 'h2h_home_loss', 
-                     'h2h_guest_win', 'h2h_guest_draw', 'h2h_guest_loss']] = pd.Series([0, 0, 0, 0, 0, 0])
-                
-                if prev_matches_home.shape[0] > 0:
-                    group.loc[group['Date'] == row.Date, 'h2h_home_win'] = prev_matches_home['Win'].mean()
-                    group.loc[group['Date'] == row.Date, 'h2h_home_draw'] = prev_matches_home['Draw'].mean()
-                    group.loc[group['Date'] == row.Date, 'h2h_home_loss'] = prev_matches_home['Loss'].mean()
-                if prev_matches_guest.shape[0] > 0:
-                    group.loc[group['Date'] == row.Date, 'h2h_guest_win'] = prev_matches_guest['Win'].mean()
-                    group.loc[group['Date'] == row.Date, 'h2h_guest_draw'] = prev_matches_guest['Draw'].mean()
-                    group.loc[group['Date'] == row.Date, 'h2h_guest_loss'] = prev_matches_guest['Loss'].mean()
-
-        return group
+        self.rolling_engine = RollingFeatureEngine(cols_4_avg or self.DEFAULT_COLS_4_AVG,
+                                                   windows or self.DEFAULT_WINDOWS)
+        self.windows = self.rolling_engine.windows
+        self.cols_4_avg = self.rolling_engine.columns
+        self.ratings = self.DEFAULT_RATINGS if ratings is None else bool(ratings)
+
+    def get_feature_config(self):
+        """
+        The feature configuration, saved with the model so that predictions use the same features.
+        """
+        return {"windows": self.windows, "columns": self.cols_4_avg, "ratings": self.ratings}
     
     def filter_dataset_4_stats(self, data, upcoming_matches_df):
         """
         Filter the dataset to include only matches that are relevant for statistics.
+        Returns the last matches of every team, the head to head rates of every
+        upcoming match (see _h2h_pair_rates) and the averaged columns.
         """
         teams_set = set(upcoming_matches_df['HomeTeam']) | set(upcoming_matches_df['AwayTeam'])
         df, cols_4_avg = self.get_df_transformed(data, add_stats=False)  # Get DataFrame without additional stats
         df = df.sort_values(by='Date', ascending = False)
 
-        last_matches = { team : df[df['team'] == team].head(15) for team in teams_set}
+        # One pass over the history: the last matches of the upcoming teams, grouped once
+        recent = df[df['team'].isin(teams_set)].groupby('team', observed=True).head(max(self.windows))
+        grouped = dict(tuple(recent.groupby('team', observed=True)))
+        last_matches = {team: grouped.get(team, recent.iloc[:0]) for team in teams_set}
 
-        h2h_matches = {}
-        for team, opponent in upcoming_matches_df[['HomeTeam', 'AwayTeam']].itertuples(index=False, name=None):
-            df_4_stats = df[(df['team'] == team) & (df['opponent'] == opponent)].sort_values(by='Date', ascending = False)
-            h2h_matches[(team, opponent)] = df_4_stats
+        h2h_index = HeadToHeadIndex()
+        h2h_index.add_matches(df)
+        h2h_rates = self._h2h_pair_rates(h2h_index, upcoming_matches_df)
 
-        return last_matches, h2h_matches, cols_4_avg
+        return last_matches, h2h_rates, cols_4_avg
     
     def get_df_transformed(self, data, add_stats = True):
-        df = pd.DataFrame(data)
-        # cols = df.columns.tolist()
-        # Display basic information
-        # print("\nDataset Info:")
-        # print(df.info())
-        # print("\nFirst 5 rows:")
-        # print(df.head())
-        # print("\nColumn Names:")
-        # print(df.columns.tolist())
-
-        columns_to_retain_hosts = ['Date',
-                                    'HomeTeam', 'AwayTeam', 
-                                    'FTHG', 'FTAG',
-                                    'HS', 'HST',
-                                    'HF', 'HC',
-                                    'HY', 'HR',
-                                    'FTR']
-        columns_to_retain_guests = ['Date',
-                                    'HomeTeam', 'AwayTeam', 
-                                    'FTHG', 'FTAG',
-                                    'AS', 'AST',
-                                    'AF', 'AC',
-                                    'AY', 'AR',
-                                    'FTR']
-            
-        df_hosts = df[columns_to_retain_hosts].rename(columns={'HomeTeam': 'team', 'AwayTeam' : 'opponent',
-                                                        'FTHG': 'goals_for', 'FTAG': 'goals_against',
-                                                        'HS': 'shots', 'HST': 'shots_on_target',
-                                                        'HF': 'fouls', 'HC': 'corners',
-                                                        'HY': 'yellow_cards', 'HR': 'red_cards',
-                                                        'FTR': 'result'})
-
-        df_guests = df[columns_to_retain_guests].rename(columns={'HomeTeam': 'opponent', 'AwayTeam' : 'team',
-                                                        'FTHG': 'goals_against', 'FTAG': 'goals_for',
-                                                        'AS': 'shots', 'AST': 'shots_on_target',
-                                                        'AF': 'fouls', 'AC': 'corners',
-                                                        'AY': 'yellow_cards', 'AR': 'red_cards',
-                                                        'FTR': 'result'})
-        df_hosts["venue"] = 0 # Home
-        df_guests["venue"] = 1 # Away
+        """
+        Transform the matches into one row per team and match (the home team with venue = 0
+        and the away team with venue = 1).
+        Teams are categorical (shared categories for team and opponent), results and outcomes
+        int8, statistics float32 and dates datetime64.
+        """
+        df = matches_frame(data)
 
-        # Win = 1, Draw = 0, Loss = -1
-        df_hosts.result = df_hosts.result.apply(lambda x: 1 if x == 'H' else (0 if x == 'D' else -1))
-        df_guests.result = df_guests.result.apply(lambda x: 1 if x == 'A' else (0 if x == 'D' else -1))
+        teams = pd.unique(pd.concat([df['HomeTeam'], df['AwayTeam']]).dropna())
+        team_dtype = pd.CategoricalDtype(sorted(teams))
 
-        df = pd.concat([df_hosts, df_guests])
+        # Transformed column -> (column of the home team row, column of the away team row)
+        stats_columns = {'goals_for': ('FTHG', 'FTAG'), 'goals_against': ('FTAG', 'FTHG'),
+                         'shots': ('HS', 'AS'), 'shots_on_target': ('HST', 'AST'),
+                         'fouls': ('HF', 'AF'), 'corners': ('HC', 'AC'),
+                         'yellow_cards': ('HY', 'AY'), 'red_cards': ('HR', 'AR')}
 
-        df["Win"] = df['result'].apply(lambda x: 1 if x == 1 else 0)
-        df["Loss"] = df['result'].apply(lambda x: 1 if x == -1 else 0)
-        df["Draw"] = df['result'].apply(lambda x: 1 if x == 0 else 0)
+        def stacked(home_values, away_values):
+            return np.concatenate([np.asarray(home_values), np.asarray(away_values)])
 
-        # Add averages for last 5, 10, and 15 matches
-        cols_4_avg = ["goals_for", "goals_against", "shots", "shots_on_target", "yellow_cards", "red_cards", "Win", "Loss", "Draw"] # , "fouls", "corners"
+        dates = pd.to_datetime(df['Date']).to_numpy()
+        home_teams = df['HomeTeam'].astype(team_dtype)
+        away_teams = df['AwayTeam'].astype(team_dtype)
+        transformed = {
+            'Date': stacked(dates, dates),
+            'team': pd.Categorical.from_codes(stacked(home_teams.cat.codes, away_teams.cat.codes), dtype=team_dtype),
+            'opponent': pd.Categorical.from_codes(stacked(away_teams.cat.codes, home_teams.cat.codes), dtype=team_dtype),
+        }
+        for col, (home_col, away_col) in stats_columns.items():
+            transformed[col] = stacked(pd.to_numeric(df[home_col], errors='coerce').to_numpy(dtype=np.float32),
+                                       pd.to_numeric(df[away_col], errors='coerce').to_numpy(dtype=np.float32))
+
+        # Win = 1, Draw = 0, Loss = -1
+        ftr = df['FTR'].to_numpy()
+        result = stacked(np.select([ftr == 'H', ftr == 'D'], [1, 0], default=-1).astype(np.int8),
+                         np.select([ftr == 'A', ftr == 'D'], [1, 0], default=-1).astype(np.int8))
+        transformed['result'] = result
+        transformed['venue'] = stacked(np.zeros(df.shape[0], dtype=np.int8), np.ones(df.shape[0], dtype=np.int8)) # 0 = Home, 1 = Away
+
+        transformed['Win'] = (result == 1).astype(np.int8)
+        transformed['Loss'] = (result == -1).astype(np.int8)
+        transformed['Draw'] = (result == 0).astype(np.int8)
+        if add_stats and self.ratings:
+            # Ratings before kickoff, streaming over the matches in date order
+            rating_engine = EloRatingEngine()
+            before = rating_engine.add_matches(df)
+            home_features, away_features = rating_engine.pair_features(before[:, 0], before[:, 1])
+            for feature in EloRatingEngine.FEATURES:
+                transformed[feature] = stacked(home_features[feature], away_features[feature]).astype(np.float32)
+        df = pd.DataFrame(transformed)
+
+        # Columns averaged over the last matches (see self.windows)
+        cols_4_avg = self.cols_4_avg
         if add_stats:
-            # Add head 2 head statistics
-            df_with_h2h = df.reindex(columns=df.columns.tolist() + 
-                                    ['h2h_home_win', 'h2h_home_draw', 'h2h_home_loss', 
-                                     'h2h_guest_win', 'h2h_guest_draw', 'h2h_guest_loss']) # 'h2h_win', 'h2h_loss',
-
-            df_with_h2h = df_with_h2h.groupby('team').apply(lambda x: self.add_h2h_stats(x))
-            df_with_h2h = df_with_h2h.droplevel('team')
-            df_with_h2h.index = range(df_with_h2h.shape[0])
+            # Add head 2 head statistics, computed from the previous meetings only
+            df = df.reset_index(drop=True)
+            df_with_h2h = pd.concat([df, HeadToHeadIndex().h2h_features(df)], axis=1)
             
-            df_with_h2h = df_with_h2h.reindex(columns=df_with_h2h.columns.tolist() + 
-                                    [f"{col}_avg{window}" for window in [5, 10, 15] for col in cols_4_avg])  # Add columns for averages
-            df_with_avg = df_with_h2h.groupby('team').apply(lambda x: self.add_averages(x, cols_4_avg, [5, 10, 15]))
-            df_with_avg = df_with_avg.droplevel('team')
-            df_with_avg.index = range(df_with_avg.shape[0])  # Reset index after groupby operation
+            # Add averages over the previous matches of every team for each window
+            df_with_avg = self.rolling_engine.transform(df_with_h2h)
 
             return df_with_avg, cols_4_avg
         return df, cols_4_avg
 
-    def process_data(self, data, current_date=None):
+    # Match context of the rows, for the models trained on the teams and goals (see AbstractModel.uses_context)
+    CONTEXT_COLUMNS = ['team', 'opponent', 'venue', 'goals_for', 'goals_against', 'Date']
+
+    def get_predictors(self):
+        """
+        The feature columns the models are trained on, in order.
+        """
+        predictors = ['venue', # , 'opp_code', 'team_code'
+              'h2h_home_win', 'h2h_home_draw', 'h2h_home_loss', 'h2h_guest_win', 'h2h_guest_draw', 'h2h_guest_loss']
+        predictors += self.rolling_engine.feature_names()
+        if self.ratings:
+            predictors += EloRatingEngine.FEATURES
+        return predictors
+
+    def build_features(self, data):
+        """
+        The unscaled features of every (team, match) row of the history. Every feature of a row
+        only depends on the matches played before it, so the rows can be split at any date
+        without recomputing them (see process_data and WalkForwardBacktester).
+
+        Returns:
+            pd.DataFrame: The rows sorted by team and date, with get_predictors(), CONTEXT_COLUMNS and result.
+        """
+        df_with_avg, cols_4_avg = self.get_df_transformed(data)
+        numeric_cols = df_with_avg.select_dtypes('number').columns
+        df_with_avg[numeric_cols] = df_with_avg[numeric_cols].fillna(0)
+
+        # team and opponent share the same categories, so the codes are consistent
+        df_with_avg['team_code'] = df_with_avg['team'].cat.codes
+        df_with_avg["opp_code"] = df_with_avg['opponent'].cat.codes
+        return df_with_avg
+
+    def process_data(self, data, current_date=None, with_context=False):
         """
         Process the input data.
         This method should be overridden by subclasses to implement specific processing logic.
         Parameters:
-            data (list[dict]): The input data to be processed.
+            data (list[dict] | MatchStore): The input data to be processed.
             current_date (str): The current date for filtering the data.
+            with_context (bool): Also return the match context (CONTEXT_COLUMNS) of the
+                training and test rows, aligned with X_train and X_test.
         """
         if current_date is None:
             current_date = '2024-07-01'
+        current_date = pd.Timestamp(current_date)
 
-        df_with_avg, cols_4_avg = self.get_df_transformed(data)
-        df_with_avg = df_with_avg.fillna(0)
-
-        le = LabelEncoder()
-        df_with_avg['team_code'] = le.fit_transform(df_with_avg['team'])
-        df_with_avg["opp_code"] = le.fit_transform(df_with_avg['opponent'])
+        df_with_avg = self.build_features(data)
 
         # Split the data into training and testing sets: test on >= 2024/2025 season
         train = df_with_avg[df_with_avg['Date'] < current_date]
         test = df_with_avg[df_with_avg['Date'] > current_date]
 
-        predictors = ['venue', # , 'opp_code', 'team_code'
-              'h2h_home_win', 'h2h_home_draw', 'h2h_home_loss', 'h2h_guest_win', 'h2h_guest_draw', 'h2h_guest_loss']
-        predictors += [f"{col}_avg{window}" for window in [5, 10, 15] for col in cols_4_avg]
+        predictors = self.get_predictors()
 
         print(f"Predictors count: {len(predictors)}")
 
@@ -187,39 +198,191 @@ class DataProcessor:
         print(f"X_train shape: {X_train.shape}, Y_train shape: {y_train.shape}")
         print(f"X_test shape: {X_test.shape}, Y_test shape: {y_test.shape}")
 
+        if with_context:
+            return X_train, X_test, y_train, y_test, train[self.CONTEXT_COLUMNS], test[self.CONTEXT_COLUMNS]
         return X_train, X_test, y_train, y_test
 
-    def get_samples_to_predict_from_json(self, data, json_data) :
-        df = pd.read_json(json_data)
+    def get_samples_to_predict_from_json(self, data, json_data, rating_engine=None) :
+        """
+        Build the prediction features from the match history.
+
+        Parameters:
+            data (list[dict] | MatchStore): The match history, at least the last matches of the teams to predict.
+            json_data (str): JSON list of upcoming matches (HomeTeam, AwayTeam, Date, Time).
+            rating_engine (EloRatingEngine): The current ratings, when data is not the whole history
+                (the ratings are computed from data otherwise).
+        Returns:
+            pd.DataFrame: The scaled features, two rows per match (home and away point of view).
+        """
+        df = pd.read_json(io.StringIO(json_data))
         df['Date'] = pd.to_datetime(df['Date'], format='%d/%m/%Y')
-        last_matches, h2h_matches, cols_4_avg = self.filter_dataset_4_stats(data, df)
+        last_matches, h2h_rates, cols_4_avg = self.filter_dataset_4_stats(data, df)
+
+        team_averages = {}
+        for team, last_match in last_matches.items():
+            team_averages[team] = {f"{col}_avg{window}": last_match.head(window)[col].mean()
+                                   for window in self.windows for col in cols_4_avg}
+
+        if not self.ratings:
+            rating_engine = None
+        elif rating_engine is None:
+            rating_engine = EloRatingEngine()
+            rating_engine.add_matches(matches_frame(data))
+        return self._build_samples(h2h_rates, team_averages, rating_engine)
+
+    def get_samples_from_snapshot(self, snapshot, json_data):
+        """
+        Build the prediction features from a materialized feature snapshot
+        (see build_feature_snapshot) instead of the full match history.
+
+        Parameters:
+            snapshot (dict): The snapshot returned by build_feature_snapshot.
+            json_data (str): JSON list of upcoming matches (HomeTeam, AwayTeam, Date, Time).
+        Returns:
+            pd.DataFrame: The scaled features, two rows per match (home and away point of view).
+        """
+        df = pd.read_json(io.StringIO(json_data))
+        feature_names = [f"{col}_avg{window}" for window in snapshot['windows'] for col in snapshot['columns']]
+
+        h2h_index = HeadToHeadIndex.from_dict(snapshot['h2h'], snapshot.get('last_match_date'))
+        h2h_rates = self._h2h_pair_rates(h2h_index, df)
+
+        team_averages = {}
+        for team in set(df['HomeTeam']) | set(df['AwayTeam']):
+            averages = snapshot['teams'].get(team, {})
+            team_averages[team] = {feature: averages.get(feature, float('nan')) for feature in feature_names}
+
+        rating_engine = EloRatingEngine.from_dict(snapshot['ratings']) if self.ratings else None
+        return self._build_samples(h2h_rates, team_averages, rating_engine)
+
+    def build_feature_snapshot(self, data, previous_snapshot=None):
+        """
+        Materialize the latest form of every team so that the prediction features
+        can be looked up without transforming the whole history.
+
+        The snapshot holds, per team, the averages of cols_4_avg over the last matches for
+        each window and, per (team, opponent) pair, the Win/Draw/Loss counts when the team played
+        at home and away against that opponent (see HeadToHeadIndex.to_dict), and the current
+        Elo ratings (see EloRatingEngine.to_dict).
+
+        Parameters:
+            data (list[dict] | MatchStore): The match history as returned by DataLoader.load_from_database.
+            previous_snapshot (dict): Optional previous snapshot; its head to head index and
+                ratings are updated incrementally with the matches played since it was built.
+        Returns:
+            dict: A JSON serializable snapshot.
+        """
+        windows = self.windows
+        df, cols_4_avg = self.get_df_transformed(data, add_stats=False)
+        df = df.sort_values(by='Date', ascending=False)
+
+        teams = {}
+        for team, last_match in df.groupby('team', observed=True).head(max(windows)).groupby('team', observed=True):
+            teams[team] = {f"{col}_avg{window}": float(last_match.head(window)[col].mean())
+                           for window in windows for col in cols_4_avg}
+
+        h2h_index = None
+        if previous_snapshot and previous_snapshot.get('last_match_date'):
+            h2h_index = HeadToHeadIndex.from_dict(previous_snapshot['h2h'], previous_snapshot['last_match_date'])
+            h2h_index.update(df)
+            if h2h_index.total() != df.shape[0]:
+                # Matches were inserted or removed before the last snapshot: rebuild it from scratch
+                logging.info("DataProcessor::build_feature_snapshot::Head to head index out of sync, rebuilding it.")
+                h2h_index = None
+        if h2h_index is None:
+            h2h_index = HeadToHeadIndex()
+            h2h_index.add_matches(df)
+
+        matches = matches_frame(data)
+        rating_engine = None
+        if previous_snapshot and previous_snapshot.get('ratings'):
+            rating_engine = EloRatingEngine.from_dict(previous_snapshot['ratings'])
+            rating_engine.update_from(matches)
+            if rating_engine.matches_count != matches.shape[0]:
+                # Matches were inserted or removed before the last snapshot: replay the history
+                logging.info("DataProcessor::build_feature_snapshot::Ratings out of sync, replaying the history.")
+                rating_engine = None
+        if rating_engine is None:
+            rating_engine = EloRatingEngine()
+            rating_engine.add_matches(matches)
+
+        snapshot = {
+            "built_at": datetime.now().isoformat(),
+            "matches_count": len(data),
+            "last_match_date": h2h_index.last_match_date,
+            "windows": windows,
+            "columns": cols_4_avg,
+            "teams": teams,
+            "h2h": h2h_index.to_dict(),
+            "ratings": rating_engine.to_dict()
+        }
+        logging.info(f"DataProcessor::build_feature_snapshot::Snapshot built for {len(teams)} teams and {len(snapshot['h2h'])} pairs.")
+        return snapshot
+
+    def _h2h_pair_rates(self, h2h_index, upcoming_matches_df):
+        """
+        Head to head rates of every upcoming match.
+
+        Returns:
+            dict: (team, opponent) -> (rates when team played at home, rates when team played away)
+                as returned by HeadToHeadIndex.rates.
+        """
+        return {(team, opponent): (h2h_index.rates(team, opponent, 0), h2h_index.rates(team, opponent, 1))
+                for team, opponent in upcoming_matches_df[['HomeTeam', 'AwayTeam']].itertuples(index=False, name=None)}
+
+    def _build_samples(self, h2h_rates, team_averages, rating_engine=None):
+        """
+        Build the (scaled) samples to predict: for every (team, opponent) match one row for the
+        home team (venue = 0) and one row for the away team (venue = 1).
+
+        Parameters:
+            h2h_rates (dict): (team, opponent) -> (home rates, guest rates) as returned by _h2h_pair_rates.
+            team_averages (dict): team -> {feature name: average}.
+            rating_engine (EloRatingEngine): The current ratings, when the features include them.
+        """
+        def rate(rates, key, default):
+            return default if rates is None else rates[key]
+
         samples = []
-        for team, opponent in h2h_matches.keys():
-            h2h_df = h2h_matches[(team, opponent)]
-            h2h_home = h2h_df[h2h_df['venue'] == 0]
-            h2h_guest = h2h_df[h2h_df['venue'] == 1]
+        for (team, opponent), (h2h_home, h2h_guest) in h2h_rates.items():
             samples.append({'team': team, 'opponent': opponent, 'venue': 0, 
-                            'h2h_home_win': 0.5 if h2h_home.shape[0] == 0 else h2h_home['Win'].mean(),
-                            'h2h_home_draw': 0 if h2h_home.shape[0] == 0 else h2h_home['Draw'].mean(), 
-                            'h2h_home_loss': 0.5 if h2h_home.shape[0] == 0 else h2h_home['Loss'].mean(),
-                            'h2h_guest_win': 0.5 if h2h_guest.shape[0] == 0 else h2h_guest['Win'].mean(),
-                            'h2h_guest_draw': 0 if h2h_guest.shape[0] == 0 else h2h_guest['Draw'].mean(),
-                            'h2h_guest_loss': 0.5 if h2h_guest.shape[0] == 0 else h2h_guest['Loss'].mean()})
+                            'h2h_home_win': rate(h2h_home, 'Win', 0.5),
+                            'h2h_home_draw': rate(h2h_home, 'Draw', 0), 
+                            'h2h_home_loss': rate(h2h_home, 'Loss', 0.5),
+                            'h2h_guest_win': rate(h2h_guest, 'Win', 0.5),
+                            'h2h_guest_draw': rate(h2h_guest, 'Draw', 0),
+                            'h2h_guest_loss': rate(h2h_guest, 'Loss', 0.5)})
             samples.append({'team': opponent, 'opponent': team, 'venue': 1, 
-                            'h2h_home_win': 0.5 if h2h_guest.shape[0] == 0 else h2h_guest['Loss'].mean(),
-                            'h2h_home_draw': 0 if h2h_guest.shape[0] == 0 else h2h_guest['Draw'].mean(), 
-                            'h2h_home_loss': 0.5 if h2h_guest.shape[0] == 0 else h2h_guest['Win'].mean(),
-                            'h2h_guest_win': 0.5 if h2h_home.shape[0] == 0 else h2h_home['Loss'].mean(),
-                            'h2h_guest_draw': 0 if h2h_home.shape[0] == 0 else h2h_home['Draw'].mean(),
-                            'h2h_guest_loss': 0.5 if h2h_home.shape[0] == 0 else h2h_home['Win'].mean()})
-        for team, last_match in last_matches.items():
-            for dict in list(filter(lambda x: x['team'] == team, samples)):
-                for window in [5, 10, 15]:
-                    for col in cols_4_avg:
-                        dict[f"{col}_avg{window}"] = last_match.head(window)[col].mean()
+                            'h2h_home_win': rate(h2h_guest, 'Loss', 0.5),
+                            'h2h_home_draw': rate(h2h_guest, 'Draw', 0), 
+                            'h2h_home_loss': rate(h2h_guest, 'Win', 0.5),
+                            'h2h_guest_win': rate(h2h_home, 'Loss', 0.5),
+                            'h2h_guest_draw': rate(h2h_home, 'Draw', 0),
+                            'h2h_guest_loss': rate(h2h_home, 'Win', 0.5)})
+        for sample in samples:
+            sample.update(team_averages.get(sample['team'], {}))
+        if rating_engine is not None:
+            for home_sample, away_sample in zip(samples[0::2], samples[1::2]):
+                home_features, away_features = rating_engine.pair_features(rating_engine.rating(home_sample['team']),
+                                                                           rating_engine.rating(away_sample['team']))
+                home_sample.update({feature: float(value) for feature, value in home_features.items()})
+                away_sample.update({feature: float(value) for feature, value in away_features.items()})
         result = pd.DataFrame(samples).drop(columns=['team', 'opponent'])
         if result.shape[0] > 0:
-            scaler = StandardScaler().set_output(transform="pandas")
-            result = scaler.fit_transform(result)
+            # Standard scaling of the two rows of every match (same as a StandardScaler fitted on
+            # each match alone), so a match gets the same features whether it is predicted alone
+            # or within a batch
+            values = result.to_numpy(dtype=np.float64).reshape(-1, 2, result.shape[1])
+            std = values.std(axis=1, keepdims=True)
+            scaled = (values - values.mean(axis=1, keepdims=True)) / np.where(std > 0, std, 1)
+            result = pd.DataFrame(scaled.reshape(result.shape), columns=result.columns)
         logging.info(f"Constructed features for prediction: {result}")
-        return result
\ No newline at end of file
+        return result
+
+
+def matches_frame(data):
+    """
+    The match history as a DataFrame, from the match dictionaries of DataLoader or a MatchStore
+    (categorical teams over the codes of the store, without decoding the rows).
+    """
+    return data.history_frame() if isinstance(data, MatchStore) else pd.DataFrame(data)
@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+import logging
+
+class EloRatingEngine:
+    """
+    Elo team ratings updated as a stream of matches in date order, O(1) per match.
+    The ratings before the kickoff of every match are returned as the matches are added, and
+    the engine state (current ratings) is small enough to be saved in the feature snapshot and
+    updated incrementally with the new matches.
+
+    The engine is streaming only: it keeps the current ratings, not the rating of every team
+    after each date. The ratings before kickoff are known for the matches being added (see
+    add_matches) and for the fixtures after the last match added (see rating); the ratings as
+    of an earlier date need a new engine fed with the matches played before that date.
+    """
+    FEATURES = ['elo_diff', 'elo_expected']
+
+    def __init__(self, k=20.0, home_advantage=60.0, initial_rating=1500.0):
+        """
+        Parameters:
+            k (float): Update factor (rating points exchanged by a one goal result against an equal team).
+            home_advantage (float): Rating points added to the home team in the expected result.
+            initial_rating (float): Rating of a team without a match.
+        """
+        self.k = k
+        self.home_advantage = home_advantage
+        self.initial_rating = initial_rating
+        self.ratings = {}
+        self.last_match_date = None
+        self.matches_count = 0
+
+    def rating(self, team):
+        return self.ratings.get(team, self.initial_rating)
+
+    def expected_home(self, home_rating, away_rating):
+        """
+        Expected result (win = 1, draw = 0.5) of the home team. Works on arrays.
+        """
+        return 1 / (1 + 10 ** ((away_rating - home_rating - self.home_advantage) / 400))
+
+    def update(self, home_team, away_team, home_goals, away_goals, date):
+        """
+        Update the ratings with the result of one match.
+
+        Returns:
+            tuple: The ratings of the home and away teams before the match.
+        """
+        home_rating, away_rating = self.rating(home_team), self.rating(away_team)
+        self.matches_count += 1
+        if np.isnan(home_goals) or np.isnan(away_goals):
+            # No result: the ratings are unchanged
+            return home_rating, away_rating
+        goal_difference = abs(home_goals - away_goals)
+        # Bigger wins move the ratings more (World Football Elo multiplier)
+        multiplier = 1 if goal_difference <= 1 else 1.5 if goal_difference == 2 else (11 + goal_difference) / 8
+        result = 1.0 if home_goals > away_goals else 0.5 if home_goals == away_goals else 0.0
+        change = self.k * multiplier * (result - self.expected_home(home_rating, away_rating))
+        self.ratings[home_team] = home_rating + change
+        self.ratings[away_team] = away_rating - change
+
+        day = date if isinstance(date, str) else pd.Timestamp(date).strftime('%Y-%m-%d')
+        if self.last_match_date is None or day > self.last_match_date:
+            self.last_match_date = day
+        return home_rating, away_rating
+
+    def add_matches(self, matches):
+        """
+        Stream matches through the engine in date order.
+
+        Parameters:
+            matches (pd.DataFrame): One row per match (HomeTeam, AwayTeam, FTHG, FTAG, Date), all played
+                after the matches already added.
+        Returns:
+            np.ndarray: (n_matches, 2) ratings of the home and away teams before each match, aligned on the rows.
+        """
+        dates = pd.to_datetime(matches['Date'])
+        order = np.argsort(dates.to_numpy(), kind='stable')
+        dates = dates.dt.strftime('%Y-%m-%d').to_numpy()
+        home_teams = matches['HomeTeam'].to_numpy()
+        away_teams = matches['AwayTeam'].to_numpy()
+        home_goals = pd.to_numeric(matches['FTHG'], errors='coerce').to_numpy(dtype=np.float64)
+        away_goals = pd.to_numeric(matches['FTAG'], errors='coerce').to_numpy(dtype=np.float64)
+
+        before = np.empty((len(order), 2))
+        for row in order:
+            before[row] = self.update(home_teams[row], away_teams[row], home_goals[row], away_goals[row], dates[row])
+        return before
+
+    def update_from(self, matches):
+        """
+        Incrementally add the matches played after the last match already in the engine.
+
+        Returns:
+            int: The number of matches added.
+        """
+        if self.last_match_date is not None:
+            matches = matches[pd.to_datetime(matches['Date']) > pd.Timestamp(self.last_match_date)]
+        self.add_matches(matches)
+        logging.info(f"EloRatingEngine::update_from::{matches.shape[0]} matches added to the ratings.")
+        return matches.shape[0]
+
+    def pair_features(self, home_ratings, away_ratings):
+        """
+        Features of the home and away team rows of matches from the ratings before kickoff.
+
+        Returns:
+            tuple(dict, dict): FEATURES of the home team rows and of the away team rows.
+        """
+        expected = self.expected_home(np.asarray(home_ratings, dtype=np.float64), np.asarray(away_ratings, dtype=np.float64))
+        difference = np.asarray(home_ratings, dtype=np.float64) - np.asarray(away_ratings, dtype=np.float64)
+        return ({'elo_diff': difference, 'elo_expected': expected},
+                {'elo_diff': -difference, 'elo_expected': 1 - expected})
+
+    def to_dict(self):
+        """
+        JSON serializable state of the engine.
+        """
+        return {"k": self.k, "home_advantage": self.home_advantage, "initial_rating": self.initial_rating,
+                "last_match_date": self.last_match_date, "matches_count": self.matches_count,
+                "ratings": {team: float(rating) for team, rating in self.ratings.items()}}
+
+    @classmethod
+    def from_dict(cls, state):
+        """
+        Rebuild an engine from its to_dict representation.
+        """
+        engine = cls(state["k"], state["home_advantage"], state["initial_rating"])
+        engine.ratings = dict(state["ratings"])
+        engine.last_match_date = state.get("last_match_date")
+        engine.matches_count = state.get("matches_count", 0)
+        return engine
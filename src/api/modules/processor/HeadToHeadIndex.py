@@ -0,0 +1,187 @@
+import numpy as np
+import pandas as pd
+import logging
+
+class HeadToHeadIndex:
+    """
+    Dense head to head index over all the teams.
+    Teams are integer encoded and the Win/Draw/Loss counts are stored in a
+    [team, opponent, venue, outcome] tensor, so any head to head feature is an
+    array lookup instead of a DataFrame scan.
+    The index is updated incrementally as new matches arrive.
+    """
+    OUTCOMES = ['Win', 'Draw', 'Loss']
+
+    def __init__(self, teams=None):
+        """
+        Initialize an empty index.
+
+        Parameters:
+            teams (iterable): Optional team names to encode upfront.
+        """
+        self.team_index = {}
+        self.counts = np.zeros((0, 0, 2, len(self.OUTCOMES)), dtype=np.int32)
+        self.last_match_date = None
+        if teams is not None:
+            self.encode(teams)
+
+    @property
+    def teams(self):
+        return list(self.team_index.keys())
+
+    def encode(self, teams):
+        """
+        Integer encode team names, registering unknown teams (the tensor grows accordingly).
+
+        Parameters:
+            teams (iterable): Team names.
+        Returns:
+            np.ndarray: The team codes.
+        """
+        if isinstance(teams, pd.Series) and isinstance(teams.dtype, pd.CategoricalDtype):
+            # Encode the categories once and map the category codes
+            category_codes = self.encode(teams.cat.categories)
+            return category_codes[teams.cat.codes.to_numpy()]
+        codes = np.fromiter((self.team_index.setdefault(team, len(self.team_index)) for team in teams), dtype=np.int64)
+        self._grow(len(self.team_index))
+        return codes
+
+    def _grow(self, size):
+        current = self.counts.shape[0]
+        if size <= current:
+            return
+        # Over-allocate to avoid reallocating the tensor for every new team
+        capacity = max(size, 2 * current)
+        counts = np.zeros((capacity, capacity) + self.counts.shape[2:], dtype=self.counts.dtype)
+        counts[:current, :current] = self.counts
+        self.counts = counts
+
+    def _outcomes(self, df):
+        # result: Win = 1, Draw = 0, Loss = -1 -> outcome: Win = 0, Draw = 1, Loss = 2
+        return (1 - df['result'].to_numpy()).astype(np.int64)
+
+    def add_matches(self, df):
+        """
+        Add matches to the index.
+
+        Parameters:
+            df (pd.DataFrame): Matches as returned by DataProcessor.get_df_transformed
+                (one row per team and match: Date, team, opponent, venue, result).
+        """
+        if df.shape[0] == 0:
+            return
+        teams = self.encode(df['team'])
+        opponents = self.encode(df['opponent'])
+        np.add.at(self.counts, (teams, opponents, df['venue'].to_numpy().astype(np.int64), self._outcomes(df)), 1)
+        self._set_last_match_date(df['Date'].max())
+
+    def _set_last_match_date(self, date):
+        last_date = pd.Timestamp(date).strftime('%Y-%m-%d')
+        if self.last_match_date is None or last_date > self.last_match_date:
+            self.last_match_date = last_date
+
+    def update(self, df):
+        """
+        Incrementally add the matches played after the last match already in the index.
+
+        Parameters:
+            df (pd.DataFrame): Matches as returned by DataProcessor.get_df_transformed.
+        Returns:
+            int: The number of rows added.
+        """
+        if self.last_match_date is not None:
+            df = df[pd.to_datetime(df['Date']) > pd.Timestamp(self.last_match_date)]
+        self.add_matches(df)
+        logging.info(f"HeadToHeadIndex::update::{df.shape[0]} rows added to the head to head index.")
+        return df.shape[0]
+
+    def total(self):
+        """
+        Number of (team, match) rows in the index.
+        """
+        return int(self.counts.sum())
+
+    def rates(self, team, opponent, venue):
+        """
+        Win/Draw/Loss rates of team against opponent at the given venue (0 = home, 1 = away).
+
+        Returns:
+            dict: {'Win': .., 'Draw': .., 'Loss': ..} or None when the teams never met at this venue.
+        """
+        team_code = self.team_index.get(team)
+        opponent_code = self.team_index.get(opponent)
+        if team_code is None or opponent_code is None:
+            return None
+        counts = self.counts[team_code, opponent_code, venue]
+        total = counts.sum()
+        if total == 0:
+            return None
+        return {outcome: counts[i] / total for i, outcome in enumerate(self.OUTCOMES)}
+
+    def h2h_features(self, df):
+        """
+        Head to head features of every match computed only from the previous meetings
+        (strictly earlier dates), streaming over the matches in date order.
+        Replaces a scan of the previous matches for each row.
+
+        Parameters:
+            df (pd.DataFrame): Matches as returned by DataProcessor.get_df_transformed.
+        Returns:
+            pd.DataFrame: h2h_home_win, h2h_home_draw, h2h_home_loss, h2h_guest_win, h2h_guest_draw,
+                h2h_guest_loss aligned on df rows (0 when there is no previous meeting).
+        """
+        teams = self.encode(df['team'])
+        opponents = self.encode(df['opponent'])
+        venues = df['venue'].to_numpy().astype(np.int64)
+        outcomes = self._outcomes(df)
+        dates = df['Date'].to_numpy()
+
+        features = np.zeros((df.shape[0], 2, len(self.OUTCOMES)), dtype=np.float64)
+        order = np.argsort(dates, kind='stable')
+        # Boundaries of the blocks of rows sharing the same date
+        sorted_dates = dates[order]
+        starts = np.flatnonzero(np.r_[True, sorted_dates[1:] != sorted_dates[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        for start, end in zip(starts, ends):
+            rows = order[start:end]
+            # Read the counts before adding the matches of the day
+            counts = self.counts[teams[rows], opponents[rows]]
+            totals = counts.sum(axis=2, keepdims=True)
+            features[rows] = np.divide(counts, totals, out=np.zeros(counts.shape), where=totals > 0)
+            np.add.at(self.counts, (teams[rows], opponents[rows], venues[rows], outcomes[rows]), 1)
+        if df.shape[0] > 0:
+            self._set_last_match_date(sorted_dates[-1])
+
+        return pd.DataFrame(features.reshape(df.shape[0], -1).astype(np.float32), index=df.index,
+                            columns=['h2h_home_win', 'h2h_home_draw', 'h2h_home_loss',
+                                     'h2h_guest_win', 'h2h_guest_draw', 'h2h_guest_loss'])
+
+    def to_dict(self):
+        """
+        JSON serializable (sparse) representation of the index: only the pairs that met are stored.
+        """
+        h2h = {}
+        teams = self.teams
+        for team_code, opponent_code in zip(*np.nonzero(self.counts.sum(axis=(2, 3)))):
+            pair = {}
+            for venue, key in enumerate(['home', 'guest']):
+                counts = self.counts[team_code, opponent_code, venue]
+                if counts.sum() > 0:
+                    pair[key] = [int(count) for count in counts]
+            h2h[f"{teams[team_code]}|{teams[opponent_code]}"] = pair
+        return h2h
+
+    @classmethod
+    def from_dict(cls, h2h, last_match_date=None):
+        """
+        Rebuild an index from its to_dict representation.
+        """
+        index = cls()
+        for key, pair in h2h.items():
+            team, opponent = key.split('|', 1)
+            team_code, opponent_code = index.encode([team, opponent])
+            for venue, venue_key in enumerate(['home', 'guest']):
+                if venue_key in pair:
+                    index.counts[team_code, opponent_code, venue] = pair[venue_key]
+        index.last_match_date = last_match_date
+        return index
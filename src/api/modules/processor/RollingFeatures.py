@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+class RollingFeatureEngine:
+    """
+    Rolling averages of several columns over several windows, per team.
+    The per team cumulative sums are computed once and every window is derived
+    from them, so any set of windows and columns costs O(n) in total.
+    """
+
+    def __init__(self, columns, windows):
+        """
+        Parameters:
+            columns (list[str]): The columns to average.
+            windows (list[int]): The window sizes (number of previous matches).
+        """
+        self.columns = list(columns)
+        self.windows = sorted(set(int(window) for window in windows))
+        if not self.windows or self.windows[0] < 1:
+            raise ValueError(f"RollingFeatureEngine::Invalid windows: {windows}")
+
+    def feature_names(self):
+        """
+        Names of the computed features, in the order used by the predictors.
+        """
+        return [f"{col}_avg{window}" for window in self.windows for col in self.columns]
+
+    def transform(self, df, group_col='team', date_col='Date', dropna=True):
+        """
+        Add the rolling averages of the previous matches (the current match is excluded)
+        of every team.
+
+        Parameters:
+            df (pd.DataFrame): One row per team and match.
+            group_col (str): The column to group by.
+            date_col (str): The column giving the order of the matches.
+            dropna (bool): Drop the rows without enough previous matches for every window
+                (or with a missing value in one of the windows).
+        Returns:
+            pd.DataFrame: The rows sorted by group and date with the feature columns added.
+        """
+        df = df.sort_values([group_col, date_col], kind='stable').reset_index(drop=True)
+        n_rows = df.shape[0]
+
+        values = df[self.columns].to_numpy(dtype=np.float64)
+        missing = np.isnan(values)
+        # Cumulative sums with a leading zero row: sums[k] is the sum of the k first rows
+        sums = np.zeros((n_rows + 1, len(self.columns)))
+        np.cumsum(np.where(missing, 0.0, values), axis=0, out=sums[1:])
+        missing_counts = np.zeros((n_rows + 1, len(self.columns)), dtype=np.int64)
+        np.cumsum(missing, axis=0, out=missing_counts[1:])
+
+        # Position of every row in its group
+        groups = df[group_col]
+        groups = groups.cat.codes.to_numpy() if isinstance(groups.dtype, pd.CategoricalDtype) else groups.to_numpy()
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]]) if n_rows > 0 else np.array([], dtype=np.int64)
+        positions = np.arange(n_rows) - np.repeat(starts, np.diff(np.r_[starts, n_rows]))
+
+        rows = np.arange(n_rows)
+        features = {}
+        for window in self.windows:
+            valid = positions >= window
+            begin = np.where(valid, rows - window, 0)
+            averages = (sums[rows] - sums[begin]) / window
+            has_missing = (missing_counts[rows] - missing_counts[begin]) > 0
+            averages[has_missing] = np.nan
+            averages[~valid] = np.nan
+            for i, col in enumerate(self.columns):
+                features[f"{col}_avg{window}"] = averages[:, i].astype(np.float32)
+
+        df = pd.concat([df.drop(columns=[name for name in features if name in df.columns]),
+                        pd.DataFrame(features, index=df.index)[self.feature_names()]], axis=1)
+        if dropna:
+            df = df.dropna(subset=self.feature_names()).reset_index(drop=True)
+        return df
@@ -1,40 +1,84 @@
 import requests
 import json
+import threading
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry, make_headers
 
-def fetch_data_from_api():
+API_BASE_URL = "https://olympiakos.azurewebsites.net/api"
+
+# Connect / read timeouts: the read timeout stays long enough for a cold start of the
+# function app (docker image loading)
+TIMEOUT = (5, 60)
+
+# Last response of every url: (ETag, parsed JSON), for conditional requests
+_etag_cache = {}
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """
+    Shared HTTP session: pooled keep-alive connections, gzip/brotli negotiation
+    (brotli when the brotli package is installed) and retries with jittered
+    exponential backoff on connection errors and 429/5xx responses.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=4,
+                backoff_factor=0.5,
+                backoff_jitter=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=["GET"],
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(max_retries=retry, pool_connections=4, pool_maxsize=8)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(make_headers(accept_encoding=True))
+            session.headers.update({"Accept": "application/json"})
+            _session = session
+    return _session
+
+def get_json(path, params=None):
     """
-    Fetches JSON data from a specified API endpoint.
+    GET a JSON resource of the API with a conditional request: when the content did not
+    change since the last call (304 Not Modified) the previously parsed JSON is returned.
     """
-    # Define the API endpoint URL
-    api_url = "https://olympiakos.azurewebsites.net/api/get_datas"
+    api_url = f"{API_BASE_URL}/{path}"
+    cache_key = (api_url, tuple(sorted((params or {}).items())))
+    headers = {}
+    if cache_key in _etag_cache:
+        headers["If-None-Match"] = _etag_cache[cache_key][0]
 
-    # Define any necessary headers (e.g., for Content-Type or Authorization)
-    headers = {
-        # "Authorization": "Bearer YOUR_API_TOKEN",
-        "Content-Type": "application/json"
-    }
+    print(f"Making a GET request to: {api_url} {params or ''}")
+    response = get_session().get(api_url, headers=headers, params=params, timeout=TIMEOUT)
+    if response.status_code == 304:
+        print("Not modified, using the previous response.")
+        return _etag_cache[cache_key][1]
 
-    # Define any query parameters (not needed here, but included for completeness)
-    params = {
-        # "api_param_1": "example",
-        # "api_param_2": 10
-    }
-    
+    # Raise an exception for bad status codes (4xx or 5xx)
+    response.raise_for_status()
+    data = response.json()
+    if response.headers.get("ETag"):
+        _etag_cache[cache_key] = (response.headers["ETag"], data)
+    return data
+
+def fetch_data_from_api(since=None):
+    """
+    Fetches the football matches from the API.
+
+    Parameters:
+        since (str): Optional date (YYYY-MM-DD): only the matches played on or after it are returned.
+    Returns:
+        list: The matches, or None if the request failed.
+    """
+    params = {"since": since} if since else None
     try:
-        # Make the GET request to the API
-        print(f"Making a GET request to: {api_url}")
-        # Set a timeout for the request to avoid hanging indefinitely but put 60 seconds 
-        # to be sure it has enough time to respond and load docker image
-        response = requests.get(api_url, headers=headers, params=params, timeout=60)
-
-        # Raise an exception for bad status codes (4xx or 5xx)
-        response.raise_for_status()
-
-        # Parse the JSON response
-        data = response.json()
-        print("Successfully fetched and parsed data!")
-        
-        # You can now work with the 'data' dictionary
+        data = get_json("get_datas", params)
+        print(f"Successfully fetched and parsed {len(data)} matches!")
         return data
 
     except requests.exceptions.HTTPError as http_err:
@@ -47,7 +91,23 @@ def fetch_data_from_api():
         print(f"An unexpected error occurred: {req_err}")
     except json.JSONDecodeError:
         print("Error: Could not decode JSON from response.")
-        print("Response content was:", response.text)
+
+    return None
+
+def fetch_predictions_from_api():
+    """
+    Fetches the predictions of the upcoming fixtures published after the last training run.
+    Returns the JSON payload (model_version, generated_at, predictions) or None.
+    """
+    try:
+        data = get_json("predictions")
+        print(f"Successfully fetched predictions of model version {data.get('model_version')}!")
+        return data
+
+    except requests.exceptions.RequestException as req_err:
+        print(f"An error occurred while fetching predictions: {req_err}")
+    except json.JSONDecodeError:
+        print("Error: Could not decode JSON from response.")
 
     return None
 
@@ -57,7 +117,6 @@ if __name__ == "__main__":
     if api_data:
         print("Data received:")
         print(json.dumps(api_data, indent=2))
-       
+
         if isinstance(api_data, list):
             list_of_data = [dict(data) for data in api_data]
-            
\ No newline at end of file
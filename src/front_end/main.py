@@ -1,22 +1,80 @@
 import streamlit as st
 
 import pandas as pd 
-from api import fetch_data_from_api
-from utils.functions import render_matches
+from api import fetch_data_from_api, fetch_predictions_from_api
+from utils.functions import render_matches, predictions_to_dataframe
 from utils.lists_variables import teamname_mapping
+from utils.data_cache import CachedDataset
+from utils.team_index import TeamIndex
+from utils.standings import StandingsEngine
 
 ############################################
 ############### IMPORT DATAS ###############
 ############################################
-# Dataframe for past seasons
-datas = fetch_data_from_api()
-df = pd.DataFrame(datas)
-df.replace(teamname_mapping, inplace=True)
+def load_matches(previous):
+    """
+    Past seasons from the API, or None if the API is unavailable.
+    With a local copy only the matches since its last match day are fetched and merged in.
+    """
+    since = None
+    if previous is not None and not previous.empty:
+        since = previous['Date'].max().strftime('%Y-%m-%d')
+    datas = fetch_data_from_api(since=since)
+    if datas is None or (not datas and since is None):
+        return None
+    if not datas:
+        return previous
+    df = pd.DataFrame(datas)
+    df.replace(teamname_mapping, inplace=True)
+    df['Date'] = pd.to_datetime(df['Date'], format='mixed', dayfirst=True)
+    if since is None:
+        return df
+    # The last match day is fetched again (inclusive 'since'): its matches are replaced
+    df = pd.concat([previous, df], ignore_index=True)
+    df = df.drop_duplicates(subset=['Date', 'Home_team', 'Away_team'], keep='last')
+    return df.sort_values('Date', kind='stable').reset_index(drop=True)
+
+def load_published_predictions(previous):
+    """
+    Predictions published after the last training run, or None if there are none.
+    """
+    published = fetch_predictions_from_api()
+    if not published or not published.get('predictions'):
+        return None
+    return predictions_to_dataframe(published['predictions'])
+
+@st.cache_resource
+def get_datasets():
+    # Shared by every session: the memory tier of the cache
+    return {
+        "matches": CachedDataset("matches", load_matches),
+        "predictions": CachedDataset("predictions", load_published_predictions),
+    }
+
+@st.cache_resource(max_entries=2)
+def get_team_index(_df, loaded_at):
+    # Rebuilt only when a new version of the match history is loaded
+    return TeamIndex(_df)
 
-df['Date'] = pd.to_datetime(df['Date'], format='mixed', dayfirst=True)
+@st.cache_resource(max_entries=2)
+def get_standings(_df, loaded_at):
+    return StandingsEngine(_df)
+
+datasets = get_datasets()
+
+# Dataframe for past seasons
+df = datasets["matches"].get()
+if df is None:
+    st.error("Match history unavailable, please retry later.")
+    st.stop()
+team_index = get_team_index(df, datasets["matches"].loaded_at)
+standings = get_standings(df, datasets["matches"].loaded_at)
 
-# Dataframe for matches to predict
-matches_to_predict = pd.read_csv('new_predictions.csv')
+# Dataframe for matches to predict: predictions published after the last training run,
+# the static csv otherwise
+matches_to_predict = datasets["predictions"].get()
+if matches_to_predict is None:
+    matches_to_predict = pd.read_csv('new_predictions.csv')
 matches_to_predict.replace(teamname_mapping, inplace=True)
 matches_to_predict['Date'] = pd.to_datetime(matches_to_predict['Date'], format='%d/%m/%Y', dayfirst=True, errors='coerce')
 matches = matches_to_predict.to_dict('records')
@@ -45,14 +103,28 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# Tabs
+# Fixtures: only the selected fixture is computed and rendered, in a fragment so that
+# switching fixture does not rerun the whole page
 tab_labels = [f"{m['HomeTeam']} - {m['AwayTeam']}" for m in matches]
-tabs = st.tabs(tab_labels)
 
 ###############################################
 ############# INTERFACE STREAMLIT #############
 ###############################################
-for idx, (tab, match) in enumerate(zip(tabs, matches)):
-    with tab:
-        render_matches(match, df, uid=idx)
+@st.fragment
+def render_selected_match():
+    idx = st.segmented_control(
+        "Fixture",
+        options=range(len(matches)),
+        format_func=lambda i: tab_labels[i],
+        default=0,
+        key="selected_fixture",
+        label_visibility="collapsed"
+    )
+    # The control can be unselected by clicking the active fixture again
+    idx = 0 if idx is None else idx
+    render_matches(matches[idx], standings, team_index, uid=idx)
 
+if matches:
+    render_selected_match()
+else:
+    st.info("No upcoming fixtures to predict.")
@@ -0,0 +1,117 @@
+import os
+import time
+import threading
+import pandas as pd
+
+# Directory of the on-disk tier (one Parquet file per dataset)
+CACHE_DIR = os.environ.get("DASHBOARD_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache"))
+# Age after which a dataset is refreshed in the background
+DEFAULT_TTL_SECONDS = float(os.environ.get("DASHBOARD_DATA_TTL_SECONDS", 3600))
+
+
+class CachedDataset:
+    """
+    Two tier (memory, Parquet on disk) cache of a DataFrame produced by a loader function.
+    A copy older than the TTL is still served (stale-while-revalidate) while a single
+    background thread reloads it, so the dashboard renders instantly from the local copy.
+    The loader is only awaited when there is no copy at all.
+    """
+
+    def __init__(self, name, loader, ttl=DEFAULT_TTL_SECONDS, cache_dir=CACHE_DIR):
+        """
+        Parameters:
+            name (str): Name of the dataset (file name of the Parquet copy).
+            loader (callable): Called with the current copy (None if there is none) and returns the
+                fresh DataFrame, or None when the source is unavailable. Incremental loaders can
+                fetch only what is newer than the current copy and merge it in.
+            ttl (float): Age in seconds after which the dataset is refreshed.
+            cache_dir (str): Directory of the on-disk tier.
+        """
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.path = os.path.join(cache_dir, f"{name}.parquet")
+        self.df = None
+        self.loaded_at = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self):
+        """
+        Returns a copy of the dataset (callers are free to modify it), or None if it
+        could not be loaded and no local copy exists.
+        """
+        if self.df is None:
+            self._read_disk()
+        if self.df is None:
+            # Cold start: nothing to serve, wait for the loader
+            self.refresh()
+        elif self.is_stale():
+            self._refresh_in_background()
+        return None if self.df is None else self.df.copy()
+
+    def is_stale(self):
+        return self.loaded_at is None or time.time() - self.loaded_at > self.ttl
+
+    def age(self):
+        """
+        Age in seconds of the served copy (None if there is none).
+        """
+        return None if self.loaded_at is None else time.time() - self.loaded_at
+
+    def refresh(self):
+        """
+        Reloads the dataset from the loader and writes it to both tiers.
+        The current copy is kept when the loader fails.
+        """
+        try:
+            df = self.loader(None if self.df is None else self.df.copy())
+        except Exception as e:
+            print(f"CachedDataset::refresh::{self.name}: loader failed: {e}")
+            df = None
+        if df is None:
+            return False
+        with self._lock:
+            self.df = df
+            self.loaded_at = time.time()
+        self._write_disk(df)
+        print(f"CachedDataset::refresh::{self.name}: {len(df)} rows refreshed.")
+        return True
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name=f"refresh-{self.name}", daemon=True).start()
+
+    def _read_disk(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            df = pd.read_parquet(self.path)
+        except Exception as e:
+            print(f"CachedDataset::_read_disk::{self.name}: unreadable cache file: {e}")
+            return
+        with self._lock:
+            if self.df is None:
+                self.df = df
+                self.loaded_at = os.path.getmtime(self.path)
+
+    def _write_disk(self, df):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Write then rename so that a reader never sees a partial file
+            tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"CachedDataset::_write_disk::{self.name}: cache not written: {e}")
@@ -7,6 +7,7 @@ import streamlit as st
 
 import streamlit_shadcn_ui as ui
 from utils.lists_variables import folder_matches_cols, stats_cols
+from utils.standings import StandingsEngine
 
 #############################
 ### JSON | CSV CONVERSION ###
@@ -30,25 +31,23 @@ def json_to_csv(jsonpath, outputpath):
         writer.writeheader()
         writer.writerows(json_data)
 
+# Published predictions (HW / HD / HL) to the columns of new_predictions.csv
+def predictions_to_dataframe(predictions):
+    df = pd.DataFrame(predictions)
+    home_favourite = df['HW'] >= df['HL']
+    df['win_team'] = np.where(home_favourite, df['HomeTeam'], df['AwayTeam'])
+    df['win_rate'] = np.where(home_favourite, df['HW'], df['HL'])
+    df['loose_rate'] = np.where(home_favourite, df['HL'], df['HW'])
+    df['draw_rate'] = df['HD']
+    return df
+
 #############################
 ### TABLES FOR DASHBOARD ####
 #############################
 
 # 18 former matches 
-def former_18_matches(teamname, match_date, df):
-    """datas = fetch_data_from_api()
-    df = pd.DataFrame(datas)"""
-    df['Date'] = pd.to_datetime(df['Date'], format='mixed', dayfirst=True)
-    mask_team = (df['Home_team'] == teamname) | (df['Away_team'] == teamname)
-    #df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d %H:%M:%S', dayfirst=True)
-    
-    match_date = pd.to_datetime(match_date, dayfirst= True)
-    mask_date = df['Date'] < match_date
-    mask_total = mask_team & mask_date
-
-    df = df.loc[mask_total, stats_cols]
-    df_18_sorted = df.sort_values('Date', ascending=False)
-    df_18_sorted = df_18_sorted.head(18)
+def former_18_matches(teamname, match_date, team_index):
+    df_18_sorted = team_index.last_matches(teamname, match_date, 18, stats_cols)
     df_18_sorted['Date'] = df_18_sorted['Date'].dt.strftime('%d-%m-%Y')
     df_18_sorted['Teamname'] = teamname
 
@@ -156,17 +155,8 @@ def stats(dataframe_18_matches, teamname):
 
 
 # Side tables with 5 folder matches
-def create_side_table(teamname, match_date, dataframe):
-    df = dataframe.copy().reset_index(drop=True)
-    mask_team = (df['Home_team'] == teamname) | (df['Away_team'] == teamname)
-    df['Date'] = pd.to_datetime(df['Date'], format='%d-%m-%Y', dayfirst=True)
-    
-    mask_date = df['Date'] < match_date
-    mask_total = mask_team & mask_date
-    df = df.loc[mask_total, folder_matches_cols]
-
-    df_sorted = df.sort_values('Date', ascending=False)
-    df_5_sorted = df_sorted.head(5)
+def create_side_table(teamname, match_date, team_index):
+    df_5_sorted = team_index.last_matches(teamname, match_date, 5, folder_matches_cols)
 
     side_df = pd.DataFrame(columns=['Date', 'Home team', 'Score', 'Away team'])
     homegoals = df_5_sorted['Home_goals_(FT)'].astype(str)
@@ -179,68 +169,28 @@ def create_side_table(teamname, match_date, dataframe):
 
     return side_df
 
-# Detailled stats from 5 former matchs 
-def create_side_stats(teamname, match_date, dataframe):
-    df = dataframe.copy()
-    mask_team = (df['Home_team'] == teamname) | (df['Away_team'] == teamname)
-    df['Date'] = pd.to_datetime(df['Date'], format='%d-%m-%Y', dayfirst=True)
-    
-    mask_date = df['Date'] < match_date
-    mask_total = mask_team & mask_date
-    df = df.loc[mask_total, :].copy()
-    
-    df_sorted = df.sort_values('Date', ascending=False)
-    df_5_sorted = df_sorted.head(5).copy()
+# Detailled stats from 5 former matchs (former_matches: output of former_18_matches, most recent first)
+def create_side_stats(former_matches):
+    df_5_sorted = former_matches.head(5).copy()
 
     homegoals = df_5_sorted['Home_goals_(FT)'].astype(str)
     awaygoals = df_5_sorted['Away_goals_(FT)'].astype(str)
     
     df_5_sorted['Score'] = homegoals + " - " + awaygoals  
-    df_5_sorted['Date'] = df_5_sorted['Date'].dt.strftime('%d-%m-%Y')
 
     return df_5_sorted.reset_index(drop=False)
 
 # Team ranking
-
-def build_classement(df):
-    df_25 = df[df['Date'] >= pd.to_datetime('2025-07-25')] # first day of jupiler pro league 25_26
-    teams = pd.unique(df_25[['Home_team' , 'Away_team']].values.ravel()).tolist()
-    lignes = []
-
-    for team in teams:
-        mask_team = (df_25['Home_team'] == team) | (df_25['Away_team'] == team)
-        df_team = df_25[mask_team]
-        df_home = df_25[df_25['Home_team'] == team]
-        df_away = df_25[df_25['Away_team'] == team]
-
-        win_home = ((df_25['Home_team'] == team) & (df_25['Full_time_result_(H/D/A)'] == "H")).sum()
-        win_away = ((df_25['Away_team'] == team) & (df_25['Full_time_result_(H/D/A)'] == "A")).sum()
-        draft = (df_team['Full_time_result_(H/D/A)'] == "D").sum()
-        wins = win_home + win_away
-
-        shots_home = df_home['Home_shots'].sum()
-        shots_away = df_away['Away_shots'].sum()
-        shots = shots_home + shots_away
-        points = (wins * 3) + (draft * 1)
-        tours = df_team['Date'].nunique()
-
-        lignes.append({
-             'Team' : team, 
-             "Tours" : tours,
-             "Points" : points,
-             "Total shots" : shots}
-        )
-
-        classement = pd.DataFrame(lignes)
-        classement = classement.sort_values(by=['Points','Tours', 'Total shots'], ascending=[False, True, False]).reset_index(drop=True)
-        classement = classement[['Team', "Tours", "Points"]]
-    return classement
+def build_classement(df, as_of=None):
+    classement = StandingsEngine(df).table(as_of)
+    return classement[['Team', "Tours", "Points"]]
 
 #############################
 ##### GRAPHIC ELEMENTS ######
 #############################
 
-# Win / Loose / Draft rate 
+# Win / Loose / Draft rate (memoized: the same team rates give the same chart spec)
+@st.cache_resource(max_entries=512, show_spinner=False)
 def make_donut(input_response, input_text, input_color):
     # 1. Couleurs (parfait)
     if input_color == 'green':
@@ -308,7 +258,7 @@ def make_donut(input_response, input_text, input_color):
 #### INTERFACE STREAMLIT ####
 #############################
 
-def render_matches(matches_to_predict, df, uid):
+def render_matches(matches_to_predict, standings, team_index, uid):
     ###################
     ## DECLARATIONS ###
     ###################
@@ -321,8 +271,8 @@ def render_matches(matches_to_predict, df, uid):
         date_pred = match_date.strftime('%d-%m-%Y')
     
     # Rates for 18 former matchs
-    home_18_matches = former_18_matches(home, match_date, df)
-    away_18_matches = former_18_matches(away, match_date, df)
+    home_18_matches = former_18_matches(home, match_date, team_index)
+    away_18_matches = former_18_matches(away, match_date, team_index)
 
     rates_home = stats(home_18_matches, home)
     rates_away = stats(away_18_matches, away)
@@ -335,18 +285,15 @@ def render_matches(matches_to_predict, df, uid):
     drawes_away_rate = make_donut(rates_away[2], 'Draw rate', 'grey')
 
     # Side tables for 5 latest matchs
-    side_home = create_side_table(home, match_date, df)
-    side_away = create_side_table(away, match_date, df)
+    side_home = create_side_table(home, match_date, team_index)
+    side_away = create_side_table(away, match_date, team_index)
 
     # Detailed statistics for 5 latest matches
-    home_5_matches = home_18_matches[:5]
-    away_5_matches = away_18_matches[:5]
-
-    home_stats = create_side_stats(home, match_date, home_5_matches)
-    away_stats = create_side_stats(away, match_date, away_5_matches)
+    home_stats = create_side_stats(home_18_matches)
+    away_stats = create_side_stats(away_18_matches)
 
-    # Ranking
-    classement = build_classement(df)
+    # Ranking before the match (computed once per dataset version and date)
+    classement = standings.table(match_date)[['Team', "Tours", "Points"]]
 
     ###################
     ##### COLUMNS #####
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+# First day of jupiler pro league 25_26
+SEASON_START = '2025-07-25'
+
+STANDINGS_STATS = ['Tours', 'Wins', 'Draws', 'Losses', 'Goals for', 'Goals against', 'Points', 'Total shots']
+
+
+class StandingsEngine:
+    """
+    League standings of a season computed from per team cumulative sums, built once per
+    dataset version. The table as of any date is a difference of two cumulative sums per team
+    instead of re-filtering the season for every team.
+    """
+
+    def __init__(self, df, season_start=SEASON_START):
+        """
+        Parameters:
+            df (pd.DataFrame): The match history (Date, Home_team, Away_team, goals, result, shots).
+            season_start (str): First day of the season.
+        """
+        season = df[pd.to_datetime(df['Date'], format='mixed', dayfirst=True) >= pd.to_datetime(season_start)]
+        dates = pd.to_datetime(season['Date'], format='mixed', dayfirst=True).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        result = season['Full_time_result_(H/D/A)'].to_numpy()
+        home_goals = pd.to_numeric(season['Home_goals_(FT)'], errors='coerce').fillna(0).to_numpy()
+        away_goals = pd.to_numeric(season['Away_goals_(FT)'], errors='coerce').fillna(0).to_numpy()
+        home_shots = pd.to_numeric(season['Home_shots'].replace('', np.nan), errors='coerce').fillna(0).to_numpy()
+        away_shots = pd.to_numeric(season['Away_shots'].replace('', np.nan), errors='coerce').fillna(0).to_numpy()
+
+        # One row per (team, match): the home side then the away side
+        teams = np.concatenate([season['Home_team'].to_numpy(), season['Away_team'].to_numpy()])
+        wins = np.concatenate([result == 'H', result == 'A'])
+        draws = np.concatenate([result == 'D', result == 'D'])
+        losses = np.concatenate([result == 'A', result == 'H'])
+        values = np.column_stack([
+            np.ones(len(teams)),
+            wins, draws, losses,
+            np.concatenate([home_goals, away_goals]),
+            np.concatenate([away_goals, home_goals]),
+            3 * wins + draws,
+            np.concatenate([home_shots, away_shots]),
+        ]).astype(np.float64)
+
+        team_codes, self.teams = pd.factorize(teams, sort=True)
+        self.dates = np.concatenate([dates, dates])
+        order = np.lexsort((self.dates, team_codes))
+        self.team_codes = team_codes[order]
+        self.dates = self.dates[order]
+        # Cumulative sums with a leading zero row: cumsums[k] is the sum of the k first rows
+        self.cumsums = np.zeros((len(order) + 1, values.shape[1]))
+        np.cumsum(values[order], axis=0, out=self.cumsums[1:])
+        self._tables = {}
+
+    def table(self, as_of=None):
+        """
+        Standings from the matches played strictly before as_of (all the season by default),
+        sorted by points, matches played (fewer first) and total shots.
+
+        Returns:
+            pd.DataFrame: Team, Tours, Wins, Draws, Losses, Goals for, Goals against,
+                Goal difference, Points and Total shots of every team of the season.
+        """
+        as_of = None if as_of is None or pd.isna(as_of) else pd.to_datetime(as_of, dayfirst=True)
+        if as_of not in self._tables:
+            starts = np.searchsorted(self.team_codes, np.arange(len(self.teams)), side='left')
+            played = self.dates < as_of.value if as_of is not None else np.ones(len(self.dates), dtype=bool)
+            # Rows are sorted by (team, date): the matches before as_of are the first rows of each team
+            ends = starts + np.bincount(self.team_codes[played], minlength=len(self.teams))
+            stats = self.cumsums[ends] - self.cumsums[starts]
+
+            classement = pd.DataFrame(stats.astype(np.int64), columns=STANDINGS_STATS)
+            classement.insert(0, 'Team', self.teams)
+            classement.insert(7, 'Goal difference', classement['Goals for'] - classement['Goals against'])
+            classement = classement.sort_values(by=['Points', 'Tours', 'Total shots'], ascending=[False, True, False]).reset_index(drop=True)
+            self._tables[as_of] = classement
+        return self._tables[as_of].copy()
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+
+class TeamIndex:
+    """
+    Matches of every team (home or away) sorted by date, built once per dataset load.
+    The latest matches of a team before a date are a binary search plus a slice
+    instead of a scan of the whole history.
+    """
+
+    def __init__(self, df, home_col='Home_team', away_col='Away_team', date_col='Date'):
+        """
+        Parameters:
+            df (pd.DataFrame): The match history (one row per match).
+        """
+        self.df = df.reset_index(drop=True)
+        self.df[date_col] = pd.to_datetime(self.df[date_col], format='mixed', dayfirst=True)
+        dates = self.df[date_col].to_numpy()
+
+        # One entry per (team, match): the home side then the away side
+        teams = np.concatenate([self.df[home_col].to_numpy(), self.df[away_col].to_numpy()])
+        rows = np.concatenate([np.arange(len(self.df))] * 2)
+        team_codes, team_names = pd.factorize(teams)
+        order = np.lexsort((np.concatenate([dates, dates]), team_codes))
+        team_codes, rows = team_codes[order], rows[order]
+        bounds = np.flatnonzero(np.r_[True, team_codes[1:] != team_codes[:-1], True])
+
+        self.rows = {}
+        self.dates = {}
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            team = team_names[team_codes[start]]
+            self.rows[team] = rows[start:end]
+            self.dates[team] = dates[rows[start:end]]
+
+    def teams(self):
+        return list(self.rows.keys())
+
+    def last_matches(self, teamname, match_date, n, columns=None):
+        """
+        The n latest matches of a team strictly before match_date, most recent first.
+
+        Parameters:
+            teamname (str): The team (home or away).
+            match_date: The date of the match to predict.
+            n (int): Number of matches.
+            columns (list): Columns to return (all by default).
+        Returns:
+            pd.DataFrame: A copy of the matches (empty if there are none).
+        """
+        columns = list(self.df.columns) if columns is None else columns
+        match_date = pd.to_datetime(match_date, dayfirst=True)
+        if teamname not in self.rows or pd.isna(match_date):
+            return self.df.iloc[[], :].loc[:, columns]
+        end = np.searchsorted(self.dates[teamname], match_date.to_datetime64(), side='left')
+        rows = self.rows[teamname][max(end - n, 0):end][::-1]
+        return self.df.iloc[rows].loc[:, columns]